@@ -13,16 +13,20 @@ import threading
 import logging
 import sys
 import os
-import requests
 import time
-import shutil
-import io
-from PIL import Image
-import serial
-import serial.tools.list_ports
 import subprocess
 import platform
 
+# Backend calls and downloads (resume, integrity checks, photo layout) are
+# the shared service, not a copy of it
+from services.backend_service import BackendService
+from services.printer_monitor import PrinterMonitor
+from services.job_storage import JobStorage
+from services.preflight import Preflight
+from services.warmup import Warmup
+from services.pipeline import build_pipeline
+from services.print_settings import to_lp_options
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -31,9 +35,10 @@ CONFIG = {
     'PRINTER_KEY': 'LOCAL_PRINTER',
     'ARDUINO_PORT': 'COM19' if sys.platform.startswith('win') else None,
     'TEMP_DIR': 'temp_jobs',
+    'STORAGE_MAX_MB': 500,
+    'PRINTER_MONITOR_INTERVAL': 10,
     'LOG_FILE': 'autoprint.log',
-    'MAX_RETRIES': 2,
-    'TIMEOUT': 15
+    'MAX_RETRIES': 2
 }
 
 # ============================================================================
@@ -46,149 +51,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# ============================================================================
-# BACKEND SERVICE
-# ============================================================================
-class BackendService:
-    """Handles all backend API communication using a persistent session"""
-    
-    def __init__(self):
-        self.base_url = CONFIG['BACKEND_URL']
-        self.temp_dir = CONFIG['TEMP_DIR']
-        os.makedirs(self.temp_dir, exist_ok=True)
-        
-        # Initialize persistent session for efficiency (reuses TCP connections)
-        self.session = requests.Session()
-        self.session.headers.update({
-            "x-printer-key": CONFIG['PRINTER_KEY'],
-            "Content-Type": "application/json"
-        })
-    
-    def verify_code(self, code):
-        """Verify pickup code with backend"""
-        url = f"{self.base_url}/verify-pickup-code"
-        code = str(code).strip()
-        
-        print(f"📡 Verifying: {code}")
-        
-        for attempt in range(CONFIG['MAX_RETRIES'] + 1):
-            try:
-                # Note: Content-Type is in session headers
-                res = self.session.post(
-                    url,
-                    json={"pickupCode": code},
-                    timeout=CONFIG['TIMEOUT']
-                )
-                
-                if res.status_code == 404:
-                    return {"success": False, "error": "INVALID_CODE"}
-                if res.status_code == 403:
-                    return {"success": False, "error": "AUTH_ERROR"}
-                if res.status_code == 400:
-                    data = res.json()
-                    return {"success": False, "error": data.get("error", "Bad Request")}
-                
-                res.raise_for_status()
-                data = res.json()
-                
-                if data.get("success"):
-                    print(f"✅ Verified: {data.get('orderId')}")
-                    return data
-                return {"success": False, "error": data.get("error", "Unknown")}
-                
-            except requests.exceptions.Timeout:
-                if attempt == CONFIG['MAX_RETRIES']:
-                    return {"success": False, "error": "TIMEOUT"}
-                time.sleep(1)
-            except requests.exceptions.ConnectionError:
-                if attempt == CONFIG['MAX_RETRIES']:
-                    return {"success": False, "error": "CONNECTION_ERROR"}
-                time.sleep(2)
-            except Exception as e:
-                logger.exception(f"Verify error: {e}")
-                return {"success": False, "error": "SYSTEM_ERROR"}
-        
-        return {"success": False, "error": "CONNECTION_ERROR"}
-    
-    def download_files(self, verified_data):
-        """Download files from Cloudinary"""
-        order_id = verified_data.get("orderId")
-        file_urls = verified_data.get("fileUrls", [])
-        
-        if not order_id or not file_urls:
-            return {"success": False, "error": "MISSING_FILES"}
-        
-        job_dir = os.path.join(self.temp_dir, order_id)
-        os.makedirs(job_dir, exist_ok=True)
-        
-        downloaded = []
-        print(f"📥 Downloading {len(file_urls)} file(s)...")
-        
-        # We use a separate session or just the existing one without the printer headers for downloading
-        for idx, url in enumerate(file_urls):
-            if not url: continue
-            
-            try:
-                local_path = os.path.join(job_dir, f"file_{idx}.pdf")
-                # Remove session default headers for external Cloudinary calls
-                r = self.session.get(url, timeout=30, headers={}) 
-                r.raise_for_status()
-                
-                content = r.content
-                content_type = r.headers.get("Content-Type", "").lower()
-                is_image = "image" in content_type or url.lower().endswith((".jpg", ".jpeg", ".png"))
-                
-                if is_image:
-                    image = Image.open(io.BytesIO(content))
-                    if image.mode in ("RGBA", "P"):
-                        image = image.convert("RGB")
-                    image.save(local_path, "PDF", resolution=100.0)
-                else:
-                    with open(local_path, "wb") as f:
-                        f.write(content)
-                
-                downloaded.append({"path": local_path})
-                print(f"   ✅ [{idx+1}/{len(file_urls)}] Downloaded")
-                
-            except Exception as e:
-                logger.error(f"Download failed for {url}: {e}")
-        
-        if not downloaded:
-            return {"success": False, "error": "DOWNLOAD_ERROR"}
-        
-        print(f"✅ Downloaded {len(downloaded)} file(s)")
-        return {"success": True, "files": downloaded}
-    
-    def mark_as_printed(self, order_id):
-        """Mark order as printed and cleanup"""
-        url = f"{self.base_url}/mark-printed"
-        
-        try:
-            res = self.session.post(
-                url,
-                json={"orderId": order_id},
-                timeout=10
-            )
-            
-            if res.status_code == 200:
-                print(f"✅ Marked as printed")
-                # Cleanup local temp files
-                job_dir = os.path.join(self.temp_dir, order_id)
-                if os.path.exists(job_dir):
-                    shutil.rmtree(job_dir)
-                    print(f"🧹 Cleaned up temporary files for {order_id}")
-        except Exception as e:
-            logger.error(f"Mark printed failed: {e}")
-
-
 # ============================================================================
 # PRINTER SERVICE
 # ============================================================================
 class PrinterService:
     """Handles printer operations"""
     
-    def __init__(self):
-        self.printer_name = self._get_default_printer()
+    def __init__(self, monitor=None):
+        self.monitor = monitor
+        # Detected on first use (lpstat/PowerShell is slow at boot)
+        self.printer_name = None
     
     def _get_default_printer(self):
         """Auto-detect default printer"""
@@ -212,21 +84,35 @@ class PrinterService:
     def check_printer_available(self):
         """Check if printer is ready"""
         print("🔍 Checking printer status...")
+        if self.monitor and self.monitor.is_fresh():
+            # Default printer may have changed since startup
+            self.printer_name = self.monitor.default_printer or self.printer_name
+            return self.monitor.is_ready(self.printer_name)
+        if not self.printer_name:
+            self.printer_name = self._get_default_printer()
         if not self.printer_name:
             print("❌ PRINTER NOT CONNECTED: No printer found")
             return False, "No printer found"
         print(f"✅ PRINTER CONNECTED: {self.printer_name}")
         return True, self.printer_name
     
-    def print_job(self, files, settings):
+    def print_job(self, files, settings, progress=None):
         """Print files"""
-        duplex = settings.get("duplex", False)
         
-        for file_info in files:
+        if self.monitor and self.monitor.is_fresh():
+            ready, message = self.check_printer_available()
+            if not ready:
+                logger.error(f"Printer not ready: {message}")
+                return False
+        
+        for position, file_info in enumerate(files):
             path = file_info.get("path")
             if not os.path.exists(path):
                 continue
             
+            job_settings = dict(settings)
+            job_settings.update(file_info.get("settings") or {})
+            
             try:
                 if platform.system() == "Windows":
                     # Windows printing
@@ -236,13 +122,14 @@ class PrinterService:
                     cmd = ["lp"]
                     if self.printer_name:
                         cmd.extend(["-d", self.printer_name])
-                    if duplex:
-                        cmd.extend(["-o", "sides=two-sided-long-edge"])
+                    cmd.extend(to_lp_options(job_settings))
                     cmd.append(path)
                     
                     subprocess.run(cmd, check=True)
                 
                 print(f"🖨️  Printed: {os.path.basename(path)}")
+                if progress:
+                    progress.emit("print", force=True, file=position + 1, total=len(files), state="completed")
             except Exception as e:
                 logger.error(f"Print failed: {e}")
                 return False
@@ -264,6 +151,7 @@ class ArduinoReader:
     
     def _find_arduino(self):
         """Auto-detect Arduino port"""
+        import serial.tools.list_ports
         ports = serial.tools.list_ports.comports()
         for port in ports:
             if 'Arduino' in port.description or 'CH340' in port.description:
@@ -279,6 +167,7 @@ class ArduinoReader:
             return False
         
         try:
+            import serial
             self.serial = serial.Serial(self.port, 9600, timeout=1)
             time.sleep(2)  # Wait for Arduino to reset
             self.running = True
@@ -396,8 +285,20 @@ class AutoPrintApp:
         self.root.title("Auto Print System")
         
         # Initialize services
-        self.backend = BackendService()
-        self.printer = PrinterService()
+        self.backend = BackendService(
+            base_url=CONFIG['BACKEND_URL'],
+            printer_key=CONFIG['PRINTER_KEY'],
+            max_retries=CONFIG['MAX_RETRIES'],
+            storage=JobStorage(
+                base_dir=CONFIG['TEMP_DIR'],
+                max_bytes=CONFIG['STORAGE_MAX_MB'] * 1024 * 1024
+            )
+        )
+        self.backend.storage.sweep_orphans()
+        self.preflight = Preflight()
+        self.monitor = PrinterMonitor(interval=CONFIG['PRINTER_MONITOR_INTERVAL'])
+        self.printer = PrinterService(monitor=self.monitor)
+        self.pipeline = build_pipeline(self.backend, self.printer, preflight=self.preflight)
         
         # Initialize GUI
         self.gui = AutoPrintGUI(self.root, self.process_code)
@@ -423,72 +324,39 @@ class AutoPrintApp:
         ).start()
     
     def _workflow(self, code):
-        """Main workflow"""
-        try:
-            print(f"\n{'='*60}")
-            print(f"🔎 Processing: {code}")
-            print(f"{'='*60}\n")
-            
-            # Step 1: Verify
-            verify_res = self.backend.verify_code(code)
-            if not verify_res or not verify_res.get("success"):
-                self.gui.show_error("Invalid Code")
-                return
-            
-            order_id = verify_res.get("orderId")
-            if not order_id:
-                self.gui.show_error("Invalid Order")
-                return
-            
-            self.gui.show_success("Code Verified!")
-            
-            # Step 2: Download
-            download_res = self.backend.download_files(verify_res)
-            if not download_res or not download_res.get("success"):
-                self.gui.show_error("Download Failed")
-                return
-            
-            files = download_res.get("files", [])
-            if not files:
-                self.gui.show_error("No Files")
-                return
-            
-            # Step 3: Print (Directly after download)
-            self.gui.show_success("Printing in progress...")
-            print_settings = verify_res.get("printSettings", {})
-            
-            success = self.printer.print_job(
-                files,
-                {"duplex": print_settings.get("doubleSide", False)}
-            )
-            
-            if not success:
-                self.gui.show_error("Printing Failed or Printer Unavailable")
-                return
-            
-            # Step 4: Mark Complete
-            self.backend.mark_as_printed(order_id)
-            logger.info(f"Order {order_id} completed")
-            
-            self.gui.show_success("Printed Successfully!")
-            self.root.after(5000, self.gui.reset_ui)
-            
-        except Exception as e:
-            logger.exception(f"Workflow error: {e}")
-            self.gui.show_error("System Error")
+        """Main workflow (verify -> download -> preflight -> print -> mark)"""
+        print(f"\n{'='*60}")
+        print(f"🔎 Processing: {code}")
+        print(f"{'='*60}\n")
+        
+        result = self.pipeline.run(code, on_status=self.gui.show_success)
+        if not result["success"]:
+            self.gui.show_error(result["message"])
+            return
+        
+        logger.info(f"Order {result['order_id']} completed")
+        self.gui.show_success("Printed Successfully!")
+        self.root.after(5000, self.gui.reset_ui)
     
     def run(self):
-        """Start application"""
+        """Start application (window first, hardware and printer in the background)"""
+        (Warmup()
+            .add("printer", self.monitor.start)
+            .add("printer_name", self.printer.check_printer_available)
+            .add("arduino", self._start_arduino)
+            .start())
+        self.root.mainloop()
+    
+    def _start_arduino(self):
         if self.arduino.start():
             print("\n" + "="*60)
             print("🚀 AUTO-PRINT SYSTEM ONLINE")
             print("="*60 + "\n")
             logger.info("System started")
-        else:
-            print("\n❌ Arduino not detected")
-            self.gui.show_error("Arduino Disconnected")
-        
-        self.root.mainloop()
+            return True
+        print("\n❌ Arduino not detected")
+        self.root.after(0, self.gui.show_error, "Arduino Disconnected")
+        return False
 
 # ============================================================================
 # ENTRY POINT
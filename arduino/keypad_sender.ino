@@ -26,8 +26,19 @@ byte colPins[COLS] = {5, 4, 3, 2};
 // Create the Keypad
 Keypad keypad = Keypad(makeKeymap(keys), rowPins, colPins, ROWS, COLS);
 
+// Holding '#' this long cancels the order in progress
+const unsigned int CANCEL_HOLD_MS = 1000;
+
+void keypadEvent(KeypadEvent key) {
+  if (keypad.getState() == HOLD && key == '#') {
+    Serial.println("CANCEL");
+  }
+}
+
 void setup() {
   Serial.begin(9600); // Same baud rate as Raspberry Pi
+  keypad.setHoldTime(CANCEL_HOLD_MS);
+  keypad.addEventListener(keypadEvent);
 }
 
 void loop() {
@@ -38,7 +49,7 @@ void loop() {
     if ((key >= '0' && key <= '9') || (key >= 'A' && key <= 'D')) {
       Serial.println(key); 
     }
-    // Use '#' as Clear
+    // Use '#' as Clear (held: Cancel, see keypadEvent)
     else if (key == '#') {
       Serial.println("CLEAR");
     }
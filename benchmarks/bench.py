@@ -0,0 +1,362 @@
+"""
+End-to-end benchmark: customer arrival trace -> real kiosk code -> report.
+
+Starts a fake backend, fake CDN and fake IPP printer in a separate process
+(so their memory is not counted), then pushes every order of the trace
+through the real BackendService, Preflight, PrintScheduler and SmartPrinter
+(IPP transport) via the standard pipeline.
+
+    python -m benchmarks.bench                          # synthetic peak hour
+    python -m benchmarks.bench trace.jsonl --speedup 120
+    python -m benchmarks.bench --orders 40 --pdf-kb-per-page 400 --json out.json
+
+Trace format is the scheduler's ({"arrival", "pages", "type"}), so the same
+file can be fed to `python -m services.scheduler` for the simulated view.
+
+Reports throughput, per-stage latency percentiles (p50/p90/p99/max),
+end-to-end latency and peak memory.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from benchmarks.fake_services import FakeBackend, FakeCdn
+from fake_ipp_server import FakeIppServer
+from services.backend_service import BackendService
+from services.job_storage import JobStorage
+from services.preflight import Preflight
+from services.scheduler import PrintScheduler, POLICIES, load_trace, synthetic_trace
+from services.smart_printer import SmartPrinter
+from services.pipeline import build_pipeline
+
+PRINTER_KEY = "BENCH_PRINTER"
+
+
+# ==========================================================
+# FAKE SERVICES (CHILD PROCESS)
+# ==========================================================
+
+def _serve_fakes(conn, orders, options):
+    """Run backend + CDN + IPP printer until the parent says stop."""
+    backend = FakeBackend(latency=options["backend_latency"], printer_key=PRINTER_KEY)
+    cdn = FakeCdn(latency=options["cdn_latency"], bandwidth=options["bandwidth"])
+    printer = FakeIppServer(pages_per_second=options["printer_pps"])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        backend.start()
+        cdn.start()
+        printer.start()
+
+    for order in orders:
+        urls = [
+            cdn.pdf_url(f"{order['code']}-{i}", pages=pages, size=pages * options["page_bytes"])
+            for i, pages in enumerate(order["files"])
+        ]
+        backend.add_order(
+            order["code"],
+            urls,
+            print_settings={"copies": order["copies"], "color": "BW"},
+            page_count=sum(order["files"]),
+            orderType=order.get("type")
+        )
+
+    conn.send({"backend": backend.url, "cdn": cdn.url, "printer": printer.url})
+    conn.recv()
+    conn.send({
+        "backend_requests": backend.requests,
+        "cdn_requests": cdn.requests,
+        "printed": len(backend.printed),
+        "ipp_jobs": len(printer.jobs),
+    })
+    for server in (backend, cdn, printer):
+        server.stop()
+
+
+# ==========================================================
+# RECORDING
+# ==========================================================
+
+class SampleRecorder:
+    """
+    Telemetry stand-in for the pipeline: keeps every raw sample
+    (TelemetryAgent only keeps histograms) so exact percentiles can be taken.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+
+class MemorySampler:
+    """Samples this process's RSS from /proc while the benchmark runs."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def rss_kb():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, self.rss_kb())
+
+    def start(self):
+        self.peak_kb = self.rss_kb()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+# ==========================================================
+# TRACE
+# ==========================================================
+
+def build_orders(trace, files_per_order=1, copies=1):
+    """Trace entries -> orders with pickup codes and per-file page counts."""
+    orders = []
+    for index, entry in enumerate(sorted(trace, key=lambda e: e["arrival"])):
+        pages = max(1, int(entry["pages"]))
+        count = max(1, min(files_per_order, pages))
+        files = [pages // count + (1 if i < pages % count else 0) for i in range(count)]
+        orders.append({
+            "code": f"{100000 + index}",
+            "arrival": entry["arrival"],
+            "files": files,
+            "copies": copies,
+            "type": entry.get("type"),
+        })
+    return orders
+
+
+# ==========================================================
+# RUN
+# ==========================================================
+
+def run_benchmark(orders, policy="sjf", speedup=60.0, printer_pps=10.0, page_bytes=50 * 1024,
+                  backend_latency=0.02, cdn_latency=0.05, bandwidth=None, preflight=True,
+                  stream_pdfs=False, trace_memory=False, verbose=False):
+    options = {
+        "backend_latency": backend_latency,
+        "cdn_latency": cdn_latency,
+        "bandwidth": bandwidth,
+        "printer_pps": printer_pps,
+        "page_bytes": page_bytes,
+    }
+    parent, child = multiprocessing.Pipe()
+    fakes = multiprocessing.Process(target=_serve_fakes, args=(child, orders, options), daemon=True)
+    fakes.start()
+    urls = parent.recv()
+
+    workdir = tempfile.mkdtemp(prefix="autoprint-bench-")
+    storage = JobStorage(base_dir=os.path.join(workdir, "jobs"))
+    backend = BackendService(base_url=urls["backend"], printer_key=PRINTER_KEY, storage=storage)
+    printer = SmartPrinter(printer_name="FakePrinter", transport="ipp", ipp_url=urls["printer"])
+    printer.poll_interval = 0.1
+    scheduler = PrintScheduler(printer, policy=policy)
+    recorder = SampleRecorder()
+    pipeline = build_pipeline(
+        backend,
+        printer,
+        preflight=Preflight(cache_dir=os.path.join(workdir, "preflight")) if preflight else None,
+        scheduler=scheduler,
+        telemetry=recorder,
+        stream_pdfs=stream_pdfs
+    )
+
+    results = []
+    memory = MemorySampler()
+
+    def customer(order, start):
+        result = pipeline.run(order["code"])
+        results.append(dict(
+            result,
+            code=order["code"],
+            latency=time.monotonic() - start,
+            pages=sum(order["files"]) * order["copies"]
+        ))
+
+    # The kiosk code prints a lot; keep the report readable
+    devnull = open(os.devnull, "w")
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+    if trace_memory:
+        tracemalloc.start()
+    memory.start()
+    threads = []
+    with quiet:
+        scheduler.start()
+        backend.warm_up()
+        began = time.monotonic()
+        for order in orders:
+            due = began + order["arrival"] / speedup
+            time.sleep(max(0.0, due - time.monotonic()))
+            thread = threading.Thread(target=customer, args=(order, time.monotonic()), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - began
+    memory.stop()
+    devnull.close()
+
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # Preflight workers are reaped children; the fake services are still running
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    parent.send("stop")
+    served = parent.recv()
+    fakes.join(5)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    printed = [r for r in results if r["success"]]
+    failures = {}
+    for r in results:
+        if not r["success"]:
+            failures[r["error"]] = failures.get(r["error"], 0) + 1
+
+    return {
+        "orders": len(orders),
+        "printed": len(printed),
+        "failures": failures,
+        "elapsed_s": round(elapsed, 2),
+        "throughput": {
+            "orders_per_min": round(len(printed) / elapsed * 60, 2) if elapsed else 0,
+            "pages_per_min": round(sum(r["pages"] for r in printed) / elapsed * 60, 1) if elapsed else 0,
+        },
+        "end_to_end": percentiles([r["latency"] for r in printed]),
+        "stages": {
+            name[len("stage."):]: percentiles(values)
+            for name, values in recorder.samples.items() if name.startswith("stage.")
+        },
+        "memory": {
+            "peak_rss_kb": memory.peak_kb,
+            "ru_maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "children_maxrss_kb": children_kb,
+            "traced_peak_kb": traced_peak // 1024 if traced_peak is not None else None,
+        },
+        "counters": recorder.counters,
+        "fakes": served,
+    }
+
+
+def print_report(report):
+    print(f"\n📊 {report['printed']}/{report['orders']} orders printed in {report['elapsed_s']}s")
+    if report["failures"]:
+        print(f"❌ Failures: {report['failures']}")
+    print(f"   Throughput: {report['throughput']['orders_per_min']} orders/min, "
+          f"{report['throughput']['pages_per_min']} pages/min")
+
+    print(f"\n{'stage':<12}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    rows = list(report["stages"].items()) + [("end-to-end", report["end_to_end"])]
+    for name, stats in rows:
+        if not stats["count"]:
+            continue
+        print(f"{name:<12}{stats['count']:>7}{stats['p50']:>9}{stats['p90']:>9}"
+              f"{stats['p99']:>9}{stats['max']:>9}")
+
+    memory = report["memory"]
+    print(f"\n💾 Peak RSS {memory['peak_rss_kb'] // 1024} MB "
+          f"(ru_maxrss {memory['ru_maxrss_kb'] // 1024} MB, "
+          f"preflight workers {memory['children_maxrss_kb'] // 1024} MB)")
+    if memory["traced_peak_kb"] is not None:
+        print(f"   Python heap peak {memory['traced_peak_kb'] // 1024} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the kiosk against local fake services")
+    parser.add_argument("trace", nargs="?", help="trace file (omit for a synthetic peak hour)")
+    parser.add_argument("--orders", type=int, default=30, help="synthetic trace: number of orders")
+    parser.add_argument("--minutes", type=float, default=60, help="synthetic trace: arrival window")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--speedup", type=float, default=60, help="trace time compression")
+    parser.add_argument("--files", type=int, default=1, help="files per order")
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="sjf")
+    parser.add_argument("--printer-pps", type=float, default=10, help="fake printer pages per second")
+    parser.add_argument("--pdf-kb-per-page", type=int, default=50)
+    parser.add_argument("--backend-latency", type=float, default=0.02)
+    parser.add_argument("--cdn-latency", type=float, default=0.05)
+    parser.add_argument("--bandwidth-kbps", type=int, default=0, help="CDN bandwidth per download, 0 = unthrottled")
+    parser.add_argument("--no-preflight", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="stream PDFs straight to the printer")
+    parser.add_argument("--tracemalloc", action="store_true", help="also track the Python heap peak")
+    parser.add_argument("--verbose", action="store_true", help="show kiosk output")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.orders, args.minutes, args.seed)
+    orders = build_orders(trace, files_per_order=args.files, copies=args.copies)
+    print(f"🏁 {len(orders)} orders, {sum(sum(o['files']) for o in orders)} pages, "
+          f"speedup x{args.speedup}, policy {args.policy}")
+
+    report = run_benchmark(
+        orders,
+        policy=args.policy,
+        speedup=args.speedup,
+        printer_pps=args.printer_pps,
+        page_bytes=args.pdf_kb_per_page * 1024,
+        backend_latency=args.backend_latency,
+        cdn_latency=args.cdn_latency,
+        bandwidth=args.bandwidth_kbps * 1024 or None,
+        preflight=not args.no_preflight,
+        stream_pdfs=args.stream,
+        trace_memory=args.tracemalloc,
+        verbose=args.verbose,
+    )
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
@@ -0,0 +1,340 @@
+"""
+Local stand-ins for the backend and Cloudinary, so the real BackendService
+can run against something measurable.
+
+FakeBackend  /verify-pickup-code, /mark-printed (x-printer-key checked)
+FakeCdn      /files/<name>.pdf?pages=N&size=BYTES  generated PDFs
+             /files/<name>.jpg?width=W&height=H    generated JPEGs
+             with configurable first-byte latency and bandwidth
+
+Both take a Faults plan for soak runs (extra latency, hangs past the
+client timeout, 5xx answers, bodies cut short of their Content-Length).
+"""
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CHUNK_SIZE = 64 * 1024
+
+
+# ==========================================================
+# DOCUMENT GENERATION
+# ==========================================================
+
+def make_pdf(pages=1, size=0, tag=""):
+    """
+    A valid PDF with `pages` pages, padded to roughly `size` bytes.
+    `tag` goes into a comment so equal-sized files still hash differently
+    (otherwise the preflight cache would answer every order after the first).
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(pages)), pages
+        )).encode(),
+    ]
+    for i in range(pages):
+        content = f"BT /F1 24 Tf 72 720 Td (Benchmark page {i + 1}) Tj ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    # Pad with an unreferenced stream object (scanned-image stand-in)
+    overhead = 200 + sum(len(o) + 20 for o in objects)
+    if size > overhead:
+        padding = b"0" * (size - overhead)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(padding), padding))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    if tag:
+        out.write(b"%% %s\n" % tag.encode())
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_jpeg(width=1200, height=1600):
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+# ==========================================================
+# FAULT INJECTION
+# ==========================================================
+
+class Faults:
+    """Per-request fault plan; `injected` counts what was actually served."""
+
+    KINDS = ("error", "hang", "truncate", "slow")
+
+    def __init__(self, error_rate=0.0, hang_rate=0.0, truncate_rate=0.0, slow_rate=0.0,
+                 hang_seconds=40.0, slow_seconds=3.0, seed=1):
+        """
+        Args:
+            error_rate: answer 503
+            hang_rate: sleep `hang_seconds` first (past the client's timeout)
+            truncate_rate: close the connection halfway through the body
+            slow_rate: add `slow_seconds` of latency
+        """
+        self.rates = {
+            "error": error_rate,
+            "hang": hang_rate,
+            "truncate": truncate_rate,
+            "slow": slow_rate,
+        }
+        self.hang_seconds = hang_seconds
+        self.slow_seconds = slow_seconds
+        self.injected = {kind: 0 for kind in self.KINDS}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """The fault for this request, or None."""
+        with self._lock:
+            roll = self._rng.random()
+            for kind in self.KINDS:
+                if roll < self.rates[kind]:
+                    self.injected[kind] += 1
+                    return kind
+                roll -= self.rates[kind]
+        return None
+
+    def delay(self, fault):
+        if fault == "hang":
+            time.sleep(self.hang_seconds)
+        elif fault == "slow":
+            time.sleep(self.slow_seconds)
+
+
+NO_FAULTS = Faults()
+
+
+# ==========================================================
+# SHARED SERVER PLUMBING
+# ==========================================================
+
+class _Server:
+    handler = None
+
+    def __init__(self, host="127.0.0.1", port=0, faults=None):
+        handler = type("Handler", (self.handler,), {"state": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self.faults = faults or NO_FAULTS
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ==========================================================
+# FAKE BACKEND
+# ==========================================================
+
+class _BackendHandler(_JsonHandler):
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        state = self.state
+        state.requests += 1
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(state.latency)
+
+        fault = state.faults.pick()
+        state.faults.delay(fault)
+        if fault in ("error", "truncate"):
+            return self._reply(503, {"success": False, "error": "Service Unavailable"})
+
+        if self.headers.get("x-printer-key") != state.printer_key:
+            return self._reply(403, {"success": False, "error": "Forbidden"})
+
+        if self.path == "/verify-pickup-code":
+            code = str(data.get("pickupCode", ""))
+            order = state.orders.get(code)
+            if order is None and state.order_factory:
+                order = state.orders[code] = state.order_factory(code)
+            if order is None:
+                return self._reply(404, {"success": False, "error": "Invalid code"})
+            if order["orderId"] in state.printed:
+                return self._reply(400, {"success": False, "error": "Order not printable"})
+            return self._reply(200, dict(order, success=True))
+
+        if self.path == "/mark-printed":
+            state.printed.add(data.get("orderId"))
+            return self._reply(200, {"success": True})
+
+        self._reply(404, {"success": False, "error": "Not found"})
+
+
+class FakeBackend(_Server):
+    handler = _BackendHandler
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.02, printer_key="LOCAL_PRINTER",
+                 faults=None, order_factory=None):
+        """
+        Args:
+            order_factory: callable(code) -> order dict for codes that were
+                           never added (open-ended soak runs)
+        """
+        super().__init__(host, port, faults)
+        self.latency = latency
+        self.printer_key = printer_key
+        self.order_factory = order_factory
+        self.orders = {}
+        self.printed = set()
+
+    def add_order(self, code, file_urls, print_settings=None, page_count=None, **extra):
+        order = {
+            "orderId": f"order-{code}",
+            "fileUrls": file_urls,
+            "printSettings": print_settings or {"copies": 1, "color": "BW"},
+        }
+        if page_count:
+            order["pageCount"] = page_count
+        order.update(extra)
+        self.orders[code] = order
+        return order
+
+
+# ==========================================================
+# FAKE CDN
+# ==========================================================
+
+class _CdnHandler(BaseHTTPRequestHandler):
+    state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.state
+        state.requests += 1
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        fault = state.faults.pick()
+        state.faults.delay(fault)
+        if fault == "error":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if parts.path.endswith(".jpg"):
+            body = state.jpeg(int(query.get("width", 1200)), int(query.get("height", 1600)))
+            content_type = "image/jpeg"
+        else:
+            name = parts.path.rsplit("/", 1)[-1]
+            body = make_pdf(int(query.get("pages", 1)), int(query.get("size", 0)), tag=name)
+            content_type = "application/pdf"
+
+        time.sleep(state.latency)
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        start = 0
+        requested = self.headers.get("Range", "")
+        if state.ranges and requested.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(requested[len("bytes="):].split("-")[0] or 0)
+        if start:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.send_header("ETag", etag)
+        if state.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        # A truncated answer still promises the full Content-Length
+        end = start + (len(body) - start) // 2 if fault == "truncate" else len(body)
+        for offset in range(start, end, CHUNK_SIZE):
+            chunk = body[offset:min(offset + CHUNK_SIZE, end)]
+            self.wfile.write(chunk)
+            if state.bandwidth:
+                time.sleep(len(chunk) / state.bandwidth)
+        if fault == "truncate":
+            self.close_connection = True
+
+
+class FakeCdn(_Server):
+    handler = _CdnHandler
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, bandwidth=None, faults=None, ranges=True):
+        """
+        Args:
+            latency: seconds before the first byte
+            bandwidth: bytes per second per download (None = unthrottled)
+            ranges: honour Range / If-Range like Cloudinary does
+        """
+        super().__init__(host, port, faults)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self._jpegs = {}
+        self._lock = threading.Lock()
+
+    def jpeg(self, width, height):
+        # JPEG encoding is slow enough to skew latency, so sizes are cached
+        key = (width, height)
+        with self._lock:
+            body = self._jpegs.get(key)
+        if body is None:
+            body = make_jpeg(width, height)
+            with self._lock:
+                self._jpegs[key] = body
+        return body
+
+    def pdf_url(self, name, pages=1, size=0):
+        return f"{self.url}/files/{name}.pdf?pages={pages}&size={size}"
+
+    def jpeg_url(self, name, width=1200, height=1600):
+        return f"{self.url}/files/{name}.jpg?width={width}&height={height}"
@@ -0,0 +1,142 @@
+"""
+BW image conversion benchmark: the old RGB path vs the single-channel modes.
+
+For each image it times conversion to PDF, measures the PDF bytes, submits
+the PDF to the fake IPP printer (spool time), and, when Ghostscript is
+installed, rasterizes it to gray at 300 dpi the way a CUPS filter would for
+ColorModel=Gray.
+
+    python -m benchmarks.grayscale                 # synthetic photo + document
+    python -m benchmarks.grayscale scan1.jpg photo.png --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from fake_ipp_server import FakeIppServer
+from services.image_convert import image_to_pdf, np
+from services.ipp_client import IppClient
+
+# (label, color, bw_mode); "rgb" is what download_files did before
+PATHS = [
+    ("rgb", "COLOR", None),
+    ("gray", "BW", "gray"),
+    ("dither", "BW", "dither"),
+    ("threshold", "BW", "threshold"),
+]
+
+
+def synthetic_images(width=3000, height=4000):
+    """A phone photo stand-in and a photographed page of text."""
+    photo = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+        Image.linear_gradient("L").rotate(90).resize((width, height)),
+    ])
+    draw = ImageDraw.Draw(photo)
+    for i in range(12):
+        x, y = (i * 397) % width, (i * 631) % height
+        draw.ellipse((x, y, x + 600, y + 450), fill=((i * 40) % 255, 90, 200 - i * 10))
+    photo = photo.filter(ImageFilter.GaussianBlur(6))
+
+    document = Image.new("RGB", (width, height), (236, 230, 214))
+    draw = ImageDraw.Draw(document)
+    for line in range(60):
+        y = 200 + line * 60
+        for word in range(14):
+            x = 180 + word * 190
+            draw.rectangle((x, y, x + 20 + (line * word) % 150, y + 28), fill=(40, 40, 55))
+    document = document.filter(ImageFilter.GaussianBlur(1))
+    return {"photo": photo, "document": document}
+
+
+def rasterize_seconds(pdf_path):
+    """Time a 300 dpi gray render (what CUPS does for ColorModel=Gray)."""
+    start = time.perf_counter()
+    subprocess.run(
+        ["gs", "-q", "-dNOPAUSE", "-dBATCH", "-sDEVICE=pgmraw", "-r300", "-sOutputFile=/dev/null", pdf_path],
+        capture_output=True,
+        timeout=120
+    )
+    return time.perf_counter() - start
+
+
+def run(images, repeat=3):
+    printer = FakeIppServer(pages_per_second=1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        printer.start()
+    client = IppClient(printer.url)
+    workdir = tempfile.mkdtemp(prefix="autoprint-gray-")
+    has_gs = shutil.which("gs") is not None
+    rows = []
+
+    try:
+        for name, image in images.items():
+            for label, color, bw_mode in PATHS:
+                path = os.path.join(workdir, f"{name}-{label}.pdf")
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    with open(path, "wb") as f:
+                        if bw_mode is None:
+                            image_to_pdf(image, f, color="COLOR")
+                        else:
+                            image_to_pdf(image, f, color=color, bw_mode=bw_mode)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                start = time.perf_counter()
+                client.print_job(printer.printer_name, path, job_name=os.path.basename(path))
+                spool = time.perf_counter() - start
+
+                rows.append({
+                    "image": name,
+                    "path": label,
+                    "bytes": os.path.getsize(path),
+                    "convert_s": round(best, 3),
+                    "spool_s": round(spool, 3),
+                    "raster_s": round(rasterize_seconds(path), 3) if has_gs else None,
+                })
+    finally:
+        printer.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'image':<12}{'path':<11}{'PDF KB':>9}{'vs rgb':>8}{'convert s':>11}{'spool s':>9}{'raster s':>10}")
+    baseline = {}
+    for row in rows:
+        if row["path"] == "rgb":
+            baseline[row["image"]] = row["bytes"]
+        ratio = row["bytes"] / baseline[row["image"]] if baseline.get(row["image"]) else 1
+        raster = row["raster_s"] if row["raster_s"] is not None else "-"
+        print(f"{row['image']:<12}{row['path']:<11}{row['bytes'] // 1024:>9}{ratio:>8.2f}"
+              f"{row['convert_s']:>11}{row['spool_s']:>9}{raster:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare BW image conversion paths")
+    parser.add_argument("images", nargs="*", help="image files (omit for synthetic ones)")
+    parser.add_argument("--repeat", type=int, default=3, help="conversions per path (best time kept)")
+    args = parser.parse_args()
+
+    if args.images:
+        images = {}
+        for path in args.images:
+            with Image.open(path) as image:
+                image.load()
+                images[os.path.basename(path)[:11]] = image
+    else:
+        images = synthetic_images()
+
+    print(f"🧪 NumPy {'on' if np is not None else 'off (PIL lookup tables)'}, "
+          f"Ghostscript {'on' if shutil.which('gs') else 'off'}")
+    print_rows(run(images, args.repeat))
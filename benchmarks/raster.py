@@ -0,0 +1,116 @@
+"""
+Pre-rasterization benchmark: CUPS-style rendering vs the parallel Rasterizer.
+
+"cups" renders every page with one Ghostscript process, which is what the
+gstoraster filter does for a job after `lp` returns. "parallel" is the
+Rasterizer splitting the pages over --workers processes, "cached" is a
+reprint of the same file. With --printer, both paths are also timed end to
+end on a real CUPS queue (submit until the job completes).
+
+    python -m benchmarks.raster                          # synthetic 20-page scan
+    python -m benchmarks.raster thesis.pdf --format pcl --workers 4
+    python -m benchmarks.raster --printer Office_Laser --pages 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.grayscale import synthetic_images
+from services.preflight import analyze_pdf
+from services.rasterizer import Rasterizer, FORMATS, gs_device_args
+from services.smart_printer import SmartPrinter
+
+
+def synthetic_pdf(path, pages=20, dpi=150):
+    """Alternating photographed text pages and photos, A4 at `dpi`."""
+    images = synthetic_images(round(8.27 * dpi), round(11.69 * dpi))
+    sequence = [images["document" if i % 2 == 0 else "photo"].convert("L") for i in range(pages)]
+    sequence[0].save(path, "PDF", resolution=float(dpi), save_all=True, append_images=sequence[1:])
+
+
+def time_cups_style(pdf_path, out_path, fmt, settings, dpi):
+    """One gs over the whole document (the single-threaded CUPS filter)."""
+    cmd = gs_device_args(fmt, settings["color"], dpi, settings.get("media"))
+    start = time.perf_counter()
+    subprocess.run(cmd + [f"-sOutputFile={out_path}", pdf_path], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def time_end_to_end(printer_name, item, settings):
+    printer = SmartPrinter(printer_name=printer_name)
+    printer.poll_interval = 0.5
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = printer.print_file(item, settings)
+    return time.perf_counter() - start if ok else None
+
+
+def run(pdf_path, fmt="pwg", dpi=300, workers=4, color="BW", printer_name=None):
+    pages = analyze_pdf(pdf_path)["pages"]
+    settings = {"color": color, "media": "A4", "copies": 1}
+    workdir = tempfile.mkdtemp(prefix="autoprint-raster-")
+    rows = []
+
+    try:
+        cups_out = os.path.join(workdir, f"cups.{FORMATS[fmt][1]}")
+        seconds = time_cups_style(pdf_path, cups_out, fmt, settings, dpi)
+        rows.append(("cups", seconds, os.path.getsize(cups_out)))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            rasterizer = Rasterizer(fmt=fmt, dpi=dpi, workers=workers, cache_dir=os.path.join(workdir, "cache"))
+        for label in ("parallel", "cached"):
+            start = time.perf_counter()
+            result = rasterizer.render(pdf_path, settings, page_count=pages)
+            seconds = time.perf_counter() - start
+            if not result["ok"]:
+                raise RuntimeError("Rasterizer failed; check that gs has the device for this format")
+            rows.append((label, seconds, os.path.getsize(result["path"])))
+
+        if printer_name:
+            seconds = time_end_to_end(printer_name, {"path": pdf_path}, settings)
+            rows.append(("lp pdf (e2e)", seconds, os.path.getsize(pdf_path)))
+            raster = {"path": result["path"], "mime": result["mime"], "format": fmt}
+            seconds = time_end_to_end(printer_name, {"path": pdf_path, "raster": raster}, settings)
+            rows.append(("lp raw (e2e)", seconds, os.path.getsize(result["path"])))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return pages, rows
+
+
+def print_rows(pages, rows):
+    print(f"{'path':<15}{'seconds':>9}{'pages/s':>9}{'vs cups':>9}{'MB':>9}")
+    baseline = rows[0][1]
+    for label, seconds, size in rows:
+        if seconds is None:
+            print(f"{label:<15}{'failed':>9}")
+            continue
+        print(f"{label:<15}{seconds:>9.2f}{pages / max(seconds, 1e-6):>9.1f}"
+              f"{baseline / max(seconds, 1e-6):>8.1f}x{size / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare CUPS-style and parallel pre-rasterization")
+    parser.add_argument("pdf", nargs="?", help="PDF to render (omit for a synthetic scan)")
+    parser.add_argument("--pages", type=int, default=20, help="pages in the synthetic PDF")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="pwg")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--color", choices=("BW", "COLOR"), default="BW")
+    parser.add_argument("--printer", help="CUPS queue for an end-to-end comparison (prints twice!)")
+    args = parser.parse_args()
+
+    if not shutil.which("gs"):
+        raise SystemExit("❌ Ghostscript (gs) is required for this benchmark")
+
+    pdf_path = args.pdf
+    if not pdf_path:
+        pdf_path = os.path.join(tempfile.gettempdir(), f"autoprint-raster-{args.pages}p.pdf")
+        synthetic_pdf(pdf_path, args.pages)
+
+    print(f"🧪 {args.format.upper()} at {args.dpi} dpi, {args.workers} workers")
+    print_rows(*run(pdf_path, args.format, args.dpi, args.workers, args.color, args.printer))
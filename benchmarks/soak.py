@@ -0,0 +1,470 @@
+"""
+Soak / chaos run: hours of traffic against local stand-ins with faults.
+
+Codes are typed through the real ArduinoSerialReader (over a simulated
+serial port), verified and downloaded by the real BackendService, checked
+by Preflight, queued by PrintScheduler and printed by SmartPrinter over IPP,
+with PrinterMonitor polling a stand-in lpstat. Meanwhile it injects:
+
+    backend   extra latency, hangs past the client timeout, 503s
+    CDN       the same, plus bodies cut short of their Content-Length
+    printer   jobs that abort halfway
+    lpstat    hangs past the monitor's 5 s timeout
+    serial    disconnects (keys typed meanwhile are lost)
+
+and samples thread count, open fds, RSS, temp-dir size and throughput over
+time, flagging anything that keeps growing.
+
+    python -m benchmarks.soak --minutes 240 --rate 2 --out soak.jsonl
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench import MemorySampler, SampleRecorder, percentiles, PRINTER_KEY
+from benchmarks.fake_services import FakeBackend, FakeCdn, Faults, make_pdf
+from fake_ipp_server import FakeIppServer
+from hardware.serial_reader import ArduinoSerialReader
+from services.backend_service import BackendService
+from services.job_storage import JobStorage
+from services.preflight import Preflight
+from services.printer_monitor import PrinterMonitor
+from services.scheduler import PrintScheduler
+from services.smart_printer import SmartPrinter
+from services.pipeline import build_pipeline
+
+# Metrics that should stay flat over a long run
+LEAK_METRICS = ("threads", "fds", "rss_kb", "temp_bytes")
+
+# Stand-in for lpstat/lpoptions; hangs with probability SOAK_LPSTAT_HANG_RATE
+FAKE_CUPS_TOOL = '''#!{python}
+import os, random, sys, time
+if random.random() < float(os.environ.get("SOAK_LPSTAT_HANG_RATE", "0")):
+    time.sleep(30)
+name = os.path.basename(sys.argv[0])
+args = sys.argv[1:]
+if name == "lpoptions":
+    print("Duplex/2-Sided Printing: *None DuplexNoTumble")
+    print("ColorModel/Color Mode: *Gray RGB")
+elif "-d" in args:
+    print("system default destination: {printer}")
+elif "-p" in args:
+    print("printer {printer} is idle.  enabled since Mon 01 Jan 2024")
+'''
+
+
+# ==========================================================
+# FAKE SERVICES (CHILD PROCESS)
+# ==========================================================
+
+def _serve_chaos(conn, options):
+    """Backend + CDN + IPP printer with faults, until the parent says stop."""
+    rng = random.Random(options["seed"])
+    cdn = FakeCdn(
+        latency=options["cdn_latency"],
+        faults=Faults(seed=options["seed"], hang_seconds=options["hang_seconds"], **options["cdn_faults"])
+    )
+
+    def new_order(code):
+        # Mostly short orders, the odd long thesis
+        pages = rng.choice([1, 1, 2, 3, 5, 8, 12]) if rng.random() > 0.05 else rng.randint(60, 150)
+        name = f"{code}-{int(time.time() * 1000)}"
+        size = pages * options["page_bytes"]
+        return {
+            "orderId": f"order-{code}-{int(time.time())}",
+            "fileUrls": [cdn.pdf_url(name, pages=pages, size=size)],
+            # Lets the kiosk verify resumed downloads end to end
+            "fileHashes": ["sha256:" + hashlib.sha256(make_pdf(pages, size, tag=f"{name}.pdf")).hexdigest()],
+            "printSettings": {"copies": 1, "color": "BW"},
+            "pageCount": pages,
+        }
+
+    backend = FakeBackend(
+        latency=options["backend_latency"],
+        printer_key=PRINTER_KEY,
+        faults=Faults(seed=options["seed"] + 1, hang_seconds=options["hang_seconds"], **options["backend_faults"]),
+        order_factory=new_order
+    )
+    printer = FakeIppServer(pages_per_second=options["printer_pps"], fail_rate=options["print_fail"],
+                            seed=options["seed"])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for server in (backend, cdn, printer):
+            server.start()
+
+    conn.send({"backend": backend.url, "cdn": cdn.url, "printer": printer.url})
+    conn.recv()
+    conn.send({
+        "backend_faults": backend.faults.injected,
+        "cdn_faults": cdn.faults.injected,
+        "ipp_jobs": len(printer.jobs),
+        "ipp_aborted": sum(1 for job in printer.jobs.values() if job["fails_at"] is not None),
+    })
+    for server in (backend, cdn, printer):
+        server.stop()
+
+
+def install_fake_cups(bin_dir, printer_name, hang_rate):
+    """Put stand-in lpstat/lpoptions first on PATH."""
+    os.makedirs(bin_dir, exist_ok=True)
+    script = FAKE_CUPS_TOOL.format(python=sys.executable, printer=printer_name)
+    for tool in ("lpstat", "lpoptions"):
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["SOAK_LPSTAT_HANG_RATE"] = str(hang_rate)
+
+
+# ==========================================================
+# SIMULATED KEYPAD SERIAL PORT
+# ==========================================================
+
+class ChaosSerial:
+    """
+    Stands in for serial.Serial under ArduinoSerialReader: one key per
+    line, and disconnect() makes reads fail like an unplugged USB cable.
+    """
+
+    def __init__(self):
+        self._lines = []
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.lost_keys = 0
+        self.disconnects = 0
+        self.read_errors = 0
+
+    def type(self, key):
+        with self._lock:
+            if time.time() < self._down_until:
+                self.lost_keys += 1
+            else:
+                self._lines.append(key)
+
+    def disconnect(self, seconds):
+        with self._lock:
+            self._down_until = time.time() + seconds
+            self._lines.clear()
+            self.disconnects += 1
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            if time.time() < self._down_until:
+                self.read_errors += 1
+                raise OSError("device reports readiness to read but returned no data")
+            return len(self._lines)
+
+    def readline(self):
+        with self._lock:
+            return (self._lines.pop(0) + "\n").encode() if self._lines else b""
+
+    def close(self):
+        pass
+
+
+# ==========================================================
+# SAMPLING
+# ==========================================================
+
+def count_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def find_growth(samples):
+    """Compare the first and last fifth of the run for each leak metric."""
+    if len(samples) < 10:
+        return {}
+    fifth = max(1, len(samples) // 5)
+    head, tail = samples[:fifth], samples[-fifth:]
+    growth = {}
+    for metric in LEAK_METRICS + ("orders_per_min",):
+        before = sum(s[metric] or 0 for s in head) / fifth
+        after = sum(s[metric] or 0 for s in tail) / fifth
+        growth[metric] = {"start": round(before, 1), "end": round(after, 1)}
+    return growth
+
+
+# ==========================================================
+# RUN
+# ==========================================================
+
+class SoakRun:
+    def __init__(self, urls, workdir, sample_interval=30, out=None):
+        self.workdir = workdir
+        self.sample_interval = sample_interval
+        self.out = out
+
+        self.storage = JobStorage(base_dir=os.path.join(workdir, "jobs"))
+        self.backend = BackendService(base_url=urls["backend"], printer_key=PRINTER_KEY, storage=self.storage)
+        self.monitor = PrinterMonitor(interval=2)
+        self.printer = SmartPrinter(printer_name="FakePrinter", monitor=self.monitor,
+                                    transport="ipp", ipp_url=urls["printer"])
+        self.printer.poll_interval = 0.2
+        self.scheduler = PrintScheduler(self.printer, policy="sjf")
+        self.recorder = SampleRecorder()
+        self.pipeline = build_pipeline(
+            self.backend,
+            self.printer,
+            preflight=Preflight(cache_dir=os.path.join(workdir, "preflight_cache")),
+            scheduler=self.scheduler,
+            telemetry=self.recorder
+        )
+
+        self.serial = ChaosSerial()
+        self.reader = ArduinoSerialReader(port="soak", callback=self._on_key)
+
+        self.code = ""
+        self.results = []
+        self.samples = []
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._memory = MemorySampler()
+
+    # Same buffering as the daemon: CLEAR, digits, submit at 6
+    def _on_key(self, key):
+        with self._lock:
+            if key == "CLEAR":
+                self.code = ""
+                return
+            self.code += key
+            if len(self.code) < 6:
+                return
+            code, self.code = self.code, ""
+            self.in_flight += 1
+        threading.Thread(target=self._run_order, args=(code, time.monotonic()), daemon=True).start()
+
+    def _run_order(self, code, start):
+        try:
+            result = self.pipeline.run(code)
+        except Exception as e:
+            result = {"success": False, "error": f"CRASH {type(e).__name__}", "stage": None}
+        with self._lock:
+            self.in_flight -= 1
+            self.results.append(dict(result, latency=time.monotonic() - start, finished=time.monotonic()))
+
+    def _start_reader(self):
+        # The real listen loop, reading the simulated port
+        self.reader.ser = self.serial
+        self.reader.running = True
+        self.reader._thread = threading.Thread(target=self.reader._listen, name="serial", daemon=True)
+        self.reader._thread.start()
+
+    def sample(self, began):
+        now = time.monotonic()
+        with self._lock:
+            results = list(self.results)
+            in_flight = self.in_flight
+        window = [r for r in results if r["finished"] > now - self.sample_interval]
+        row = {
+            "t": round(now - began, 1),
+            "threads": threading.active_count(),
+            "fds": count_fds(),
+            "rss_kb": MemorySampler.rss_kb(),
+            "temp_bytes": dir_size(self.storage.base_dir),
+            # Bounded by its own pruning, so not a leak metric
+            "cache_bytes": dir_size(os.path.join(self.workdir, "preflight_cache")),
+            "in_flight": in_flight,
+            "done": len(results),
+            "printed": sum(1 for r in results if r["success"]),
+            "orders_per_min": round(sum(1 for r in window if r["success"]) * 60 / self.sample_interval, 2),
+            "serial_errors": self.serial.read_errors,
+            "lost_keys": self.serial.lost_keys,
+        }
+        self.samples.append(row)
+        if self.out:
+            self.out.write(json.dumps(row) + "\n")
+            self.out.flush()
+        return row
+
+    def run(self, duration, rate, serial_drops_per_hour, seed=1):
+        rng = random.Random(seed)
+        self.monitor.start()
+        self.scheduler.start()
+        self._start_reader()
+        self._memory.start()
+
+        began = time.monotonic()
+        next_sample = began
+        next_order = began + rng.expovariate(rate / 60)
+        next_drop = began + rng.expovariate(serial_drops_per_hour / 3600) if serial_drops_per_hour else None
+        code = 100000
+
+        while time.monotonic() - began < duration:
+            now = time.monotonic()
+            if now >= next_order:
+                self.serial.type("CLEAR")
+                for digit in str(code):
+                    self.serial.type(digit)
+                code = code + 1 if code < 999999 else 100000
+                next_order = now + rng.expovariate(rate / 60)
+            if next_drop and now >= next_drop:
+                self.serial.disconnect(rng.uniform(2, 20))
+                next_drop = now + rng.expovariate(serial_drops_per_hour / 3600)
+            if now >= next_sample:
+                row = self.sample(began)
+                print(f"[{row['t']:>7}s] threads {row['threads']:>3}  fds {row['fds']:>4}  "
+                      f"rss {row['rss_kb'] // 1024:>4} MB  temp {row['temp_bytes'] // 1024:>6} KB  "
+                      f"in flight {row['in_flight']:>2}  printed {row['printed']:>5}/{row['done']:<5}",
+                      file=sys.__stdout__, flush=True)
+                next_sample = now + self.sample_interval
+            time.sleep(0.05)
+
+        # Let in-flight orders finish (bounded) before the last sample
+        drain_until = time.monotonic() + 300
+        while self.in_flight and time.monotonic() < drain_until:
+            time.sleep(0.5)
+        self.sample(began)
+        self._memory.stop()
+        self.reader.stop()
+        self.monitor.stop()
+        return self.report(time.monotonic() - began)
+
+    def report(self, elapsed):
+        failures = {}
+        for r in self.results:
+            if not r["success"]:
+                key = f"{r.get('stage')}:{r['error']}"
+                failures[key] = failures.get(key, 0) + 1
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "orders": len(self.results),
+            "printed": sum(1 for r in self.results if r["success"]),
+            "stuck": self.in_flight,
+            "failures": failures,
+            "end_to_end": percentiles([r["latency"] for r in self.results if r["success"]]),
+            "stages": {
+                name[len("stage."):]: percentiles(values)
+                for name, values in self.recorder.samples.items() if name.startswith("stage.")
+            },
+            "serial": {
+                "disconnects": self.serial.disconnects,
+                "read_errors": self.serial.read_errors,
+                "lost_keys": self.serial.lost_keys,
+            },
+            "peak_rss_kb": self._memory.peak_kb,
+            "growth": find_growth(self.samples),
+            "pipeline": self.pipeline.metrics(),
+        }
+
+
+def print_report(report, chaos):
+    print(f"\n🧪 Soak finished after {report['elapsed_s']}s: "
+          f"{report['printed']}/{report['orders']} printed, {report['stuck']} still in flight")
+    for key, count in sorted(report["failures"].items(), key=lambda item: -item[1]):
+        print(f"   ❌ {key}: {count}")
+    print(f"   Injected: backend {chaos['backend_faults']}, CDN {chaos['cdn_faults']}, "
+          f"printer {chaos['ipp_aborted']} aborted of {chaos['ipp_jobs']}")
+    print(f"   Serial: {report['serial']}")
+    if report["end_to_end"]["count"]:
+        e2e = report["end_to_end"]
+        print(f"   End-to-end p50 {e2e['p50']}s  p90 {e2e['p90']}s  p99 {e2e['p99']}s  max {e2e['max']}s")
+
+    growth = report["growth"]
+    if not growth:
+        print("   (run too short for trend analysis)")
+        return
+    print(f"\n{'metric':<16}{'start':>12}{'end':>12}")
+    for metric, values in growth.items():
+        flag = ""
+        if metric in LEAK_METRICS and values["end"] > values["start"] * 1.5 + 1:
+            flag = "  ⚠️ growing"
+        elif metric == "orders_per_min" and values["end"] < values["start"] * 0.5:
+            flag = "  ⚠️ degrading"
+        print(f"{metric:<16}{values['start']:>12}{values['end']:>12}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak the kiosk pipeline against faulty local stand-ins")
+    parser.add_argument("--minutes", type=float, default=60, help="run length")
+    parser.add_argument("--rate", type=float, default=3, help="orders per minute (Poisson)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample-interval", type=float, default=30, help="seconds between samples")
+    parser.add_argument("--out", help="write samples as JSON lines to this file")
+    parser.add_argument("--json", help="write the final report to this file")
+    parser.add_argument("--printer-pps", type=float, default=2, help="fake printer pages per second")
+    parser.add_argument("--pdf-kb-per-page", type=int, default=100)
+    parser.add_argument("--hang-seconds", type=float, default=40, help="how long a hang lasts")
+    parser.add_argument("--backend-error", type=float, default=0.02)
+    parser.add_argument("--backend-hang", type=float, default=0.01)
+    parser.add_argument("--backend-slow", type=float, default=0.05)
+    parser.add_argument("--cdn-error", type=float, default=0.02)
+    parser.add_argument("--cdn-hang", type=float, default=0.01)
+    parser.add_argument("--cdn-truncate", type=float, default=0.03)
+    parser.add_argument("--cdn-slow", type=float, default=0.05)
+    parser.add_argument("--print-fail", type=float, default=0.03, help="fraction of print jobs that abort")
+    parser.add_argument("--lpstat-hang", type=float, default=0.05, help="fraction of lpstat calls that hang")
+    parser.add_argument("--serial-drops", type=float, default=6, help="serial disconnects per hour")
+    parser.add_argument("--verbose", action="store_true", help="show kiosk output")
+    args = parser.parse_args()
+
+    options = {
+        "seed": args.seed,
+        "printer_pps": args.printer_pps,
+        "page_bytes": args.pdf_kb_per_page * 1024,
+        "hang_seconds": args.hang_seconds,
+        "backend_latency": 0.02,
+        "cdn_latency": 0.05,
+        "print_fail": args.print_fail,
+        "backend_faults": {"error_rate": args.backend_error, "hang_rate": args.backend_hang,
+                           "slow_rate": args.backend_slow},
+        "cdn_faults": {"error_rate": args.cdn_error, "hang_rate": args.cdn_hang,
+                       "truncate_rate": args.cdn_truncate, "slow_rate": args.cdn_slow},
+    }
+    parent, child = multiprocessing.Pipe()
+    fakes = multiprocessing.Process(target=_serve_chaos, args=(child, options), daemon=True)
+    fakes.start()
+    urls = parent.recv()
+
+    workdir = tempfile.mkdtemp(prefix="autoprint-soak-")
+    install_fake_cups(os.path.join(workdir, "bin"), "FakePrinter", args.lpstat_hang)
+    out = open(args.out, "w") if args.out else None
+    print(f"🧪 Soaking for {args.minutes} min at {args.rate} orders/min (workdir {workdir})")
+
+    # Kiosk output goes to /dev/null (a StringIO would grow for hours and show up as a leak)
+    devnull = open(os.devnull, "w")
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+    try:
+        with quiet:
+            soak = SoakRun(urls, os.path.join(workdir, "run"), args.sample_interval, out)
+            report = soak.run(args.minutes * 60, args.rate, args.serial_drops, args.seed)
+    finally:
+        parent.send("stop")
+        chaos = parent.recv()
+        fakes.join(5)
+        devnull.close()
+        if out:
+            out.close()
+
+    print_report(report, chaos)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(report, injected=chaos), f, indent=2)
+        print(f"📝 Report written to {args.json}")
+    shutil.rmtree(workdir, ignore_errors=True)
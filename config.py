@@ -15,12 +15,59 @@ PRINTER_KEY = "LOCAL_PRINTER"
 # HARDWARE CONFIGURATION
 # ============================================================
 ARDUINO_PORT = "COM19" if sys.platform.startswith('win') else None
+STATIONS = None  # Several keypads/screens on one Pi: [{"name", "serial_port", "screen"?}, ...] (None = one on ARDUINO_PORT)
 
 # ============================================================
 # PRINTER CONFIGURATION
 # ============================================================
 PRINTER_NAME = None  # Auto-detect default printer
+PRINTER_NAMES = []  # Two or more CUPS queues enable load balancing + failover
 TEMP_DIR = "temp_jobs"
+PRINT_TRANSPORT = "lp"  # "lp" (lp/lpstat subprocesses) or "ipp" (direct IPP client)
+CUPS_URL = "http://localhost:631"
+STREAM_PDFS = False  # Pipe .pdf downloads straight into the spooler (no temp file)
+CLOUDINARY_DPI = 150  # Fetch Cloudinary photos pre-sized for the page at this DPI (None = originals)
+BW_IMAGE_MODE = "gray"  # BW photos: "gray" (8-bit), "threshold" (1-bit, text scans) or "dither" (1-bit, large)
+STORAGE_STAGING = "disk"  # "disk" or "tmpfs" (/dev/shm, spares the SD card)
+STORAGE_MAX_MB = 500  # Budget for temp job files before LRU eviction
+STORAGE_MAX_AGE_HOURS = 24  # Files of unfinished/failed orders older than this are evicted
+PRINTER_MONITOR_INTERVAL = 10  # Seconds between background printer status refreshes
+PREFLIGHT_CACHE_DIR = "preflight_cache"  # Preflight results/normalized PDFs by content hash
+PREFLIGHT_TIME_LIMIT = 60  # Seconds before a PDF is rejected as too slow to check
+PREFLIGHT_MEMORY_MB = 256  # Address-space limit for the preflight worker
+PREFLIGHT_NORMALIZE = False  # Downsample images + fit to media with Ghostscript
+CPU_WORKERS = None  # Worker processes for photo layout + preflight (None = one per core, 0 = off)
+CPU_QUEUE_SIZE = 32  # CPU tasks allowed to wait before callers run them inline
+CPU_TASK_TIME_LIMIT = 120  # Seconds per CPU task
+CPU_TASK_MEMORY_MB = 512  # Address-space limit per CPU task
+THERMAL_SOFT_C = 70  # Above this SoC temperature fewer CPU tasks run at once...
+THERMAL_HARD_C = 78  # ...down to one at this temperature (the Pi 4 throttles at 80)
+RASTER_FORMAT = None  # Pre-render to "pwg", "urf" or "pcl" and print raw (None = CUPS filters)
+RASTER_DPI = 300  # Must be a resolution the printer supports for that format
+RASTER_CACHE_DIR = "raster_cache"  # Rendered pages by (content hash, settings)
+RASTER_SUBMIT_RAW = True  # IPP transport: send as vnd.cups-raw (False if CUPS_URL is the printer itself)
+OFFICE_WORKERS = 1  # Warm LibreOffice instances for DOCX/PPTX/XLSX (~200 MB RAM each; 0 = no conversion)
+OFFICE_CACHE_DIR = "convert_cache"  # Converted PDFs by content hash
+OFFICE_TIME_LIMIT = 120  # Seconds before a document conversion is abandoned
+WAKE_ON_KEYPRESS = True  # First digit of a code wakes the printer + opens the backend connection
+WAKE_INTERVAL = 120  # Seconds between wake-ups (the printer stays warm that long)
+WAKE_COMMAND = None  # Custom wake, e.g. "snmpget -v1 -c public 10.0.0.20 sysUpTime.0" ({printer} = queue)
+SCHEDULER_POLICY = "sjf"  # "fifo", "sjf" (shortest job first, with aging) or "priority"
+SCHEDULER_AGING = 20  # SJF: pages credited per minute an order has waited
+ORDER_PRIORITIES = {}  # "priority" policy: order type -> rank, e.g. {"express": 2}
+
+# ============================================================
+# TELEMETRY CONFIGURATION
+# ============================================================
+TELEMETRY_ENDPOINT = None  # e.g. BACKEND_URL + "/telemetry"; None keeps batches local
+TELEMETRY_FILE = "telemetry.jsonl.gz"  # Local sink (None to disable)
+TELEMETRY_INTERVAL = 60  # Seconds per batch
+
+# ============================================================
+# DAEMON / CONTROL API
+# ============================================================
+CONTROL_PORT = 8765  # Control API on 127.0.0.1 (None to disable TCP)
+CONTROL_SOCKET = None  # e.g. "/run/autoprint/control.sock" for a Unix socket
 
 # ============================================================
 # FIREBASE CONFIGURATION
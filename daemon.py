@@ -0,0 +1,381 @@
+"""
+Auto-Print System - Headless Daemon
+Runs the print pipeline without Tk. The keypad is read here, and a local
+control API (services/control_api.py) lets the kiosk screen
+(kiosk_client.py), scripts or an operator submit codes and watch orders.
+A crash or hang in the GUI can no longer stall printing.
+
+With STATIONS in config.py one daemon serves several keypads, each with its
+own code buffer and order; run one kiosk_client per screen with --station.
+
+    python daemon.py [--port 8765] [--socket /run/autoprint/control.sock]
+"""
+import argparse
+import itertools
+from functools import partial
+import signal
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import *
+
+# ============================================================
+# LOGGING SETUP
+# ============================================================
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=getattr(logging, LOG_LEVEL),
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# IMPORTS
+# ============================================================
+from hardware.serial_reader import ArduinoSerialReader
+from services.backend_service import BackendService
+from services.smart_printer import SmartPrinter
+from services.progress import ProgressReporter
+from services.printer_monitor import PrinterMonitor
+from services.printer_pool import PrinterPool
+from services.printer_wake import PrinterWaker
+from services.job_storage import JobStorage
+from services.preflight import Preflight
+from services.cpu_pool import CpuPool
+from services.office_convert import OfficeConverter
+from services.rasterizer import Rasterizer
+from services.scheduler import PrintScheduler
+from services.telemetry import TelemetryAgent
+from services.pipeline import build_pipeline
+from services.cancellation import CancelToken
+from services.stations import build_stations
+from services.control_api import ControlServer
+
+# Finished orders kept for /orders
+MAX_ORDER_HISTORY = 50
+
+# Arduino keypad letters -> digits (same mapping as the kiosk UI)
+KEY_MAPPING = {'B': '1', 'C': '2', 'D': '3', 'A': '0'}
+
+
+class AutoPrintDaemon:
+    def __init__(self, serial_port=ARDUINO_PORT):
+        self.started = time.time()
+        self.storage = JobStorage(
+            base_dir=TEMP_DIR,
+            max_bytes=STORAGE_MAX_MB * 1024 * 1024,
+            max_age=STORAGE_MAX_AGE_HOURS * 3600,
+            staging=STORAGE_STAGING
+        )
+        self.storage.sweep_orphans()
+        self.cpu_pool = CpuPool(
+            workers=CPU_WORKERS,
+            queue_size=CPU_QUEUE_SIZE,
+            time_limit=CPU_TASK_TIME_LIMIT,
+            memory_mb=CPU_TASK_MEMORY_MB,
+            soft_temp=THERMAL_SOFT_C,
+            hard_temp=THERMAL_HARD_C
+        ) if CPU_WORKERS != 0 else None
+        self.backend = BackendService(
+            base_url=BACKEND_URL,
+            storage=self.storage,
+            cloudinary_dpi=CLOUDINARY_DPI,
+            bw_image_mode=BW_IMAGE_MODE,
+            cpu_pool=self.cpu_pool
+        )
+        self.preflight = Preflight(
+            cache_dir=PREFLIGHT_CACHE_DIR,
+            time_limit=PREFLIGHT_TIME_LIMIT,
+            memory_mb=PREFLIGHT_MEMORY_MB,
+            normalize=PREFLIGHT_NORMALIZE,
+            cpu_pool=self.cpu_pool
+        )
+        self.converter = OfficeConverter(
+            workers=OFFICE_WORKERS,
+            cache_dir=OFFICE_CACHE_DIR,
+            time_limit=OFFICE_TIME_LIMIT
+        ) if OFFICE_WORKERS else None
+        self.rasterizer = Rasterizer(
+            fmt=RASTER_FORMAT,
+            dpi=RASTER_DPI,
+            cache_dir=RASTER_CACHE_DIR,
+            cpu_pool=self.cpu_pool,
+            submit_raw=RASTER_SUBMIT_RAW
+        ) if RASTER_FORMAT else None
+        self.monitor = PrinterMonitor(interval=PRINTER_MONITOR_INTERVAL)
+        if len(PRINTER_NAMES) > 1:
+            self.printer = PrinterPool(
+                PRINTER_NAMES,
+                monitor=self.monitor,
+                transport=PRINT_TRANSPORT,
+                ipp_url=CUPS_URL
+            )
+        else:
+            self.printer = SmartPrinter(
+                printer_name=PRINTER_NAME,
+                monitor=self.monitor,
+                transport=PRINT_TRANSPORT,
+                ipp_url=CUPS_URL
+            )
+        self.scheduler = PrintScheduler(
+            self.printer,
+            policy=SCHEDULER_POLICY,
+            aging=SCHEDULER_AGING,
+            priorities=ORDER_PRIORITIES,
+            workers=max(1, len(PRINTER_NAMES))
+        )
+        self.telemetry = TelemetryAgent(
+            endpoint=TELEMETRY_ENDPOINT,
+            file_path=TELEMETRY_FILE,
+            interval=TELEMETRY_INTERVAL,
+            printer_key=PRINTER_KEY,
+            monitor=self.monitor,
+            storage=self.storage,
+            cpu_pool=self.cpu_pool
+        )
+        self.pipeline = build_pipeline(
+            self.backend,
+            self.printer,
+            preflight=self.preflight,
+            scheduler=self.scheduler,
+            telemetry=self.telemetry,
+            stream_pdfs=STREAM_PDFS,
+            converter=self.converter,
+            rasterizer=self.rasterizer
+        )
+
+        self.waker = PrinterWaker(
+            # None: the monitor's default queue
+            printer_names=PRINTER_NAMES or ([PRINTER_NAME] if PRINTER_NAME else None),
+            backend=self.backend,
+            monitor=self.monitor,
+            command=WAKE_COMMAND,
+            min_interval=WAKE_INTERVAL
+        ) if WAKE_ON_KEYPRESS else None
+
+        # Every station has its own keypad and code buffer; all share the pipeline
+        self.stations = {station.name: station for station in build_stations(STATIONS, serial_port)}
+        for station in self.stations.values():
+            if station.serial_port != "none":
+                station.reader = ArduinoSerialReader(
+                    port=station.serial_port,
+                    callback=partial(self._on_serial_key, station.name)
+                )
+        self.default_station = next(iter(self.stations))
+        self.printer_status = {"ready": None, "message": "Checking printer..."}
+        self.monitor.add_listener(self._on_printer_status)
+
+        self._orders = OrderedDict()
+        # Running order id -> CancelToken
+        self._cancels = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ============================================================
+    # KEYPAD
+    # ============================================================
+    def _on_serial_key(self, station, char):
+        self.handle_key(KEY_MAPPING.get(char, char), station=station)
+
+    def station(self, name=None):
+        """Station by name (None = the first one); KeyError if unknown."""
+        return self.stations[name or self.default_station]
+
+    def handle_key(self, key, station=None):
+        """Keypad press (serial or control API) at `station`; submits at 6 digits."""
+        station = self.station(station)
+        if key == "CANCEL":
+            # Only this station's order; the others keep printing
+            station.press("CLEAR")
+            if station.busy:
+                self.cancel(station.order_id, reason="keypad")
+            return
+        code, first_digit = station.press(key)
+        if first_digit and self.waker:
+            # Printer and backend warm up while the rest is typed
+            self.waker.poke()
+        if code:
+            self.submit(code, source="keypad", station=station.name)
+
+    def _on_printer_status(self, ready, message):
+        self.printer_status = {"ready": ready, "message": message}
+
+    # ============================================================
+    # ORDERS
+    # ============================================================
+    def submit(self, code, source="api", station=None):
+        """
+        Start a pickup code through the pipeline; returns its order record.
+        `station` ties the order to that station's screen and cancel key.
+        """
+        station = self.stations[station] if station else None
+        order = {
+            "id": str(next(self._ids)),
+            "code": code,
+            "source": source,
+            "station": station.name if station else None,
+            "state": "running",
+            "order_id": None,
+            "stage": None,
+            "message": "Verifying code...",
+            "progress": None,
+            "submitted": time.time(),
+            "finished": None,
+        }
+        cancel = station.begin(order["id"]) if station else CancelToken()
+        with self._lock:
+            self._orders[order["id"]] = order
+            self._cancels[order["id"]] = cancel
+            while len(self._orders) > MAX_ORDER_HISTORY:
+                self._orders.popitem(last=False)
+
+        threading.Thread(target=self._run_order, args=(order, cancel, station),
+                         name=f"order-{order['id']}", daemon=True).start()
+        return dict(order)
+
+    def _run_order(self, order, cancel, station=None):
+        progress = ProgressReporter(sink=lambda event: order.update(progress=event))
+        try:
+            result = self.pipeline.run(
+                order["code"],
+                progress=progress,
+                on_status=lambda message: order.update(message=message),
+                cancel=cancel
+            )
+        finally:
+            with self._lock:
+                self._cancels.pop(order["id"], None)
+            if station:
+                station.end(cancel)
+        if result["error"] == "CANCELLED":
+            state = "cancelled"
+        else:
+            state = "printed" if result["success"] else "failed"
+        order.update(
+            state=state,
+            order_id=result["order_id"],
+            stage=result["stage"],
+            error=result["error"],
+            message=result["message"],
+            finished=time.time(),
+        )
+        logger.info(f"Daemon order {order['id']} ({order['source']}, station {order['station']}): "
+                    f"{order['state']} {result['error'] or ''}")
+
+    def cancel(self, order_id, reason="operator"):
+        """
+        Stop a running order: downloads and conversions abort, a queued print
+        leaves the queue and a CUPS job already submitted is cancelled.
+
+        Returns:
+            dict: the order record, or None if unknown
+        """
+        with self._lock:
+            order = self._orders.get(order_id)
+            cancel = self._cancels.get(order_id)
+        if order is None:
+            return None
+        if cancel and cancel.cancel(reason):
+            order.update(message="Cancelling...")
+            logger.info(f"Daemon order {order_id} cancelled ({reason})")
+        return dict(order)
+
+    def get_order(self, order_id):
+        with self._lock:
+            order = self._orders.get(order_id)
+            return dict(order) if order else None
+
+    def recent_orders(self):
+        with self._lock:
+            return [dict(order) for order in reversed(self._orders.values())]
+
+    # ============================================================
+    # STATUS / METRICS
+    # ============================================================
+    def status(self, station=None):
+        """
+        What `station`'s screen shows: its keypad buffer and its latest order
+        (orders submitted without a station show on every screen).
+        """
+        station = self.station(station)
+        with self._lock:
+            latest = next(
+                (dict(order) for order in reversed(self._orders.values())
+                 if order["station"] in (station.name, None)),
+                None
+            )
+            running = sum(1 for order in self._orders.values() if order["state"] == "running")
+        snapshot = station.snapshot()
+        return {
+            "uptime": round(time.time() - self.started),
+            "printer": self.printer_status,
+            "station": station.name,
+            "keypad": {"code": snapshot["code"], "connected": snapshot["connected"]},
+            "running": running,
+            "latest": latest,
+        }
+
+    def metrics(self):
+        return {
+            "pipeline": self.pipeline.metrics(),
+            "printers": self.monitor.get_all(),
+            "storage_bytes": self.storage.usage(),
+            "stations": [station.snapshot() for station in self.stations.values()],
+        }
+
+    # ============================================================
+    # RUN
+    # ============================================================
+    def run(self, port=CONTROL_PORT, socket_path=CONTROL_SOCKET):
+        if self.cpu_pool:
+            self.cpu_pool.start()
+        self.monitor.start()
+        self.scheduler.start()
+        self.telemetry.start()
+        self.backend.warm_up()
+        if self.converter:
+            # LibreOffice takes seconds to start; don't hold up the keypad
+            threading.Thread(target=self.converter.start, name="office-start", daemon=True).start()
+
+        self.control = ControlServer(self, port=port, socket_path=socket_path)
+        self.control.start()
+
+        for station in self.stations.values():
+            if station.reader and not station.reader.start():
+                logger.error(f"Keypad of station {station.name} not detected; codes only via the control API")
+
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        print("🚀 Auto-Print daemon running")
+        logger.info("Daemon started")
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.control.stop()
+            for station in self.stations.values():
+                if station.reader:
+                    station.reader.stop()
+            self.telemetry.stop()
+            if self.converter:
+                self.converter.stop()
+            if self.cpu_pool:
+                self.cpu_pool.stop()
+            logger.info("Daemon stopped")
+
+
+# ============================================================
+# ENTRY POINT
+# ============================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Auto-Print daemon")
+    parser.add_argument("--port", type=int, default=CONTROL_PORT, help="control API TCP port on localhost")
+    parser.add_argument("--socket", default=CONTROL_SOCKET, help="control API Unix socket path")
+    parser.add_argument("--serial", default=ARDUINO_PORT,
+                        help="keypad serial port ('none' to disable; ignored when STATIONS is set)")
+    args = parser.parse_args()
+
+    AutoPrintDaemon(serial_port=args.serial).run(port=args.port, socket_path=args.socket)
@@ -0,0 +1,237 @@
+"""
+Stand-in IPP printer for testing the IPP transport without CUPS.
+
+Accepts Print-Job, Get-Job-Attributes, Get-Printer-Attributes, Cancel-Job
+and CUPS-Get-Default on a local port, counts pages in submitted PDFs (or
+PWG raster) and "prints" them at a fixed rate so job-impressions-completed
+moves like a real device.
+
+Run standalone:
+    python fake_ipp_server.py --port 8631
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import ipp_client as ipp
+
+# Scan the document for page objects (or PWG page headers) without holding it in memory
+PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![s\w])|PwgRaster\x00")
+SCAN_OVERLAP = 32
+HEADER_PEEK = 64 * 1024
+
+STATUS_OK = 0x0000
+STATUS_NOT_FOUND = 0x0406
+STATUS_NOT_SUPPORTED = 0x0501
+
+
+class FakeIppServer:
+    def __init__(self, host="127.0.0.1", port=0, printer_name="FakePrinter",
+                 pages_per_second=2.0, color=True, duplex=True, fail_rate=0.0, seed=1):
+        self.printer_name = printer_name
+        self.pages_per_second = pages_per_second
+        self.color = color
+        self.duplex = duplex
+        # Fraction of jobs that abort halfway (paper jam, filter crash)
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+
+        self.jobs = {}
+        self._next_job_id = 1
+        self._busy_until = 0.0
+        self._lock = threading.Lock()
+
+        handler = type("Handler", (_IppHandler,), {"server_state": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"🖨️  Fake IPP printer '{self.printer_name}' on {self.url}")
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # ==========================================================
+    # JOB SIMULATION
+    # ==========================================================
+
+    def add_job(self, attributes, size, pages):
+        with self._lock:
+            job_id = self._next_job_id
+            self._next_job_id += 1
+            pages = max(pages, 1) * int(attributes.get("copies", 1))
+            fails_at = pages // 2 if self._rng.random() < self.fail_rate else None
+            # One print engine: a job starts when the previous one is done
+            start = max(time.time(), self._busy_until)
+            self._busy_until = start + (pages if fails_at is None else fails_at) / self.pages_per_second
+            self.jobs[job_id] = {
+                "id": job_id,
+                "attributes": attributes,
+                "bytes": size,
+                "pages": pages,
+                "submitted": time.time(),
+                "started": start,
+                "fails_at": fails_at,
+                "canceled": False,
+            }
+        return job_id
+
+    def job_status(self, job_id):
+        job = self.jobs[job_id]
+        if job["canceled"]:
+            return 7, 0
+        if time.time() < job["started"]:
+            return 3, 0
+        printed = int((time.time() - job["started"]) * self.pages_per_second)
+        if job["fails_at"] is not None and printed >= job["fails_at"]:
+            return 8, job["fails_at"]
+        if printed >= job["pages"]:
+            return 9, job["pages"]
+        return 5, printed
+
+    def queued_jobs(self):
+        return sum(1 for job_id in self.jobs if self.job_status(job_id)[0] < 7)
+
+
+class _IppHandler(BaseHTTPRequestHandler):
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        """Yield the request body, handling chunked transfer encoding."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, ipp.STREAM_CHUNK_SIZE))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    def do_POST(self):
+        state = self.server_state
+        body = self._read_body()
+
+        # Collect enough bytes to decode the IPP header, then stream the rest
+        head = b""
+        for chunk in body:
+            head += chunk
+            if len(head) >= HEADER_PEEK:
+                break
+        request = ipp.decode_message(head)
+        operation = request["code"]
+        attrs = ipp.group(request, "operation")
+        job_attrs = ipp.group(request, "job")
+
+        groups = [(ipp.TAG_OPERATION, {
+            "attributes-charset": "utf-8",
+            "attributes-natural-language": "en",
+        })]
+        status = STATUS_OK
+
+        if operation == ipp.OP_PRINT_JOB:
+            document = head[request["data_offset"]:]
+            size = len(document)
+            pages = len(PAGE_PATTERN.findall(document))
+            tail = document[-SCAN_OVERLAP:]
+            for chunk in body:
+                size += len(chunk)
+                window = tail + chunk
+                pages += len(PAGE_PATTERN.findall(window)) - len(PAGE_PATTERN.findall(tail))
+                tail = window[-SCAN_OVERLAP:]
+
+            job_id = state.add_job(job_attrs, size, pages)
+            groups.append((ipp.TAG_JOB, {
+                "job-id": job_id,
+                "job-uri": f"ipp://localhost/jobs/{job_id}",
+                "job-state": 3,
+            }))
+
+        elif operation == ipp.OP_GET_JOB_ATTRIBUTES:
+            job_id = attrs.get("job-id")
+            if job_id not in state.jobs:
+                status = STATUS_NOT_FOUND
+            else:
+                job_state, printed = state.job_status(job_id)
+                groups.append((ipp.TAG_JOB, {
+                    "job-id": job_id,
+                    "job-state": job_state,
+                    "job-impressions-completed": printed,
+                }))
+
+        elif operation == ipp.OP_CANCEL_JOB:
+            job_id = attrs.get("job-id")
+            if job_id not in state.jobs:
+                status = STATUS_NOT_FOUND
+            else:
+                state.jobs[job_id]["canceled"] = True
+
+        elif operation == ipp.OP_GET_PRINTER_ATTRIBUTES:
+            queued = state.queued_jobs()
+            groups.append((ipp.TAG_PRINTER, {
+                "printer-name": state.printer_name,
+                "printer-state": 4 if queued else 3,
+                "printer-state-reasons": "none",
+                "printer-is-accepting-jobs": True,
+                "queued-job-count": queued,
+                "color-supported": state.color,
+                "sides-supported": ["one-sided", "two-sided-long-edge"] if state.duplex else "one-sided",
+            }))
+
+        elif operation == ipp.OP_CUPS_GET_DEFAULT:
+            groups.append((ipp.TAG_PRINTER, {"printer-name": state.printer_name}))
+
+        else:
+            status = STATUS_NOT_SUPPORTED
+
+        # Drain anything the client sent that we did not read
+        for _ in body:
+            pass
+
+        response = ipp.encode_message(status, request["request_id"], groups)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/ipp")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in IPP printer")
+    parser.add_argument("--port", type=int, default=8631)
+    parser.add_argument("--name", default="FakePrinter")
+    parser.add_argument("--pages-per-second", type=float, default=2.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of jobs that abort")
+    args = parser.parse_args()
+
+    server = FakeIppServer(port=args.port, printer_name=args.name,
+                           pages_per_second=args.pages_per_second, fail_rate=args.fail_rate)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,14 +1,40 @@
 import os
+import time
+
+from services.progress import ProgressReporter
+
 
 class FakePrinter:
-    def print_job(self, file_paths, settings):
+    def __init__(self, pages_per_file=3, seconds_per_page=0.5):
+        # Stand-in for job-impressions-completed while testing without CUPS
+        self.pages_per_file = pages_per_file
+        self.seconds_per_page = seconds_per_page
+
+    def print_job(self, file_paths, settings, progress=None, cancel=None):
         print("\n" + "="*40)
         print("🖨️  SIMULATED PRINT JOB")
         print("="*40)
 
-        for f in file_paths:
-            print(f"📄 {os.path.basename(f)}")
+        progress = progress or ProgressReporter()
+        total = len(file_paths)
+
+        for idx, f in enumerate(file_paths):
+            path = f if isinstance(f, str) else f.get("path")
+            print(f"📄 {os.path.basename(path)}")
+
+            job_id = f"fake-{idx + 1}"
+            for page in range(1, self.pages_per_file + 1):
+                if cancel is None:
+                    time.sleep(self.seconds_per_page)
+                elif cancel.wait(self.seconds_per_page):
+                    print(f"🛑 {job_id} cancelled")
+                    return False
+                progress.emit("print", file=idx + 1, total=total,
+                              job_id=job_id, state="processing", pages=page)
+            progress.emit("print", force=True, file=idx + 1, total=total,
+                          job_id=job_id, state="completed", pages=self.pages_per_file)
 
         print("⚙️ Settings:", settings)
         print("✅ TEST MODE – NO REAL PRINT")
         print("="*40)
+        return True
@@ -3,14 +3,18 @@ from tkinter import font
 import threading
 import time
 
+from services.progress import describe
+
 class AutoPrintUI:
-    def __init__(self, root, on_code_complete):
+    def __init__(self, root, on_code_complete, on_first_key=None, station=None):
         self.root = root
         self.on_code_complete = on_code_complete # Logic to run after 6 digits
+        self.on_first_key = on_first_key # Wake the printer while the code is typed
+        self.station = station # Station name on multi-station kiosks (None = single)
         self.code = ""
         
         # Setup Window
-        self.root.title("Auto-Print Kiosk")
+        self.root.title(f"Auto-Print Kiosk - {station}" if station else "Auto-Print Kiosk")
         self.root.attributes('-fullscreen', True) # Fullscreen for Pi
         self.root.configure(bg="#0f172a") # Dark Slate background
         
@@ -29,7 +33,8 @@ class AutoPrintUI:
         self.main_frame.place(relx=0.5, rely=0.5, anchor="center")
 
         # Header
-        tk.Label(self.main_frame, text="🖨️ AUTO-PRINT STATION", font=self.title_font, 
+        title = f"🖨️ AUTO-PRINT STATION {self.station.upper()}" if self.station else "🖨️ AUTO-PRINT STATION"
+        tk.Label(self.main_frame, text=title, font=self.title_font, 
                  fg="#38bdf8", bg="#0f172a").pack(pady=20)
 
         # Code Display Box
@@ -59,6 +64,11 @@ class AutoPrintUI:
                                       font=("Helvetica", 14), fg="#94a3b8", bg="#1e293b")
         self.last_key_label.pack()
 
+        # Printer Status Banner (Bottom Right) - fed by the printer monitor
+        self.printer_label = tk.Label(self.root, text="", font=("Helvetica", 14),
+                                      fg="#94a3b8", bg="#0f172a")
+        self.printer_label.place(relx=0.98, rely=0.95, anchor="ne")
+
         # Exit Instructions (Bottom Left)
         tk.Label(self.root, text="Press 'Esc' to exit kiosk mode", font=("Helvetica", 10), 
                  fg="#475569", bg="#0f172a").place(relx=0.02, rely=0.95)
@@ -83,6 +93,8 @@ class AutoPrintUI:
                 self.code = self.code[:-1]
             self.show_normal("Please enter your 6-digit Pickup Code")
         elif len(self.code) < 6:
+            if not self.code and self.on_first_key:
+                self.on_first_key()
             self.code += char
             
         self.update_code_display()
@@ -139,6 +151,24 @@ class AutoPrintUI:
     def update_printing_status(self, current, total):
         self.detail_label.config(text=f"🖨️ Printing file {current} of {total}...", fg="#38bdf8")
 
+    def update_progress(self, event):
+        """Show a download/print progress event pushed by the workflow."""
+        if event.get("stage") == "print" and not event.get("pages") and event.get("state") != "completed":
+            self.update_printing_status(event.get("file", 0), event.get("total", 0))
+            return
+        text = describe(event)
+        if text:
+            self.detail_label.config(text=text, fg="#38bdf8")
+
+    def set_printer_status(self, ready, message):
+        """Warn customers up front when the printer cannot take jobs."""
+        if ready:
+            self.printer_label.config(text=f"🖨️ {message}", fg="#94a3b8")
+        else:
+            self.printer_label.config(text=f"⚠️ {message}", fg="#f59e0b")
+            if not self.code:
+                self.status_label.config(text=f"⚠️ Printer issue: {message}", fg="#f59e0b")
+
     def reset_ui(self, message="Ready"):
         self.code = ""
         self.update_code_display()
@@ -1,6 +1,9 @@
 import threading
 import time
 
+# Holding '#' this long cancels the order in progress (like the Arduino sketch)
+CANCEL_HOLD_SECONDS = 1.0
+
 try:
     import RPi.GPIO as GPIO
 except ImportError:
@@ -49,6 +52,7 @@ class GPIOKeypadReader:
 
     def _scan(self):
         last_pressed = None
+        pressed_at = 0
         while self.running:
             key_detected = None
             
@@ -68,7 +72,12 @@ class GPIOKeypadReader:
                     
                     if self.callback:
                         self.callback(final_val)
+                    pressed_at = time.time()
                 last_pressed = key_detected
+            elif key_detected == "#" and pressed_at and time.time() - pressed_at >= CANCEL_HOLD_SECONDS:
+                pressed_at = 0  # once per hold
+                if self.callback:
+                    self.callback("CANCEL")
                 
             time.sleep(0.1) # Debounce/Polling delay
 
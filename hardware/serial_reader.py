@@ -1,5 +1,3 @@
-import serial
-import serial.tools.list_ports
 import threading
 import time
 import sys
@@ -15,6 +13,7 @@ class ArduinoSerialReader:
 
     def find_arduino_port(self):
         """Attempts to find the Arduino port automatically on Windows and Linux."""
+        import serial.tools.list_ports
         ports = list(serial.tools.list_ports.comports())
         
         # 1. Look for specific Arduino keywords
@@ -33,8 +32,10 @@ class ArduinoSerialReader:
 
     def start(self):
         """Starts the background thread to listen to Serial."""
-        port = self.port if self.port else self.find_arduino_port()
         try:
+            # pyserial is imported on first use so the window can paint first
+            import serial
+            port = self.port if self.port else self.find_arduino_port()
             self.ser = serial.Serial(port, self.baudrate, timeout=1)
             self.running = True
             self._thread = threading.Thread(target=self._listen, daemon=True)
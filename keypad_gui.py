@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import messagebox, font
-from services.backend_service import BackendService
-from services.smart_printer import SmartPrinter
+# The services (requests, PIL, the IPP client, ...) are imported by
+# _build_services() once the window is up
+from services.progress import ProgressReporter, describe
 import threading
 # raju
 
@@ -15,21 +16,50 @@ class KeypadGUI:
         # Make window always on top (optional)
         # self.root.attributes('-topmost', True)
         
-        # Initialize services
+        # Service settings (the services are built in the background)
         self.BACKEND_BASE_URL = "http://10.0.53.78:5000"
         self.PRINTER_NAME = None
+        self.services_ready = threading.Event()
         
-        self.backend = BackendService(base_url=self.BACKEND_BASE_URL)
-        self.printer = SmartPrinter(printer_name=self.PRINTER_NAME)
+        self.progress = ProgressReporter(
+            sink=lambda event: self.root.after(0, self.show_progress, event)
+        )
         
         # Current code entry
         self.current_code = ""
         
         # Setup UI
         self.setup_ui()
+        self.status_label.config(text="Starting up...", fg="#00d4ff")
+        
+        # Build services once the window is up, then check the printer
+        threading.Thread(target=self._build_services, daemon=True).start()
+    
+    def _build_services(self):
+        """Import and construct the services (runs off the UI thread)"""
+        from services.backend_service import BackendService
+        from services.smart_printer import SmartPrinter
+        from services.printer_monitor import PrinterMonitor
+        from services.preflight import Preflight
+        from services.scheduler import PrintScheduler
+        from services.pipeline import build_pipeline
         
-        # Check printer on startup
-        self.check_printer_status()
+        self.backend = BackendService(base_url=self.BACKEND_BASE_URL)
+        self.backend.storage.sweep_orphans()
+        self.preflight = Preflight()
+        self.monitor = PrinterMonitor()
+        self.printer = SmartPrinter(printer_name=self.PRINTER_NAME, monitor=self.monitor)
+        self.scheduler = PrintScheduler(self.printer, policy="sjf")
+        self.scheduler.start()
+        self.pipeline = build_pipeline(
+            self.backend,
+            self.printer,
+            preflight=self.preflight,
+            scheduler=self.scheduler
+        )
+        self.services_ready.set()
+        self.root.after(0, self.check_printer_status)
+        self.backend.warm_up()
     
     def setup_ui(self):
         """Create the user interface"""
@@ -184,8 +214,20 @@ class KeypadGUI:
             self.display_label.config(text="Enter Pickup Code")
     
     def check_printer_status(self):
-        """Check if printer is available"""
-        is_available, message = self.printer.check_printer_available()
+        """Check if printer is available (kept current by the printer monitor)"""
+        self.monitor.add_listener(
+            lambda ready, message: self.root.after(0, self.show_printer_status, ready, message)
+        )
+        if not self.monitor.start():
+            # No monitor (not CUPS): one live check, off the UI thread
+            threading.Thread(target=self._live_printer_check, daemon=True).start()
+    
+    def _live_printer_check(self):
+        ready, message = self.printer.check_printer_available()
+        self.root.after(0, self.show_printer_status, ready, message)
+    
+    def show_printer_status(self, is_available, message):
+        """Show the latest printer readiness in the status bar"""
         if not is_available:
             self.status_label.config(text=f"⚠️ {message}", fg="#f39c12")
         else:
@@ -208,70 +250,36 @@ class KeypadGUI:
     
     def process_order(self, pickup_code):
         """Process the order in background thread"""
-        try:
-            # 1️⃣ Verify Code with Backend
-            print(f"\n{'='*40}")
-            print(f"🔍 Verifying code: {pickup_code}")
-            print(f"{'='*40}\n")
-            
-            verify_res = self.backend.verify_code(pickup_code)
-            
-            if not verify_res.get("success"):
-                error_msg = verify_res.get("error", "Invalid Code")
-                display_error = "Order not found!"
-                
-                if error_msg == "IP_ERROR": display_error = "Backend Offline"
-                elif error_msg == "TIMEOUT": display_error = "Connection Timeout"
-                elif "Order not printable" in error_msg: display_error = "Order not printable"
-                elif len(error_msg) < 30: display_error = error_msg
-                
-                self.root.after(0, lambda: self.show_error(display_error))
-                return
-            
-            order_id = verify_res.get("orderId")
-
-            # 2️⃣ Download files
-            download_res = self.backend.download_files(verify_res)
-            if not download_res.get("success"):
-                error_type = download_res.get("error")
-                display_error = "Download Failed"
-                if error_type == "CLOUDINARY_ERROR":
-                    display_error = "Cloudinary Error"
-                
-                self.root.after(0, lambda: self.show_error(display_error))
-                
-                # Report error if we have an order ID
-                if order_id:
-                    self.backend.report_issue(order_id, error_type, str(download_res.get("details")))
-                return
-            
-            downloaded_items = download_res.get("files", [])
-            
-            # 3️⃣ Print files with actual settings
-            print(f"\n📑 Preparing {len(downloaded_items)} files for printing...\n")
-            
-            # Get global settings from order
-            print_settings = verify_res.get('printSettings', {})
-            global_duplex = print_settings.get('doubleSide', False)
-            
-            print_success = self.printer.print_job(
-                downloaded_items, 
-                {"duplex": global_duplex}
+        print(f"\n{'='*40}")
+        print(f"🔍 Verifying code: {pickup_code}")
+        print(f"{'='*40}\n")
+        
+        # A code submitted during startup waits for the services
+        if not self.services_ready.wait(timeout=60):
+            self.root.after(0, lambda: self.show_error("System Starting, Try Again"))
+            return
+        
+        result = self.pipeline.run(
+            pickup_code,
+            progress=self.progress,
+            on_status=lambda message: self.root.after(
+                0, lambda: self.status_label.config(text=message, fg="#00d4ff")
             )
-            
-            if not print_success:
-                print("❌ PRINT JOBS FAILED\n")
-                self.root.after(0, lambda: self.show_error("Printing Failed. Check printer."))
-                return
-
-            print("✅ PRINT JOBS COMPLETED\n")
-            
-            # Success!
-            self.root.after(0, lambda: self.show_success())
-            
-        except Exception as e:
-            print(f"❌ Error processing order: {e}")
-            self.root.after(0, lambda: self.show_error(f"Error: {str(e)}"))
+        )
+        
+        if not result["success"]:
+            print(f"❌ Order failed in {result['stage']}: {result['error']}\n")
+            self.root.after(0, lambda: self.show_error(result["message"]))
+            return
+        
+        print("✅ PRINT JOBS COMPLETED\n")
+        self.root.after(0, lambda: self.show_success())
+    
+    def show_progress(self, event):
+        """Show a download/print progress event in the status bar"""
+        text = describe(event)
+        if text:
+            self.status_label.config(text=text, fg="#00d4ff")
     
     def show_success(self):
         """Show success message and reset"""
@@ -0,0 +1,136 @@
+"""
+Auto-Print Kiosk Screen - thin client of the headless daemon (daemon.py)
+Only draws: the daemon owns the keypad, the pipeline and the printer, so
+closing or crashing this window never affects printing.
+
+    python kiosk_client.py [--port 8765] [--socket /run/autoprint/control.sock]
+
+One client per screen on a multi-station kiosk (STATIONS in config.py):
+
+    DISPLAY=:0.0 python kiosk_client.py --station left
+    DISPLAY=:0.1 python kiosk_client.py --station right
+"""
+import argparse
+import threading
+import tkinter as tk
+import logging
+from config import *
+
+from gui.app_interface import AutoPrintUI
+from services.control_api import ControlClient
+
+logger = logging.getLogger(__name__)
+
+# Seconds between status polls
+POLL_INTERVAL = 0.3
+
+
+class KioskClient:
+    def __init__(self, client):
+        self.client = client
+        self.root = tk.Tk()
+        self.root.title("Auto Print System")
+        # The daemon submits the code itself once 6 digits are in
+        self.ui = AutoPrintUI(self.root, on_code_complete=lambda code: None, station=client.station)
+        self.ui.show_normal("Connecting to print service...")
+
+        # A USB keyboard on the kiosk is forwarded like the keypad
+        self.root.bind("<Key>", self._on_key)
+
+        self._rendered = None
+        self._progress = None
+        self._online = None
+
+    # ============================================================
+    # INPUT
+    # ============================================================
+    def _on_key(self, event):
+        key = event.char if event.char.isdigit() else {
+            "BackSpace": "BACKSPACE",
+            "Delete": "CLEAR",
+        }.get(event.keysym)
+        if key:
+            threading.Thread(target=self._send_key, args=(key,), daemon=True).start()
+
+    def _send_key(self, key):
+        try:
+            self.client.key(key)
+        except OSError as e:
+            logger.warning(f"Key not delivered: {e}")
+
+    # ============================================================
+    # STATUS POLLING (background thread -> Tk via root.after)
+    # ============================================================
+    def _poll(self, stop):
+        while not stop.wait(POLL_INTERVAL):
+            try:
+                status = self.client.status()
+            except (OSError, ValueError):
+                status = None
+            self.root.after(0, self._render, status)
+
+    def _render(self, status):
+        if status is None:
+            if self._online is not False:
+                self._online = False
+                self.ui.set_printer_status(False, "Print service offline")
+            return
+        if not self._online:
+            self._online = True
+            self.ui.reset_ui("Ready")
+
+        printer = status["printer"]
+        if printer["ready"] is not None:
+            self.ui.set_printer_status(printer["ready"], printer["message"])
+
+        code = status["keypad"]["code"]
+        if code != self.ui.code and self._rendered_state() != "running":
+            self.ui.code = code
+            self.ui.update_code_display()
+
+        order = status.get("latest")
+        if not order:
+            return
+        key = (order["id"], order["state"], order["message"])
+        if key != self._rendered:
+            self._rendered = key
+            self._render_order(order)
+        elif order["state"] == "running" and order.get("progress") != self._progress:
+            self._progress = order.get("progress")
+            if self._progress:
+                self.ui.update_progress(self._progress)
+
+    def _rendered_state(self):
+        return self._rendered[1] if self._rendered else None
+
+    def _render_order(self, order):
+        if order["state"] == "running":
+            if order["message"] == "Verifying code...":
+                self.ui.code = order["code"]
+                self.ui.update_code_display()
+                self.ui.start_verification()
+            else:
+                self.ui.show_success(order["message"])
+        elif order["state"] in ("failed", "cancelled"):
+            self.ui.show_error(order["message"])
+        elif order["state"] == "printed":
+            self.ui.show_success(order["message"])
+            self.root.after(5000, self.ui.reset_ui, "Ready")
+
+    def run(self):
+        stop = threading.Event()
+        threading.Thread(target=self._poll, args=(stop,), name="kiosk-poll", daemon=True).start()
+        try:
+            self.root.mainloop()
+        finally:
+            stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kiosk screen for the Auto-Print daemon")
+    parser.add_argument("--port", type=int, default=CONTROL_PORT)
+    parser.add_argument("--socket", default=CONTROL_SOCKET)
+    parser.add_argument("--station", help="station this screen belongs to (default: the first)")
+    args = parser.parse_args()
+
+    KioskClient(ControlClient(port=args.port, socket_path=args.socket, station=args.station)).run()
@@ -10,6 +10,8 @@ import sys
 import os
 import threading
 import logging
+import time
+from functools import partial
 
 # ============================================================================
 # LOGGING CONFIGURATION
@@ -27,10 +29,14 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # ============================================================================
 # IMPORT MODULES
 # ============================================================================
+# Only what is needed to paint the windows; the services (requests, PIL,
+# the IPP client, ...) are imported by _build_services() in the background
 from hardware.serial_reader import ArduinoSerialReader
 from gui.app_interface import AutoPrintUI
-from services.backend_service import BackendService
-from services.smart_printer import SmartPrinter
+from services.progress import ProgressReporter
+from services.stations import build_stations
+from services.warmup import Warmup
+from config import STATIONS, WAKE_ON_KEYPRESS, WAKE_COMMAND, WAKE_INTERVAL
 
 # ============================================================================
 # MAIN APPLICATION CLASS
@@ -38,56 +44,177 @@ from services.smart_printer import SmartPrinter
 class AutoPrintMain:
     """
     Main application class that coordinates all components:
-    - Arduino keypad input
-    - GUI display
+    - Arduino keypad input and GUI display, per station (config.STATIONS:
+      several keypads/screens share one backend, scheduler and printer)
     - Backend communication
     - Printer control
     """
     
     def __init__(self):
-        # Initialize Tkinter root window
-        self.root = tk.Tk()
+        # Use COM19 on Windows, auto-detect on Linux/Raspberry Pi
+        arduino_port = "COM19" if sys.platform.startswith('win') else None
+        self.stations = build_stations(STATIONS, serial_port=arduino_port)
+        
+        # Initialize Tkinter root window (the first station's screen)
+        self.root = tk.Tk(screenName=self.stations[0].screen)
         self.root.title("Auto Print System")
         
+        # ====================================================================
+        # STATIONS (GUI + ARDUINO SERIAL READER + PROGRESS CHANNEL EACH)
+        # ====================================================================
+        # Painted before any service exists; the ports open during warm-up
+        for index, station in enumerate(self.stations):
+            self._init_station(station, self.root if index == 0 else None)
+            station.display.show_normal("Starting up...")
+        
+        # Set once _build_services() has run; workflows wait on it
+        self.services_ready = threading.Event()
+        self.warmup = Warmup()
+    
+    # ========================================================================
+    # BACKGROUND STARTUP
+    # ========================================================================
+    def _build_services(self):
+        """Import and construct the services (runs off the UI thread)."""
+        from services.backend_service import BackendService
+        from services.smart_printer import SmartPrinter
+        from services.printer_monitor import PrinterMonitor
+        from services.printer_wake import PrinterWaker
+        from services.preflight import Preflight
+        from services.office_convert import OfficeConverter
+        from services.scheduler import PrintScheduler
+        from services.pipeline import build_pipeline
+        
         # ====================================================================
         # INITIALIZE BACKEND SERVICE
         # ====================================================================
         self.backend = BackendService(
             base_url="http://10.0.53.78:5000"
         )
+        self.preflight = Preflight()
+        # DOCX/PPTX/XLSX uploads become PDFs before preflight (warm LibreOffice)
+        self.converter = OfficeConverter()
         
         # ====================================================================
         # INITIALIZE PRINTER
         # ====================================================================
-        self.printer = SmartPrinter(printer_name=None)  # Auto-detect printer
+        self.monitor = PrinterMonitor(interval=10)
+        self.printer = SmartPrinter(
+            printer_name=None,  # Auto-detect printer
+            monitor=self.monitor
+        )
+        # Orders queue here (shortest job first) instead of racing for the printer
+        self.scheduler = PrintScheduler(self.printer, policy="sjf")
+        # First digit of a code wakes the printer and the backend connection
+        self.waker = PrinterWaker(
+            backend=self.backend,
+            monitor=self.monitor,
+            command=WAKE_COMMAND,
+            min_interval=WAKE_INTERVAL
+        ) if WAKE_ON_KEYPRESS else None
         
         # ====================================================================
-        # INITIALIZE GUI
+        # ORDER PIPELINE (verify -> download -> convert -> preflight -> print -> mark)
         # ====================================================================
-        self.ui = AutoPrintUI(
-            self.root,
-            on_code_complete=self.process_verification
+        self.pipeline = build_pipeline(
+            self.backend,
+            self.printer,
+            preflight=self.preflight,
+            scheduler=self.scheduler,
+            converter=self.converter
         )
         
-        # ====================================================================
-        # INITIALIZE ARDUINO SERIAL READER
-        # ====================================================================
-        # Use COM19 on Windows, auto-detect on Linux/Raspberry Pi
-        arduino_port = "COM19" if sys.platform.startswith('win') else None
-        self.reader = ArduinoSerialReader(
-            port=arduino_port,
-            callback=self.handle_keypad_input
+        # Printer warnings reach every screen before a code is entered
+        self.monitor.add_listener(self._on_printer_status)
+        self.backend.storage.sweep_orphans()
+        self.services_ready.set()
+    
+    def _start_services(self):
+        """Build services, start the background workers, open the backend connection."""
+        start = time.monotonic()
+        self._build_services()
+        logger.info(f"Services ready in {time.monotonic() - start:.2f}s")
+        
+        self.monitor.start()
+        self.scheduler.start()
+        return self.backend.warm_up()
+    
+    def _start_readers(self):
+        """Open every station's keypad; True if at least one is connected."""
+        connected = 0
+        for station in self.stations:
+            if station.reader.start():
+                connected += 1
+            else:
+                print(f"\n❌ Arduino not detected ({station.name}).")
+                logger.error(f"Arduino not detected for station {station.name}")
+                self.root.after(0, station.display.show_error, "Arduino Disconnected")
+        
+        if connected:
+            print("\n" + "="*60)
+            print("🚀 AUTO-PRINT SYSTEM ONLINE")
+            print("="*60)
+            print(f"Waiting for pickup codes at {connected} station(s)...")
+            print("="*60 + "\n")
+            logger.info("System started successfully")
+        return connected > 0
+    
+    def _start_converter(self):
+        # LibreOffice instances start once, here, not per document
+        if not self.services_ready.wait(60):
+            return False
+        return self.converter.start()
+    
+    def _load_pdf_tools(self):
+        # Preflight workers fork from this process and inherit the import
+        from services.pdf_tools import load_pypdf
+        return load_pypdf()[0] is not None
+    
+    def _warmup_done(self, results):
+        if not self.services_ready.is_set():
+            for station in self.stations:
+                self.root.after(0, station.display.show_error, "Startup Failed")
+            return
+        for station in self.stations:
+            if station.reader.running:
+                self.root.after(0, station.display.reset_ui, "Ready for next customer")
+    
+    def _init_station(self, station, window=None):
+        """Window, keypad reader and progress channel for one station."""
+        if window is None:
+            # Extra stations get their own window, on their own X screen if set
+            options = {"screen": station.screen} if station.screen else {}
+            window = tk.Toplevel(self.root, **options)
+        
+        station.display = AutoPrintUI(
+            window,
+            on_code_complete=partial(self.process_verification, station),
+            on_first_key=self._wake_printer,
+            station=station.name if len(self.stations) > 1 else None
+        )
+        station.reader = ArduinoSerialReader(
+            port=station.serial_port,
+            callback=partial(self.handle_keypad_input, station)
         )
+        # Workflow thread -> this station's GUI
+        station.progress = ProgressReporter(
+            sink=lambda event, ui=station.display: self.root.after(0, ui.update_progress, event)
+        )
+    
+    def _on_printer_status(self, ready, message):
+        for station in self.stations:
+            self.root.after(0, station.display.set_printer_status, ready, message)
     
     # ========================================================================
     # KEYPAD INPUT HANDLER
     # ========================================================================
-    def handle_keypad_input(self, char):
+    def handle_keypad_input(self, station, char):
         """
-        Handle input from Arduino keypad.
+        Handle input from a station's Arduino keypad.
         Maps special keys (A, B, C, D) to numbers.
         
         Args:
+            station (Station): Station whose keypad sent the key
             char (str): Character received from Arduino
         """
         # Key mapping for 4x4 keypad
@@ -100,128 +227,97 @@ class AutoPrintMain:
         
         final_char = mapping.get(char, char)
         
+        # Holding '#' stops this station's order in progress
+        if final_char == "CANCEL":
+            self.cancel_order(station)
+            return
+        
         # Update GUI (must be done in main thread)
-        self.root.after(0, self.ui.handle_key_input, final_char)
+        self.root.after(0, station.display.handle_key_input, final_char)
+    
+    def _wake_printer(self):
+        """First digit of a code: warm the printer and backend while the rest is typed."""
+        if self.services_ready.is_set() and self.waker:
+            self.waker.poke()
     
     # ========================================================================
     # VERIFICATION PROCESS (MAIN WORKFLOW)
     # ========================================================================
-    def process_verification(self, code):
+    def process_verification(self, station, code):
         """
         Process pickup code verification in a separate thread.
         This is the main workflow that handles the entire print job.
         
         Args:
+            station (Station): Station the code was typed at
             code (str): 6-digit pickup code
         """
         threading.Thread(
             target=self._process_verification_thread,
-            args=(code,),
+            args=(station, code),
             daemon=True
         ).start()
     
-    def _process_verification_thread(self, code):
+    def _process_verification_thread(self, station, code):
         """
         Main verification and printing workflow.
         Runs in a separate thread to avoid blocking the GUI.
         
-        Steps:
+        Steps (see services/pipeline.py):
         1. Verify code with backend
         2. Download files from Cloudinary
-        3. Check printer status
-        4. Print files
-        5. Mark order as completed
+        3. Convert office documents to PDF
+        4. Preflight (structure, pages, encryption)
+        5. Print files
+        6. Mark order as completed
         """
+        print(f"\n{'='*60}")
+        print(f"🔎 VERIFYING CODE: {code} (station {station.name})")
+        print(f"{'='*60}\n")
+        
+        ui = station.display
+        # A code typed during startup waits for the services
+        if not self.services_ready.wait(timeout=60):
+            self.root.after(0, ui.show_error, "System Starting, Try Again")
+            return
+        
+        cancel = station.begin()
         try:
-            logger.info(f"Verifying code: {code}")
-            print(f"\n{'='*60}")
-            print(f"🔎 VERIFYING CODE: {code}")
-            print(f"{'='*60}\n")
-            
-            # ================================================================
-            # STEP 1: VERIFY CODE WITH BACKEND
-            # ================================================================
-            verify_res = self.backend.verify_code(code)
-            
-            if not verify_res or not verify_res.get("success"):
-                error_msg = verify_res.get("error", "Invalid Code") if verify_res else "Backend Error"
-                logger.warning(f"Verification failed: {error_msg}")
-                self.root.after(0, self.ui.show_error, "Invalid or Expired Code")
-                return
-            
-            order_id = verify_res.get("orderId")
-            if not order_id:
-                logger.error("Order ID missing in verification response")
-                self.root.after(0, self.ui.show_error, "Invalid Order ID")
-                return
-            
-            self.root.after(
-                0,
-                self.ui.show_success,
-                "Code Verified! Preparing files..."
-            )
-            
-            # ================================================================
-            # STEP 2: DOWNLOAD FILES FROM CLOUDINARY
-            # ================================================================
-            logger.info("Downloading files...")
-            download_res = self.backend.download_files(verify_res)
-            
-            if not download_res or not download_res.get("success"):
-                logger.error("Download failed")
-                self.root.after(0, self.ui.show_error, "Download Failed")
-                return
-            
-            files = download_res.get("files", [])
-            if not files:
-                logger.error("No files returned from backend")
-                self.root.after(0, self.ui.show_error, "No Files Found")
-                return
-            
-            logger.info(f"{len(files)} files downloaded")
-            
-            # ================================================================
-            # STEP 3: PRINT FILES (Directly after download)
-            # ================================================================
-            self.root.after(
-                0,
-                self.ui.show_success,
-                "Printing in progress..."
-            )
-            
-            print_settings = verify_res.get("printSettings", {})
-            duplex = print_settings.get("doubleSide", False)
-            
-            print_success = self.printer.print_job(
-                files,
-                {"duplex": duplex}
-            )
-            
-            if not print_success:
-                logger.error("Printing failed or printer unavailable")
-                self.root.after(0, self.ui.show_error, "Printing Failed")
-                return
-            
-            logger.info("Printing successful")
-            
-            # ================================================================
-            # STEP 5: MARK ORDER AS PRINTED
-            # ================================================================
-            self.backend.mark_as_printed(order_id)
-            logger.info(f"Order {order_id} marked as printed")
-            
-            self.root.after(0, self.ui.show_success, "Printed Successfully!")
-            
-            # Reset UI after 5 seconds
-            self.root.after(
-                5000,
-                self.ui.reset_ui,
-                "Ready for next customer"
+            result = self.pipeline.run(
+                code,
+                progress=station.progress,
+                on_status=lambda message: self.root.after(0, ui.show_success, message),
+                cancel=cancel
             )
+        finally:
+            station.end(cancel)
         
-        except Exception as e:
-            logger.exception(f"Critical system error: {e}")
-            self.root.after(0, self.ui.show_error, "System Error")
+        if not result["success"]:
+            logger.warning(f"Order at {station.name} failed in {result['stage']}: {result['error']}")
+            self.root.after(0, ui.show_error, result["message"])
+            return
+        
+        logger.info(f"Order {result['order_id']} printed at {station.name}")
+        self.root.after(0, ui.show_success, "Printed Successfully!")
+        
+        # Reset UI after 5 seconds
+        self.root.after(
+            5000,
+            ui.reset_ui,
+            "Ready for next customer"
+        )
+    
+    # ========================================================================
+    # CANCEL THE ORDER IN PROGRESS
+    # ========================================================================
+    def cancel_order(self, station):
+        """
+        Abort the station's running order: downloads and conversions stop,
+        and a print job already sent to CUPS is cancelled.
+        """
+        if station.cancel_order("keypad"):
+            print(f"🛑 Cancel requested from keypad ({station.name})")
+            self.root.after(0, station.display.show_normal, "Cancelling order...")
     
     # ========================================================================
     # RUN APPLICATION
@@ -229,22 +325,20 @@ class AutoPrintMain:
     def run(self):
         """
         Start the application.
-        Initializes Arduino reader and starts the Tkinter main loop.
+        The windows are already painted; services, keypads and PDF tools
+        start in the background while the Tkinter main loop runs.
         """
-        if self.reader.start():
-            print("\n" + "="*60)
-            print("🚀 AUTO-PRINT SYSTEM ONLINE")
-            print("="*60)
-            print("Waiting for pickup codes...")
-            print("="*60 + "\n")
-            logger.info("System started successfully")
-        else:
-            print("\n❌ Arduino not detected.")
-            logger.error("Arduino not detected")
-            self.ui.show_error("Arduino Disconnected")
+        (self.warmup
+            .add("services", self._start_services)
+            .add("serial", self._start_readers)
+            .add("pdf", self._load_pdf_tools)
+            .add("office", self._start_converter))
+        self.warmup.start(on_done=self._warmup_done)
         
         # Start Tkinter main loop
         self.root.mainloop()
+        if self.services_ready.is_set():
+            self.converter.stop()
 
 # ============================================================================
 # ENTRY POINT
@@ -5,6 +5,7 @@ Streamlined, efficient architecture with clear sections
 import tkinter as tk
 import threading
 import logging
+import time
 from config import *
 
 # ============================================================
@@ -20,10 +21,13 @@ logger = logging.getLogger(__name__)
 # ============================================================
 # IMPORTS
 # ============================================================
+# Only what is needed to paint the window; the services (requests, PIL,
+# pyserial, pypdf, ...) are imported by _build_services() in the background
 from hardware.serial_reader import ArduinoSerialReader
 from gui.app_interface import AutoPrintUI
-from services.backend_service import BackendService
-from services.smart_printer import SmartPrinter
+from services.progress import ProgressReporter
+from services.cancellation import CancelToken
+from services.warmup import Warmup
 
 
 # ============================================================
@@ -31,22 +35,193 @@ from services.smart_printer import SmartPrinter
 # ============================================================
 class AutoPrintSystem:
     def __init__(self):
-        """Initialize all system components"""
+        """Paint the UI; services are built in the background by run()"""
         self.root = tk.Tk()
         self.root.title("Auto Print System")
         
-        # Initialize services
-        self.backend = BackendService(base_url=BACKEND_URL)
-        self.printer = SmartPrinter(printer_name=PRINTER_NAME)
-        
         # Initialize UI
-        self.ui = AutoPrintUI(self.root, on_code_complete=self.verify_and_print)
+        self.ui = AutoPrintUI(self.root, on_code_complete=self.verify_and_print, on_first_key=self._wake_printer)
+        self.ui.show_normal("Starting up...")
         
-        # Initialize hardware
+        # Initialize hardware (the port is opened during warm-up)
         self.reader = ArduinoSerialReader(
             port=ARDUINO_PORT,
             callback=self._handle_keypad
         )
+        
+        # Progress channel (workflow thread -> GUI)
+        self.progress = ProgressReporter(
+            sink=lambda event: self.root.after(0, self.ui.update_progress, event)
+        )
+        
+        # CancelToken of the order in progress (the keypad's cancel key fires it)
+        self.current_cancel = None
+        
+        # Set once _build_services() has run; workflows wait on it
+        self.services_ready = threading.Event()
+        self.warmup = Warmup()
+    
+    # ============================================================
+    # BACKGROUND STARTUP
+    # ============================================================
+    def _build_services(self):
+        """Import and construct the services (runs off the UI thread)"""
+        from services.backend_service import BackendService
+        from services.smart_printer import SmartPrinter
+        from services.printer_monitor import PrinterMonitor
+        from services.printer_pool import PrinterPool
+        from services.printer_wake import PrinterWaker
+        from services.job_storage import JobStorage
+        from services.preflight import Preflight
+        from services.cpu_pool import CpuPool
+        from services.office_convert import OfficeConverter
+        from services.rasterizer import Rasterizer
+        from services.scheduler import PrintScheduler
+        from services.telemetry import TelemetryAgent
+        from services.pipeline import build_pipeline
+        
+        self.storage = JobStorage(
+            base_dir=TEMP_DIR,
+            max_bytes=STORAGE_MAX_MB * 1024 * 1024,
+            max_age=STORAGE_MAX_AGE_HOURS * 3600,
+            staging=STORAGE_STAGING
+        )
+        self.cpu_pool = CpuPool(
+            workers=CPU_WORKERS,
+            queue_size=CPU_QUEUE_SIZE,
+            time_limit=CPU_TASK_TIME_LIMIT,
+            memory_mb=CPU_TASK_MEMORY_MB,
+            soft_temp=THERMAL_SOFT_C,
+            hard_temp=THERMAL_HARD_C
+        ) if CPU_WORKERS != 0 else None
+        self.backend = BackendService(
+            base_url=BACKEND_URL,
+            storage=self.storage,
+            cloudinary_dpi=CLOUDINARY_DPI,
+            bw_image_mode=BW_IMAGE_MODE,
+            cpu_pool=self.cpu_pool
+        )
+        self.preflight = Preflight(
+            cache_dir=PREFLIGHT_CACHE_DIR,
+            time_limit=PREFLIGHT_TIME_LIMIT,
+            memory_mb=PREFLIGHT_MEMORY_MB,
+            normalize=PREFLIGHT_NORMALIZE,
+            cpu_pool=self.cpu_pool
+        )
+        self.converter = OfficeConverter(
+            workers=OFFICE_WORKERS,
+            cache_dir=OFFICE_CACHE_DIR,
+            time_limit=OFFICE_TIME_LIMIT
+        ) if OFFICE_WORKERS else None
+        self.rasterizer = Rasterizer(
+            fmt=RASTER_FORMAT,
+            dpi=RASTER_DPI,
+            cache_dir=RASTER_CACHE_DIR,
+            cpu_pool=self.cpu_pool,
+            submit_raw=RASTER_SUBMIT_RAW
+        ) if RASTER_FORMAT else None
+        self.monitor = PrinterMonitor(interval=PRINTER_MONITOR_INTERVAL)
+        if len(PRINTER_NAMES) > 1:
+            self.printer = PrinterPool(
+                PRINTER_NAMES,
+                monitor=self.monitor,
+                transport=PRINT_TRANSPORT,
+                ipp_url=CUPS_URL
+            )
+        else:
+            self.printer = SmartPrinter(
+                printer_name=PRINTER_NAME,
+                monitor=self.monitor,
+                transport=PRINT_TRANSPORT,
+                ipp_url=CUPS_URL
+            )
+        
+        self.scheduler = PrintScheduler(
+            self.printer,
+            policy=SCHEDULER_POLICY,
+            aging=SCHEDULER_AGING,
+            priorities=ORDER_PRIORITIES,
+            workers=max(1, len(PRINTER_NAMES))
+        )
+        
+        self.telemetry = TelemetryAgent(
+            endpoint=TELEMETRY_ENDPOINT,
+            file_path=TELEMETRY_FILE,
+            interval=TELEMETRY_INTERVAL,
+            printer_key=PRINTER_KEY,
+            monitor=self.monitor,
+            storage=self.storage,
+            cpu_pool=self.cpu_pool
+        )
+        
+        self.pipeline = build_pipeline(
+            self.backend,
+            self.printer,
+            preflight=self.preflight,
+            scheduler=self.scheduler,
+            telemetry=self.telemetry,
+            stream_pdfs=STREAM_PDFS,
+            converter=self.converter,
+            rasterizer=self.rasterizer
+        )
+        
+        self.waker = PrinterWaker(
+            # None: the monitor's default queue
+            printer_names=PRINTER_NAMES or ([PRINTER_NAME] if PRINTER_NAME else None),
+            backend=self.backend,
+            monitor=self.monitor,
+            command=WAKE_COMMAND,
+            min_interval=WAKE_INTERVAL
+        ) if WAKE_ON_KEYPRESS else None
+        
+        self.monitor.add_listener(
+            lambda ready, message: self.root.after(0, self.ui.set_printer_status, ready, message)
+        )
+        self.storage.sweep_orphans()
+        self.services_ready.set()
+    
+    def _start_services(self):
+        """Build services, start the background workers, open the backend connection"""
+        start = time.monotonic()
+        self._build_services()
+        logger.info(f"Services ready in {time.monotonic() - start:.2f}s")
+        
+        if self.cpu_pool:
+            self.cpu_pool.start()
+        self.monitor.start()
+        self.scheduler.start()
+        self.telemetry.start()
+        return self.backend.warm_up()
+    
+    def _start_reader(self):
+        if self.reader.start():
+            print("🚀 System Online")
+            logger.info("System started")
+            return True
+        print("❌ Arduino not detected")
+        logger.error("Arduino not detected")
+        self.root.after(0, self.ui.show_error, "Arduino Disconnected")
+        return False
+    
+    def _start_converter(self):
+        # LibreOffice instances start once, here, not per document
+        if not self.services_ready.wait(60) or not self.converter:
+            return False
+        return self.converter.start()
+    
+    def _load_pdf_tools(self):
+        # Preflight workers fork from this process and inherit the import
+        from services.pdf_tools import load_pypdf
+        return load_pypdf()[0] is not None
+    
+    def _warmup_done(self, results):
+        if not self.services_ready.is_set():
+            self.root.after(0, self.ui.show_error, "Startup Failed")
+            return
+        for name, seconds in self.warmup.timings.items():
+            self.telemetry.observe(f"startup.{name}", seconds)
+        if results.get("serial") is True:
+            self.root.after(0, self.ui.reset_ui, "Ready")
     
     # ============================================================
     # HARDWARE INPUT HANDLER
@@ -55,13 +230,27 @@ class AutoPrintSystem:
         """Process keypad input with character mapping"""
         mapping = {'B': '1', 'C': '2', 'D': '3', 'A': '0'}
         final_char = mapping.get(char, char)
+        if final_char == "CANCEL":
+            self._cancel_order()
+            return
         self.root.after(0, self.ui.handle_key_input, final_char)
     
+    def _cancel_order(self):
+        """Holding '#' stops the order in progress, print job included"""
+        cancel = self.current_cancel
+        if cancel and cancel.cancel("keypad"):
+            self.root.after(0, self.ui.show_normal, "Cancelling order...")
+    
+    def _wake_printer(self):
+        """First digit of a code: warm the printer and backend while the rest is typed"""
+        if self.services_ready.is_set() and self.waker:
+            self.waker.poke()
+    
     # ============================================================
     # CORE PRINTING WORKFLOW
     # ============================================================
     def verify_and_print(self, code):
-        """Main workflow: Verify -> Download -> Print"""
+        """Main workflow: Verify -> Download -> Preflight -> Print"""
         threading.Thread(
             target=self._print_workflow,
             args=(code,),
@@ -70,57 +259,24 @@ class AutoPrintSystem:
     
     def _print_workflow(self, code):
         """Execute complete print workflow in background thread"""
+        # A code typed during startup waits for the services
+        if not self.services_ready.wait(timeout=60):
+            self._show_error("System Starting, Try Again")
+            return
+        
+        cancel = CancelToken()
+        self.current_cancel = cancel
         try:
-            logger.info(f"Processing code: {code}")
-            
-            # Step 1: Verify
-            verify_res = self.backend.verify_code(code)
-            if not verify_res or not verify_res.get("success"):
-                self._show_error("Invalid or Expired Code")
-                return
-            
-            order_id = verify_res.get("orderId")
-            if not order_id:
-                self._show_error("Invalid Order ID")
-                return
-            
-            self._show_status("Code Verified! Preparing files...")
-            
-            # Step 2: Download
-            download_res = self.backend.download_files(verify_res)
-            if not download_res or not download_res.get("success"):
-                self._show_error("Download Failed")
-                return
-            
-            files = download_res.get("files", [])
-            if not files:
-                self._show_error("No Files Found")
-                return
-            
-            # Step 3: Print (Directly after download)
-            self._show_status("Printing in progress...")
-            print_settings = verify_res.get("printSettings", {})
-            
-            success = self.printer.print_job(
-                files,
-                {"duplex": print_settings.get("doubleSide", False)}
-            )
-            
-            if not success:
-                self._show_error("Printing Failed or Printer Unavailable")
-                return
-            
-            logger.info("Printing successful")
-            # Step 4: Mark Complete
-            self.backend.mark_as_printed(order_id)
-            logger.info(f"Order {order_id} completed")
-            
-            self._show_success("Printed Successfully!")
-            self.root.after(5000, self.ui.reset_ui, "Ready")
-            
-        except Exception as e:
-            logger.exception(f"System error: {e}")
-            self._show_error("System Error")
+            result = self.pipeline.run(code, progress=self.progress, on_status=self._show_status, cancel=cancel)
+        finally:
+            self.current_cancel = None
+        if not result["success"]:
+            self._show_error(result["message"])
+            return
+        
+        logger.info(f"Order {result['order_id']} completed")
+        self._show_success(result["message"])
+        self.root.after(5000, self.ui.reset_ui, "Ready")
     
     # ============================================================
     # UI HELPERS
@@ -138,16 +294,20 @@ class AutoPrintSystem:
     # RUN SYSTEM
     # ============================================================
     def run(self):
-        """Start the system"""
-        if self.reader.start():
-            print("🚀 System Online")
-            logger.info("System started")
-        else:
-            print("❌ Arduino not detected")
-            logger.error("Arduino not detected")
-            self.ui.show_error("Arduino Disconnected")
-        
+        """Start the system: UI first, everything else in the background"""
+        (self.warmup
+            .add("services", self._start_services)
+            .add("serial", self._start_reader)
+            .add("pdf", self._load_pdf_tools)
+            .add("office", self._start_converter))
+        self.warmup.start(on_done=self._warmup_done)
         self.root.mainloop()
+        if self.services_ready.is_set():
+            self.telemetry.stop()
+            if self.converter:
+                self.converter.stop()
+            if self.cpu_pool:
+                self.cpu_pool.stop()
 
 
 # ============================================================
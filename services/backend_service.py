@@ -10,11 +10,63 @@
 # ============================================================================
 
 import requests
+import hashlib
 import os
-from PIL import Image
-import io
-import shutil
 import time
+from functools import partial
+
+from services.progress import ProgressReporter
+from services.cancellation import CancelToken, abort_response
+from services.job_storage import JobStorage
+from services.print_settings import resolve_order_settings, PrintSettingsError
+from services.layout import images_to_pdf
+from services import cloudinary
+
+# Read size for streamed downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Range requests allowed per file after a dropped or short transfer
+DOWNLOAD_RESUMES = 4
+
+# File downloads ask for the bytes as stored: Content-Length and Range
+# offsets count wire bytes, which gzip would make differ from the file's
+DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+
+# Hash algorithms accepted in `fileHashes` ("sha256:<hex>" or bare hex)
+HASH_LENGTHS = {64: "sha256", 40: "sha1", 32: "md5"}
+
+
+class IntegrityError(Exception):
+    """Downloaded bytes don't match Content-Length or the backend's hash."""
+
+
+def parse_file_hash(value):
+    """
+    "sha256:ab12..." / "md5:..." / bare hex -> (algorithm, hexdigest).
+    Returns None for empty or unrecognised values.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    algorithm, _, digest = value.strip().rpartition(":")
+    digest = digest.lower()
+    algorithm = algorithm.lower().replace("-", "") or HASH_LENGTHS.get(len(digest))
+    if not algorithm or algorithm not in hashlib.algorithms_available:
+        return None
+    return algorithm, digest
+
+
+def _content_encoded(response):
+    """True if the body is compressed on the wire (iter_content decodes it)."""
+    return response.headers.get("Content-Encoding", "identity").strip().lower() not in ("", "identity")
+
+
+def _range_start(response):
+    """First byte offset of a 206 answer ("bytes 1000-1999/5000")."""
+    try:
+        return int(response.headers.get("Content-Range", "").split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
 
 # ============================================================================
 # BACKEND SERVICE CLASS
@@ -30,15 +82,49 @@ class BackendService:
         base_url="http://10.0.53.78:5000",
         base_dir="temp_jobs",
         printer_key="LOCAL_PRINTER",
-        max_retries=2
+        max_retries=2,
+        storage=None,
+        cloudinary_dpi=None,
+        bw_image_mode="gray",
+        cpu_pool=None
     ):
         self.base_url = base_url.rstrip("/")
-        self.base_dir = base_dir
         self.printer_key = printer_key
         self.max_retries = max_retries
+        # Fetch Cloudinary images as page-sized renditions at this DPI
+        # (None = always download the original upload)
+        self.cloudinary_dpi = cloudinary_dpi
+        # BW photos become "gray", "dither" or "threshold" PDFs (see image_convert)
+        self.bw_image_mode = bw_image_mode
+        # Page raster for laid-out photos; matches the Cloudinary renditions
+        self.image_dpi = cloudinary_dpi or 150
+        # Photo decoding/fitting runs on these worker processes when given
+        self.cpu_pool = cpu_pool
+        
+        # Temp job directories (quota, eviction, atomic writes)
+        self.storage = storage or JobStorage(base_dir=base_dir)
+        self.base_dir = self.storage.base_dir
+        
+        # Keep-alive connection to the backend (verify + mark-printed)
+        self.session = requests.Session()
+    
+    # ========================================================================
+    # WARM UP CONNECTION
+    # ========================================================================
+    def warm_up(self):
+        """
+        Open the keep-alive connection to the backend ahead of the first
+        customer (DNS, TCP, and a sleeping backend waking up).
         
-        # Create temp directory if it doesn't exist
-        os.makedirs(self.base_dir, exist_ok=True)
+        Returns:
+            bool: True if the backend answered
+        """
+        try:
+            self.session.head(self.base_url, timeout=5)
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Backend not reachable yet: {e}")
+            return False
     
     # ========================================================================
     # VERIFY PICKUP CODE
@@ -65,7 +151,7 @@ class BackendService:
             try:
                 # Send verification request
                 payload = {"pickupCode": code}
-                res = requests.post(
+                res = self.session.post(
                     url,
                     json=payload,
                     headers=headers,
@@ -128,35 +214,53 @@ class BackendService:
     # ========================================================================
     # DOWNLOAD FILES FROM CLOUDINARY
     # ========================================================================
-    def download_files(self, verified_data):
+    def download_files(self, verified_data, progress=None, stream_pdfs=False, cancel=None):
         """
         Download files from Cloudinary URLs.
         Converts images to PDF if necessary.
         
         Args:
             verified_data (dict): Response from verify_code()
+            progress (ProgressReporter): Optional channel for per-file
+                byte counts and conversion events
+            stream_pdfs (bool): Don't save .pdf URLs; return an "open"
+                callable so the printer streams them straight to the spooler
+            cancel (CancelToken): Closes the transfer in progress and raises
+                Cancelled when fired
             
         Returns:
             dict: Download results with file paths
         """
         order_id = verified_data.get("orderId")
         file_urls = verified_data.get("fileUrls", [])
+        # Optional, aligned with fileUrls like fileSettings
+        file_hashes = verified_data.get("fileHashes") or []
         print_settings = verified_data.get("printSettings", {})
+        try:
+            order_settings, file_settings = resolve_order_settings(verified_data)
+        except PrintSettingsError:
+            # The pipeline rejects these before downloading; keep defaults here
+            order_settings, file_settings = {}, []
         
         if not order_id or not file_urls:
             print(f"❌ No files found for order {order_id}")
             return {"success": False, "error": "MISSING_FILES"}
         
-        # Create job directory
-        job_dir = os.path.join(self.base_dir, order_id)
-        os.makedirs(job_dir, exist_ok=True)
+        # Create job directory (protected from eviction until finish_job)
+        job_dir = self.storage.acquire(order_id)
         
         downloaded = []
         errors = []
+        images = []
         
         print(f"📥 Downloading {len(file_urls)} file(s)...")
         
+        progress = progress or ProgressReporter()
+        cancel = cancel or CancelToken()
+        total = len(file_urls)
+        
         for idx, url in enumerate(file_urls):
+            cancel.check()
             if not url:
                 continue
             
@@ -166,53 +270,298 @@ class BackendService:
                 
                 # Check if it's an image
                 is_image_ext = url.lower().split("?")[0].endswith((".jpg", ".jpeg", ".png"))
+                is_pdf_ext = url.lower().split("?")[0].endswith(".pdf")
                 
                 local_path = os.path.join(job_dir, f"file_{idx}.pdf")
+                expected_hash = parse_file_hash(file_hashes[idx] if idx < len(file_hashes) else None)
                 
                 print(f"⬇️  [{idx + 1}/{len(file_urls)}] Downloading{' (Cloudinary)' if is_cloudinary else ''}...")
                 
-                # Download file
-                r = requests.get(url, timeout=30)
+                # Plain PDFs can skip temp_jobs and go straight to the spooler
+                # (not when the backend sent a hash: it must be checked first)
+                if stream_pdfs and is_pdf_ext and not expected_hash:
+                    downloaded.append({
+                        "path": None,
+                        "index": idx,
+                        "url": url,
+                        "open": partial(self.open_stream, url),
+                    })
+                    print(f"   ⏩ Will stream to printer")
+                    continue
+                
+                # Let Cloudinary shrink (and gray) photos instead of the Pi;
+                # a backend hash describes the original, so keep that then
+                fetch_url = url
+                settings = (file_settings[idx] if idx < len(file_settings) else None) or order_settings
+                if is_cloudinary and is_image_ext and self.cloudinary_dpi and not expected_hash:
+                    fetch_url = cloudinary.rendition_url(
+                        url,
+                        color=settings.get("color", "BW"),
+                        media=settings.get("media"),
+                        dpi=self.cloudinary_dpi
+                    )
+                
+                # Download in chunks (resuming with Range if the transfer
+                # drops), verified before the file can reach the printer
+                r = requests.get(fetch_url, headers=DOWNLOAD_HEADERS, timeout=30, stream=True)
+                if fetch_url != url and not r.ok:
+                    print(f"   ⚠️  Rendition unavailable ({r.status_code}), using original")
+                    r.close()
+                    fetch_url = url
+                    r = requests.get(url, headers=DOWNLOAD_HEADERS, timeout=30, stream=True)
                 r.raise_for_status()
                 
-                content = r.content
                 content_type = r.headers.get("Content-Type", "").lower()
                 
                 # Check if it's actually an image
-                is_actually_image = is_image_ext or "image" in content_type
+                is_actually_image = "image" in content_type or (is_image_ext and "pdf" not in content_type)
+                
+                # Bytes go network -> disk through one fixed-size buffer;
+                # images are decoded from the saved file
+                target = os.path.join(job_dir, f"file_{idx}.img") if is_actually_image else local_path
+                
+                def on_bytes(received, size, idx=idx):
+                    progress.emit("download", file=idx + 1, total=total, bytes=received, size=size)
+                
+                received = self._fetch(r, fetch_url, target, expected_hash, on_bytes, cancel)
+                progress.emit("download", force=True, file=idx + 1, total=total,
+                              bytes=received, size=received)
                 
                 if is_actually_image:
-                    print("   🔄 Converting image to PDF...")
-                    try:
-                        # Convert image to PDF
-                        image = Image.open(io.BytesIO(content))
-                        if image.mode in ("RGBA", "P"):
-                            image = image.convert("RGB")
-                        image.save(local_path, "PDF", resolution=100.0)
-                    except Exception as img_err:
-                        print(f"   ⚠️  Image conversion failed: {img_err}")
-                        # Save as raw file
-                        with open(local_path, "wb") as f:
-                            f.write(content)
-                else:
-                    # Save PDF directly
-                    with open(local_path, "wb") as f:
-                        f.write(content)
-                
-                downloaded.append({"path": local_path})
+                    # Laid out together once every file is in (see _layout_images)
+                    images.append({"path": target, "index": idx, "settings": settings})
+                    print(f"   ✅ Saved: {target}")
+                    continue
+                
+                downloaded.append({"path": local_path, "index": idx, "url": url})
                 print(f"   ✅ Saved: {local_path}")
             
+            except IntegrityError as e:
+                print(f"   ❌ Integrity check failed: {e}")
+                errors.append({"url": url, "error": str(e), "type": "INTEGRITY_ERROR"})
+            
             except Exception as e:
+                # A transfer closed by cancel fails with whatever the read hit
+                cancel.check()
                 error_type = "CLOUDINARY_ERROR" if "cloudinary" in url.lower() else "DOWNLOAD_ERROR"
                 print(f"   ❌ Failed: {e}")
                 errors.append({"url": url, "error": str(e), "type": error_type})
         
+        if images:
+            print(f"🔄 Laying out {len(images)} image(s)...")
+            progress.emit("convert", force=True, file=len(images), total=total)
+            packed, failed = self._layout_images(images, job_dir, cancel)
+            downloaded = sorted(downloaded + packed, key=lambda item: item["index"])
+            errors.extend(failed)
+        
+        # A damaged file fails the whole order rather than printing part of it
+        if any(e["type"] == "INTEGRITY_ERROR" for e in errors):
+            self.storage.release(order_id)
+            return {"success": False, "error": "INTEGRITY_ERROR", "details": errors}
+        
         if not downloaded and errors:
+            self.storage.release(order_id)
             return {"success": False, "error": errors[0]["type"], "details": errors}
         
         print(f"✅ Downloaded {len(downloaded)} file(s) successfully")
         return {"success": True, "files": downloaded, "errors": errors}
     
+    # ========================================================================
+    # IMAGE LAYOUT
+    # ========================================================================
+    def _layout_images(self, images, job_dir, cancel=None):
+        """
+        Pack downloaded images into multi-page PDFs, `number_up` per page,
+        one PDF per run of consecutive images with identical settings. The
+        packed PDF takes the first image's per-file settings (copies, duplex,
+        ...), so any difference splits the run, as does a document between
+        two photos, which keeps the order printing in upload order.
+        
+        Returns:
+            tuple: (file items for download_files, error entries)
+        """
+        def layout_key(image):
+            settings = image["settings"]
+            return (settings.get("color", "BW"), settings.get("number_up", 1),
+                    settings.get("media"), settings.get("orientation"))
+        
+        # Adjacent in the order, not just alike
+        runs, run = [], []
+        for image in sorted(images, key=lambda image: image["index"]):
+            if run and (image["index"] != run[-1]["index"] + 1 or image["settings"] != run[-1]["settings"]):
+                runs.append(run)
+                run = []
+            run.append(image)
+        if run:
+            runs.append(run)
+        
+        packed, errors = [], []
+        for group in runs:
+            color, number_up, media, orientation = layout_key(group[0])
+            first = group[0]["index"]
+            out_path = os.path.join(job_dir, f"file_{first}.pdf")
+            try:
+                pages = images_to_pdf(
+                    [image["path"] for image in group],
+                    out_path,
+                    number_up=number_up,
+                    media=media,
+                    dpi=self.image_dpi,
+                    color=color,
+                    bw_mode=self.bw_image_mode,
+                    landscape=orientation == "LANDSCAPE",
+                    mapper=partial(self.cpu_pool.map, cancel=cancel) if self.cpu_pool else None,
+                    batch=self.cpu_pool.workers if self.cpu_pool else 4,
+                    cancel=cancel
+                )
+            except Exception as e:
+                if cancel:
+                    cancel.check()
+                print(f"   ❌ Image layout failed: {e}")
+                errors.append({"url": group[0]["path"], "error": str(e), "type": "CONVERSION_ERROR"})
+                continue
+            finally:
+                for image in group:
+                    if os.path.exists(image["path"]):
+                        os.remove(image["path"])
+            
+            if not pages:
+                errors.append({"url": group[0]["path"], "error": "no readable images", "type": "CONVERSION_ERROR"})
+                continue
+            print(f"   ✅ {len(group)} image(s) on {pages} page(s): {out_path}")
+            packed.append({
+                "path": out_path,
+                "index": first,
+                "indexes": [image["index"] for image in group],
+                # Already laid out: CUPS must not n-up or rotate it again
+                "settings": {"number_up": 1, "orientation": "PORTRAIT"},
+            })
+        return packed, errors
+    
+    # ========================================================================
+    # RESUMABLE, VERIFIED DOWNLOAD
+    # ========================================================================
+    def _fetch(self, response, url, target, expected_hash=None, on_bytes=None, cancel=None):
+        """
+        Save `response` to `target`, picking up from the last byte written
+        with a Range request when the transfer drops or ends short.
+        
+        The file only appears under `target` once its length matches
+        Content-Length and its digest matches `expected_hash`; otherwise the
+        .part file is dropped and IntegrityError is raised. A server that
+        compresses anyway (despite Accept-Encoding: identity) gets no
+        length check and no Range resume, since both count wire bytes.
+        
+        Args:
+            response (requests.Response): Open streaming GET for `url`
+            expected_hash (tuple): (algorithm, hexdigest) or None
+            on_bytes (callable): on_bytes(received, size) after each chunk
+            cancel (CancelToken): Closes the open response when fired
+            
+        Returns:
+            int: Bytes saved
+        """
+        cancel = cancel or CancelToken()
+        size = int(response.headers.get("Content-Length") or 0) or None
+        if size and not self.storage.ensure_space(size):
+            raise IOError("Job storage full")
+        encoded = _content_encoded(response)
+        if encoded:
+            size = None
+        # Only resume if the file can't have changed in between
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        digest = hashlib.new(expected_hash[0]) if expected_hash else None
+        received = 0
+        
+        # Closing the response wakes a read blocked on a stalled connection
+        current = {"response": response}
+        
+        def close_current():
+            if current["response"] is not None:
+                abort_response(current["response"])
+        
+        with self.storage.open_atomic(target) as f, cancel.on_cancel(close_current):
+            for attempt in range(DOWNLOAD_RESUMES + 1):
+                if response is None:
+                    cancel.wait(min(2 ** (attempt - 1), 8))
+                    cancel.check()
+                    headers = dict(DOWNLOAD_HEADERS)
+                    if not encoded:
+                        headers["Range"] = f"bytes={received}-"
+                        if validator:
+                            headers["If-Range"] = validator
+                    try:
+                        response = requests.get(url, headers=headers, timeout=30, stream=True)
+                        current["response"] = response
+                    except requests.exceptions.RequestException as e:
+                        if attempt == DOWNLOAD_RESUMES:
+                            raise
+                        print(f"   ⚠️  Resume request failed: {type(e).__name__}")
+                        continue
+                    
+                    if response.status_code == 206 and _range_start(response) == received:
+                        print(f"   ↪️  Resuming at byte {received}")
+                    elif response.status_code == 200:
+                        # No range support (or the file changed): start over
+                        print("   🔁 Server ignored Range, restarting download")
+                        f.seek(0)
+                        f.truncate()
+                        received = 0
+                        digest = hashlib.new(expected_hash[0]) if expected_hash else None
+                        encoded = _content_encoded(response)
+                        size = None if encoded else int(response.headers.get("Content-Length") or 0) or None
+                    else:
+                        response.close()
+                        if response.status_code >= 500 and attempt < DOWNLOAD_RESUMES:
+                            print(f"   ⚠️  Resume answered {response.status_code}")
+                            response = None
+                            continue
+                        response.raise_for_status()
+                        raise IntegrityError(f"unexpected resume answer {response.status_code}")
+                
+                try:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        cancel.check()
+                        f.write(chunk)
+                        if digest:
+                            digest.update(chunk)
+                        received += len(chunk)
+                        if on_bytes:
+                            on_bytes(received, size)
+                    if size is None or received >= size:
+                        break
+                    print(f"   ⚠️  Transfer ended at {received}/{size} bytes")
+                except requests.exceptions.RequestException as e:
+                    cancel.check()
+                    if attempt == DOWNLOAD_RESUMES:
+                        raise
+                    print(f"   ⚠️  Transfer dropped at {received} bytes: {type(e).__name__}")
+                finally:
+                    response.close()
+                response = None
+            
+            # Raising here keeps the .part file from being renamed into place
+            if size is not None and received != size:
+                raise IntegrityError(f"got {received} of {size} bytes")
+            if digest and digest.hexdigest() != expected_hash[1]:
+                raise IntegrityError(f"{expected_hash[0]} mismatch")
+        
+        return received
+    
+    # ========================================================================
+    # OPEN A STREAMING DOWNLOAD
+    # ========================================================================
+    def open_stream(self, url):
+        """
+        Start a streaming GET for a file that goes straight to the spooler.
+        
+        Returns:
+            requests.Response: Open response; read with iter_content()
+        """
+        r = requests.get(url, headers=DOWNLOAD_HEADERS, timeout=30, stream=True)
+        r.raise_for_status()
+        return r
+    
     # ========================================================================
     # MARK ORDER AS PRINTED
     # ========================================================================
@@ -228,7 +577,7 @@ class BackendService:
         headers = {"x-printer-key": self.printer_key}
         
         try:
-            res = requests.post(
+            res = self.session.post(
                 url,
                 json={"orderId": order_id},
                 headers=headers,
@@ -239,12 +588,24 @@ class BackendService:
                 print(f"✅ Order {order_id} marked as printed")
                 
                 # Clean up temp files
-                job_dir = os.path.join(self.base_dir, order_id)
-                if os.path.exists(job_dir):
-                    shutil.rmtree(job_dir)
+                if self.storage.release(order_id):
                     print(f"🧹 Cleaned up temp files")
             else:
                 print(f"⚠️  Failed to mark printed: {res.status_code}")
         
         except Exception as e:
             print(f"⚠️  Could not notify backend: {e}")
+    
+    # ========================================================================
+    # FINISH JOB (SUCCESS OR FAILURE)
+    # ========================================================================
+    def finish_job(self, order_id):
+        """
+        Hand an order's temp files back to the storage manager.
+        Printed orders are already deleted by mark_as_printed(); anything
+        left (failed prints, unmarked orders) is evicted by age/LRU.
+        
+        Args:
+            order_id (str): Order ID whose workflow has ended
+        """
+        self.storage.finish(order_id)
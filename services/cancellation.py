@@ -0,0 +1,133 @@
+"""
+Cooperative cancellation for one order.
+
+A CancelToken travels with an order through the pipeline (job["cancel"])
+and into the services doing the work. Cancelling it does two things:
+
+    - every stage boundary and chunk / batch / poll loop that checks the
+      token stops (check() raises Cancelled)
+    - callbacks registered by work that is blocked right now run at once:
+      closing the open HTTP response, killing a converter, Ghostscript or
+      CpuPool worker process, withdrawing the order from the print queue
+
+so an order stops within a second instead of at its next loop iteration.
+Callbacks run on the cancelling thread (a keypad or control API handler)
+and must be quick; slow clean-up such as cancelling the CUPS job belongs in
+the loop that notices the token.
+
+    cancel = CancelToken()
+    pipeline.run(code, cancel=cancel)     # workflow thread
+    cancel.cancel("keypad")               # any other thread
+"""
+import itertools
+import socket
+import subprocess
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """The order was cancelled; raised by CancelToken.check()."""
+
+
+class CancelToken:
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the order and run the registered callbacks.
+
+        Returns:
+            bool: False if it was already cancelled
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        logger.info(f"Cancelling order ({reason})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancel callback failed: {e}")
+        return True
+
+    def check(self):
+        """Raise Cancelled if the order was cancelled."""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout=None):
+        """Sleep up to `timeout` seconds; returns True as soon as it's cancelled."""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def on_cancel(self, callback):
+        """Run `callback` if the order is cancelled inside the block (or already was)."""
+        with self._lock:
+            key = None if self._event.is_set() else next(self._ids)
+            if key is not None:
+                self._callbacks[key] = callback
+        if key is None:
+            callback()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._callbacks.pop(key, None)
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+
+def abort_response(response):
+    """
+    Close a streaming requests response from another thread. close() alone
+    leaves a read blocked in recv(); shutting the socket down wakes it.
+    """
+    try:
+        sock = response.raw._fp.fp.raw._sock
+    except AttributeError:
+        # Already released, or not a plain http.client socket
+        sock = None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def run_process(cmd, cancel=None, timeout=None, **kwargs):
+    """
+    subprocess.run(cmd, capture_output=True, timeout=timeout) that kills the
+    process as soon as `cancel` fires, then raises Cancelled.
+    """
+    if cancel is None:
+        return subprocess.run(cmd, capture_output=True, timeout=timeout, **kwargs)
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs) as proc:
+        with cancel.on_cancel(proc.kill):
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
+    cancel.check()
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
@@ -0,0 +1,104 @@
+"""
+Cloudinary delivery URL rewriting.
+
+Customers upload phone photos (12+ MP, several MB). Instead of pulling the
+original and shrinking it with PIL on the Pi, ask Cloudinary for a
+rendition that already fits the page at the printer's resolution:
+
+    .../image/upload/v1712/abc.jpg
+ -> .../image/upload/c_limit,w_1754,h_1754,b_white,e_grayscale,q_auto:good,f_jpg/v1712/abc.jpg
+
+Only image uploads are rewritten. Signed URLs (s--...--), raw/video
+resources and anything that isn't a Cloudinary delivery URL are returned
+unchanged, and callers fall back to the original URL when the rendition
+request fails (strict transformations, unknown asset).
+"""
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+from services.print_settings import MEDIA_INCHES
+
+# Delivery types whose URLs can carry transformations without a signature
+DELIVERY_TYPES = ("upload", "fetch")
+
+VERSION_PATTERN = re.compile(r"^v\d+$")
+ACTION_PATTERN = re.compile(r"^[a-z]{1,3}_[^,]+$")
+
+
+def is_cloudinary(url):
+    return "cloudinary" in (urlsplit(url).hostname or "").lower()
+
+
+def split_delivery_url(url):
+    """
+    Split a delivery URL into (prefix segments, rest segments), where
+    prefix ends with the delivery type and rest is
+    [transformations..., version?, public_id...]. None if not rewritable.
+    """
+    parts = urlsplit(url)
+    if not is_cloudinary(url):
+        return None
+    segments = parts.path.strip("/").split("/")
+    for i, segment in enumerate(segments[:-1]):
+        if segment in DELIVERY_TYPES and i >= 1 and segments[i - 1] == "image":
+            rest = segments[i + 1:]
+            if rest and rest[0].startswith("s--"):
+                # Signed URL: any change invalidates the signature
+                return None
+            return segments[:i + 1], rest
+    return None
+
+
+def _is_transformation(segment):
+    return all(ACTION_PATTERN.match(action) for action in segment.split(","))
+
+
+def page_pixels(media="A4", dpi=150):
+    """Longest page edge in pixels; used as a bound for both image edges."""
+    width, height = MEDIA_INCHES.get(media or "A4", MEDIA_INCHES["A4"])
+    return round(max(width, height) * dpi)
+
+
+def rendition_transformation(color="BW", media="A4", dpi=150, fmt="jpg", quality="auto:good"):
+    """
+    The transformation component for a printable rendition.
+    Bounding both edges by the long page edge keeps landscape photos
+    sharp after CUPS rotates them onto the page.
+    """
+    edge = page_pixels(media, dpi)
+    actions = [
+        f"c_limit,w_{edge},h_{edge}",
+        # Transparent PNGs land on white paper, not black
+        "b_white",
+    ]
+    if color == "BW":
+        actions.append("e_grayscale")
+    actions.append(f"q_{quality}")
+    actions.append(f"f_{fmt}")
+    return ",".join(actions)
+
+
+def rendition_url(url, color="BW", media="A4", dpi=150, fmt="jpg", quality="auto:good"):
+    """
+    Rewrite an image URL to a pre-sized (and, for BW, grayscale) rendition.
+
+    Returns:
+        str: Rewritten URL, or `url` unchanged when it can't be rewritten
+    """
+    split = split_delivery_url(url)
+    if split is None:
+        return url
+    prefix, rest = split
+
+    # Existing transformations stay; ours is chained after them
+    insert_at = next((i for i, segment in enumerate(rest) if VERSION_PATTERN.match(segment)), None)
+    if insert_at is None:
+        # No version: skip leading components that look like transformations
+        insert_at = 0
+        while insert_at < len(rest) - 1 and _is_transformation(rest[insert_at]):
+            insert_at += 1
+
+    transformation = rendition_transformation(color, media, dpi, fmt, quality)
+    segments = prefix + rest[:insert_at] + [transformation] + rest[insert_at:]
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, "/" + "/".join(segments), parts.query, parts.fragment))
@@ -0,0 +1,244 @@
+"""
+Local control API for the headless daemon (daemon.py).
+
+JSON over HTTP, served on localhost and/or a Unix socket:
+
+    GET  /status          printer readiness, keypad buffer, latest order
+                          (?station=<name> for one station's screen)
+    GET  /stations        every station's buffer and current order
+    GET  /orders          recent orders
+    GET  /orders/<id>     one order (state, stage, message, progress)
+    POST /orders          {"code": "123456", "station"?} -> submit a pickup code
+    POST /orders/<id>/cancel  stop a running order (and its print jobs)
+    POST /keys            {"key": "5", "station"?} -> same as a keypad press
+                          ("CANCEL" stops that station's order)
+    GET  /queue           print scheduler queue
+    GET  /metrics         per-stage pipeline metrics and printer snapshot
+
+ControlClient is the matching client used by the Tk thin client.
+"""
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+# ==========================================================
+# SERVER
+# ==========================================================
+
+class ControlHandler(BaseHTTPRequestHandler):
+    server_version = "AutoPrintControl/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("control: " + format % args)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("body too large")
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        daemon = self.server.daemon_app
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        station = parse_qs(url.query).get("station", [None])[0]
+
+        if path == "/status":
+            if station and station not in daemon.stations:
+                return self._reply(404, {"error": "UNKNOWN_STATION"})
+            return self._reply(200, daemon.status(station))
+        if path == "/stations":
+            return self._reply(200, {"stations": [s.snapshot() for s in daemon.stations.values()]})
+        if path == "/orders":
+            return self._reply(200, {"orders": daemon.recent_orders()})
+        if path.startswith("/orders/"):
+            order = daemon.get_order(path[len("/orders/"):])
+            if order is None:
+                return self._reply(404, {"error": "NOT_FOUND"})
+            return self._reply(200, order)
+        if path == "/queue":
+            return self._reply(200, {"queue": daemon.scheduler.queue()})
+        if path == "/metrics":
+            return self._reply(200, daemon.metrics())
+        return self._reply(404, {"error": "NOT_FOUND"})
+
+    def do_POST(self):
+        daemon = self.server.daemon_app
+        path = self.path.split("?")[0].rstrip("/")
+        try:
+            data = self._read_json()
+        except ValueError as e:
+            return self._reply(400, {"error": "BAD_REQUEST", "details": str(e)})
+
+        station = data.get("station")
+        if station is not None and station not in daemon.stations:
+            return self._reply(404, {"error": "UNKNOWN_STATION"})
+
+        if path == "/orders":
+            code = str(data.get("code", "")).strip()
+            if not code.isdigit():
+                return self._reply(400, {"error": "INVALID_CODE"})
+            return self._reply(202, daemon.submit(code, source="api", station=station))
+        if path.startswith("/orders/") and path.endswith("/cancel"):
+            order = daemon.cancel(path[len("/orders/"):-len("/cancel")], reason="api")
+            if order is None:
+                return self._reply(404, {"error": "NOT_FOUND"})
+            if order["state"] != "running":
+                return self._reply(409, {"error": "NOT_RUNNING", "state": order["state"]})
+            return self._reply(202, order)
+        if path == "/keys":
+            key = str(data.get("key", ""))
+            if not key:
+                return self._reply(400, {"error": "MISSING_KEY"})
+            daemon.handle_key(key, station=station)
+            return self._reply(200, daemon.status(station)["keypad"])
+        return self._reply(404, {"error": "NOT_FOUND"})
+
+
+class UnixControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    def __init__(self, daemon_app, host="127.0.0.1", port=8765, socket_path=None):
+        """
+        Args:
+            daemon_app: object with status/submit/cancel/handle_key/get_order/
+                        recent_orders/metrics, a .scheduler and .stations
+            port: TCP port on `host` (None = no TCP listener)
+            socket_path: Unix socket path (None = no Unix listener)
+        """
+        self.daemon_app = daemon_app
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self._servers = []
+
+    def start(self):
+        if self.port is not None:
+            server = ThreadingHTTPServer((self.host, self.port), ControlHandler)
+            server.daemon_threads = True
+            self._serve(server)
+            print(f"🛰️ Control API on http://{self.host}:{server.server_address[1]}")
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+            server = UnixControlServer(self.socket_path, ControlHandler)
+            os.chmod(self.socket_path, 0o660)
+            self._serve(server)
+            print(f"🛰️ Control API on unix:{self.socket_path}")
+
+    def _serve(self, server):
+        server.daemon_app = self.daemon_app
+        threading.Thread(target=server.serve_forever, name="control-api", daemon=True).start()
+        self._servers.append(server)
+
+    @property
+    def port_bound(self):
+        for server in self._servers:
+            if isinstance(server.server_address, tuple):
+                return server.server_address[1]
+        return None
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+# ==========================================================
+# CLIENT
+# ==========================================================
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=5):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ControlClient:
+    """
+    Talks to the daemon's control API (TCP or Unix socket). With `station`,
+    status, keys and codes are those of that station.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, socket_path=None, timeout=5, station=None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.station = station
+
+    def _request(self, method, path, payload=None):
+        if self.socket_path:
+            conn = _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode() if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body else {}
+            conn.request(method, path, body=body, headers=headers)
+            res = conn.getresponse()
+            return json.loads(res.read() or b"{}")
+        finally:
+            conn.close()
+
+    def _with_station(self, payload):
+        return dict(payload, station=self.station) if self.station else payload
+
+    def status(self):
+        if self.station:
+            return self._request("GET", f"/status?station={quote(self.station)}")
+        return self._request("GET", "/status")
+
+    def stations(self):
+        return self._request("GET", "/stations")
+
+    def submit(self, code):
+        return self._request("POST", "/orders", self._with_station({"code": code}))
+
+    def order(self, order_id):
+        return self._request("GET", f"/orders/{order_id}")
+
+    def cancel(self, order_id):
+        return self._request("POST", f"/orders/{order_id}/cancel")
+
+    def key(self, key):
+        return self._request("POST", "/keys", self._with_station({"key": key}))
+
+    def queue(self):
+        return self._request("GET", "/queue")
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
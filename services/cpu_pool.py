@@ -0,0 +1,411 @@
+"""
+Shared process pool for CPU-bound document work.
+
+PIL decoding/encoding (photo layout) and PDF analysis used to run in the
+workflow thread under the GIL, leaving three of the Pi 4's four cores idle.
+CpuPool keeps one warm worker process per core (PIL already imported, so
+the first task doesn't pay for it) and runs tasks on them:
+
+    - bounded queue: submit() raises CpuPoolBusy instead of piling up work
+    - per task time limit: SIGALRM inside the worker, and the worker is
+      killed and replaced if it still hasn't answered shortly after
+    - per task memory limit: RLIMIT_AS soft limit set around each task,
+      `memory_mb` above what the worker has mapped already (a worker
+      forked from a busy daemon inherits its threads' address space)
+    - ThermalGovernor: fewer tasks run at once as the SoC heats up or the
+      firmware reports throttling, so a long burst doesn't end up at a
+      capped clock
+    - cancel: a task submitted with a CancelToken is dropped if it hasn't
+      started, and its worker is killed (and replaced) if it has
+
+Tasks must be picklable (module-level functions and plain arguments):
+
+    pool = CpuPool()
+    pool.start()
+    pages = pool.run(images_to_pdf, paths, out_path, number_up=4)
+    fitted = pool.map(prepare_cell, paths)
+"""
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import multiprocessing
+import logging
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+from services.cancellation import Cancelled
+
+try:
+    import resource
+except ImportError:
+    # Windows: no rlimits, the time limit still applies
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Imported by every worker at start-up
+PRELOAD_MODULES = ("PIL.Image", "PIL.JpegImagePlugin", "PIL.PngImagePlugin", "PIL.PdfImagePlugin",
+                   "services.layout", "services.preflight")
+
+# Seconds past a task's time limit before its worker is killed
+KILL_GRACE = 5
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+# Firmware throttle flags (newer kernels expose them without vcgencmd)
+THROTTLE_SYSFS = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+# get_throttled bits that mean "slowed down right now"
+THROTTLED_NOW = 0x1 | 0x2 | 0x4 | 0x8  # under-voltage, freq capped, throttled, soft temp limit
+
+
+class CpuPoolBusy(Exception):
+    """The task queue is full."""
+
+
+class CpuTaskTimeout(Exception):
+    """A task ran past its time limit."""
+
+
+class CpuTaskError(Exception):
+    """The worker died or the task's exception couldn't be sent back."""
+
+
+# ==========================================================
+# WORKER PROCESS
+# ==========================================================
+
+def _alarm(signum, frame):
+    raise CpuTaskTimeout("task time limit")
+
+
+def address_space():
+    """Bytes of address space this process has mapped (VmSize); 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def memory_limit(memory_mb, hard_limit=None):
+    """RLIMIT_AS allowing `memory_mb` more than is mapped now (capped at the hard limit)."""
+    limit = address_space() + memory_mb * 1024 * 1024
+    if hard_limit is not None and hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+    return limit
+
+
+def _worker_main(conn, preload):
+    for name in preload:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    timers = hasattr(signal, "setitimer")
+    if timers:
+        signal.signal(signal.SIGALRM, _alarm)
+    hard_limit = resource.getrlimit(resource.RLIMIT_AS)[1] if resource else None
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        func, args, kwargs, time_limit, memory_mb = task
+
+        if resource and memory_mb:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit(memory_mb, hard_limit), hard_limit))
+        if timers and time_limit:
+            signal.setitimer(signal.ITIMER_REAL, time_limit)
+        try:
+            reply = ("ok", func(*args, **kwargs))
+        except BaseException as e:
+            reply = ("error", e)
+        finally:
+            if timers:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            if resource and memory_mb:
+                resource.setrlimit(resource.RLIMIT_AS, (hard_limit, hard_limit))
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send(("error", CpuTaskError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, preload):
+        self.preload = preload
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.preload),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def run(self, func, args, kwargs, time_limit, memory_mb, cancel=None):
+        """Send one task and wait for its reply; kills the process on a hard timeout or cancel."""
+        if self.process is None or not self.process.is_alive():
+            self.start()
+        self.conn.send((func, args, kwargs, time_limit, memory_mb))
+
+        wait = time_limit + KILL_GRACE if time_limit else None
+        try:
+            # A killed worker wakes poll() with EOF
+            with cancel.on_cancel(self.process.kill) if cancel else nullcontext():
+                if self.conn.poll(wait):
+                    return self.conn.recv()
+        except (EOFError, OSError):
+            self.stop()
+            if cancel and cancel.cancelled:
+                return ("error", Cancelled(cancel.reason))
+            return ("error", CpuTaskError("worker process died"))
+        # Stuck in C code where SIGALRM can't reach it
+        self.stop()
+        return ("error", CpuTaskTimeout(f"killed after {wait}s"))
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(0.5)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+        self.process = None
+
+
+# ==========================================================
+# THERMAL GOVERNOR
+# ==========================================================
+
+class ThermalGovernor:
+    """
+    How many CPU tasks may run at once, from the SoC temperature and the
+    firmware's throttle flags. Full width below `soft_temp`, shrinking
+    linearly to one task at `hard_temp` or while throttled. Off a Pi (no
+    sensor) it always allows `max_workers`.
+    """
+
+    def __init__(self, max_workers, soft_temp=70.0, hard_temp=78.0, interval=5):
+        self.max_workers = max_workers
+        self.soft_temp = soft_temp
+        self.hard_temp = hard_temp
+        self.interval = interval
+        self.vcgencmd = shutil.which("vcgencmd")
+        self.temperature = None
+        self.throttled = 0
+        self._allowed = max_workers
+        self._sampled = 0
+        self._lock = threading.Lock()
+
+    def _read_temperature(self):
+        try:
+            with open(THERMAL_ZONE) as f:
+                return int(f.read().strip()) / 1000
+        except (OSError, ValueError):
+            return None
+
+    def _read_throttled(self):
+        try:
+            with open(THROTTLE_SYSFS) as f:
+                return int(f.read().strip(), 16)
+        except (OSError, ValueError):
+            pass
+        if not self.vcgencmd:
+            return 0
+        try:
+            out = subprocess.run([self.vcgencmd, "get_throttled"], capture_output=True,
+                                 text=True, timeout=2).stdout
+            return int(out.strip().split("=")[1], 16)
+        except (OSError, subprocess.TimeoutExpired, IndexError, ValueError):
+            return 0
+
+    def allowed(self):
+        """Concurrent tasks allowed right now (re-sampled every `interval` s)."""
+        with self._lock:
+            if time.monotonic() - self._sampled < self.interval:
+                return self._allowed
+            self._sampled = time.monotonic()
+            self.temperature = self._read_temperature()
+            self.throttled = self._read_throttled()
+
+            allowed = self.max_workers
+            if self.throttled & THROTTLED_NOW:
+                allowed = 1
+            elif self.temperature is not None and self.temperature > self.soft_temp:
+                headroom = max(0.0, (self.hard_temp - self.temperature) / (self.hard_temp - self.soft_temp))
+                allowed = max(1, 1 + int((self.max_workers - 1) * headroom))
+
+            if allowed != self._allowed:
+                logger.info(f"CPU governor: {self._allowed} -> {allowed} workers "
+                            f"({self.temperature}°C, throttled=0x{self.throttled:x})")
+            self._allowed = allowed
+            return allowed
+
+
+# ==========================================================
+# POOL
+# ==========================================================
+
+class CpuPool:
+    def __init__(self, workers=None, queue_size=32, time_limit=120, memory_mb=512,
+                 soft_temp=70.0, hard_temp=78.0, governor=None, preload=PRELOAD_MODULES):
+        """
+        Args:
+            workers: worker processes (None = one per core)
+            queue_size: tasks allowed to wait before submit() raises CpuPoolBusy
+            time_limit: default seconds per task
+            memory_mb: default address-space limit per task
+            soft_temp, hard_temp: thresholds for the default ThermalGovernor
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.memory_mb = memory_mb
+        self.governor = governor or ThermalGovernor(self.workers, soft_temp=soft_temp, hard_temp=hard_temp)
+        self._tasks = queue.Queue(maxsize=queue_size)
+        self._workers = [_Worker(preload) for _ in range(self.workers)]
+        self._threads = []
+        self._active = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self.completed = 0
+        self.timeouts = 0
+
+    # ==========================================================
+    # LIFECYCLE
+    # ==========================================================
+
+    def start(self):
+        """Fork the workers (they import PIL now, not on the first order)."""
+        if self._threads:
+            return
+        for index, worker in enumerate(self._workers):
+            worker.start()
+            thread = threading.Thread(target=self._dispatch, args=(worker,), name=f"cpu-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"CPU pool started with {self.workers} workers")
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(2)
+        for worker in self._workers:
+            worker.stop()
+        self._threads = []
+
+    # ==========================================================
+    # SUBMIT
+    # ==========================================================
+
+    def submit(self, func, *args, time_limit=None, memory_mb=None, cancel=None, **kwargs):
+        """
+        Queue `func(*args, **kwargs)` for a worker. A task whose `cancel`
+        token fires fails with Cancelled.
+
+        Returns:
+            concurrent.futures.Future
+        """
+        if not self._threads:
+            self.start()
+        future = Future()
+        task = (future, func, args, kwargs, time_limit or self.time_limit, memory_mb or self.memory_mb, cancel)
+        try:
+            self._tasks.put_nowait(task)
+        except queue.Full:
+            raise CpuPoolBusy(f"{self._tasks.qsize()} tasks already waiting")
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """submit() and wait; raises whatever the task raised."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def map(self, func, items, **options):
+        """
+        Run func(item) for every item across the pool; results in order.
+        Items that don't fit in the queue run in the calling thread.
+        """
+        cancel = options.get("cancel")
+        futures = []
+        for item in items:
+            try:
+                futures.append(self.submit(func, item, **options))
+            except CpuPoolBusy:
+                if cancel:
+                    cancel.check()
+                future = Future()
+                future.set_result(func(item))
+                futures.append(future)
+        return [future.result() for future in futures]
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "allowed": self.governor.allowed(),
+            "active": self._active,
+            "queued": self._tasks.qsize(),
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "temperature": self.governor.temperature,
+            "throttled": self.governor.throttled,
+        }
+
+    # ==========================================================
+    # DISPATCH (ONE THREAD PER WORKER)
+    # ==========================================================
+
+    def _dispatch(self, worker):
+        while not self._stop.is_set():
+            try:
+                task = self._tasks.get(timeout=1)
+            except queue.Empty:
+                continue
+            future, func, args, kwargs, time_limit, memory_mb, cancel = task
+
+            # Hold the task until the governor has room for it
+            with self._cond:
+                while self._active >= self.governor.allowed() and not self._stop.is_set():
+                    if cancel and cancel.cancelled:
+                        break
+                    self._cond.wait(1)
+                self._active += 1
+
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if cancel and cancel.cancelled:
+                    # Dropped before it started; the worker stays warm
+                    future.set_exception(Cancelled(cancel.reason))
+                    continue
+                status, value = worker.run(func, args, kwargs, time_limit, memory_mb, cancel)
+                if status == "ok":
+                    future.set_result(value)
+                else:
+                    if isinstance(value, CpuTaskTimeout):
+                        self.timeouts += 1
+                    future.set_exception(value)
+                self.completed += 1
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify()
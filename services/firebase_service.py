@@ -1,8 +1,20 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
 import os
 
+# firebase_admin / google.cloud.firestore take seconds to import on a Pi,
+# so they are loaded when the service is first created
+firebase_admin = credentials = firestore = FieldFilter = None
+
+
+def _load_firebase():
+    global firebase_admin, credentials, firestore, FieldFilter
+    if firebase_admin is None:
+        import firebase_admin as _firebase_admin
+        from firebase_admin import credentials as _credentials, firestore as _firestore
+        from google.cloud.firestore_v1.base_query import FieldFilter as _FieldFilter
+        firebase_admin, credentials, firestore, FieldFilter = (
+            _firebase_admin, _credentials, _firestore, _FieldFilter
+        )
+
 
 class FirebaseService:
     def __init__(self, key_path="serviceAccountKey.json"):
@@ -11,6 +23,8 @@ class FirebaseService:
                 f"❌ Firebase key file not found: {key_path}"
             )
 
+        _load_firebase()
+
         # Initialize only once
         if not firebase_admin._apps:
             try:
@@ -0,0 +1,124 @@
+"""
+Image -> printable PDF conversion that matches the order's color mode.
+
+BW orders are printed with ColorModel=Gray anyway, so sending RGB only
+triples the bytes written, spooled and rasterized. For BW the image is
+reduced before it is wrapped into a PDF:
+
+    "gray"       8-bit grayscale (photos)
+    "dither"     1-bit Floyd-Steinberg (smallest; fine on laser printers)
+    "threshold"  1-bit Otsu threshold after a contrast stretch (text scans,
+                 photographed notes)
+
+NumPy is used for the contrast stretch and threshold when installed;
+otherwise the same steps run through PIL lookup tables.
+"""
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: PIL lookup tables do the same job a little slower
+    np = None
+
+logger = logging.getLogger(__name__)
+
+BW_MODES = ("gray", "dither", "threshold")
+
+# Percent of darkest/brightest pixels clipped by the contrast stretch
+CONTRAST_CUTOFF = 1
+
+
+def _flatten(image):
+    """RGBA/LA/P -> RGB on white (transparent areas would print black)."""
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode not in ("RGB", "L", "1"):
+        return image.convert("RGB")
+    return image
+
+
+def stretch_contrast(gray, cutoff=CONTRAST_CUTOFF):
+    """Map the cutoff..100-cutoff percentile range of an L image to 0..255."""
+    if np is not None:
+        pixels = np.asarray(gray)
+        low, high = np.percentile(pixels, (cutoff, 100 - cutoff))
+        if high - low < 1:
+            return gray
+        scaled = (pixels.astype(np.float32) - low) * (255.0 / (high - low))
+        from PIL import Image
+        return Image.fromarray(np.clip(scaled, 0, 255).astype(np.uint8), "L")
+
+    from PIL import ImageOps
+    return ImageOps.autocontrast(gray, cutoff=cutoff)
+
+
+def otsu_level(gray):
+    """Threshold that best separates ink from paper (Otsu on the histogram)."""
+    histogram = gray.histogram()[:256]
+    total = sum(histogram)
+    if np is not None:
+        counts = np.asarray(histogram, dtype=np.float64)
+        levels = np.arange(256)
+        weight_bg = np.cumsum(counts)
+        weight_fg = total - weight_bg
+        sum_bg = np.cumsum(counts * levels)
+        mean_bg = np.divide(sum_bg, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+        mean_fg = np.divide(sum_bg[-1] - sum_bg, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+        return int(np.argmax(weight_bg * weight_fg * (mean_bg - mean_fg) ** 2))
+
+    grand_sum = sum(level * count for level, count in enumerate(histogram))
+    best_level, best_score = 127, -1.0
+    weight_bg = sum_bg = 0
+    for level, count in enumerate(histogram):
+        weight_bg += count
+        sum_bg += level * count
+        weight_fg = total - weight_bg
+        if not weight_bg or not weight_fg:
+            continue
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (grand_sum - sum_bg) / weight_fg
+        score = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if score > best_score:
+            best_level, best_score = level, score
+    return best_level
+
+
+def threshold(gray, level):
+    if np is not None:
+        from PIL import Image
+        return Image.fromarray(np.asarray(gray) > level).convert("1")
+    return gray.point(lambda value: 255 if value > level else 0).convert("1", dither=None)
+
+
+def prepare_for_print(image, color="BW", bw_mode="gray"):
+    """
+    Reduce an image to what the printer will actually use.
+
+    Returns:
+        PIL.Image: RGB for color orders; L or 1-bit for BW orders
+    """
+    image = _flatten(image)
+    if color != "BW":
+        return image.convert("RGB") if image.mode != "RGB" else image
+
+    gray = image if image.mode in ("L", "1") else image.convert("L")
+    if gray.mode == "1" or bw_mode == "gray":
+        return gray
+    if bw_mode == "dither":
+        return gray.convert("1")
+    if bw_mode == "threshold":
+        gray = stretch_contrast(gray)
+        return threshold(gray, otsu_level(gray))
+    logger.warning(f"Unknown BW image mode {bw_mode!r}, using gray")
+    return gray
+
+
+def image_to_pdf(image, out, color="BW", bw_mode="gray", resolution=100.0):
+    """Write `image` (PIL.Image) to `out` (path or binary file) as a one-page PDF."""
+    prepare_for_print(image, color, bw_mode).save(out, "PDF", resolution=resolution)
@@ -0,0 +1,466 @@
+import http.client
+import os
+import stat
+import struct
+import itertools
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# ==========================================================
+# IPP CONSTANTS (RFC 8010 / RFC 8011)
+# ==========================================================
+
+IPP_VERSION = (2, 0)
+
+OP_PRINT_JOB = 0x0002
+OP_VALIDATE_JOB = 0x0004
+OP_CANCEL_JOB = 0x0008
+OP_GET_JOB_ATTRIBUTES = 0x0009
+OP_GET_JOBS = 0x000A
+OP_GET_PRINTER_ATTRIBUTES = 0x000B
+OP_CUPS_GET_DEFAULT = 0x4001
+
+TAG_OPERATION = 0x01
+TAG_JOB = 0x02
+TAG_END = 0x03
+TAG_PRINTER = 0x04
+TAG_UNSUPPORTED_GROUP = 0x05
+
+TAG_UNSUPPORTED = 0x10
+TAG_UNKNOWN = 0x12
+TAG_NO_VALUE = 0x13
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_OCTET_STRING = 0x30
+TAG_DATETIME = 0x31
+TAG_RESOLUTION = 0x32
+TAG_RANGE = 0x33
+TAG_BEG_COLLECTION = 0x34
+TAG_TEXT_LANG = 0x35
+TAG_NAME_LANG = 0x36
+TAG_END_COLLECTION = 0x37
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+TAG_MEMBER_NAME = 0x4A
+
+INTEGER_TAGS = (TAG_INTEGER, TAG_ENUM)
+GROUP_NAMES = {
+    TAG_OPERATION: "operation",
+    TAG_JOB: "job",
+    TAG_PRINTER: "printer",
+    TAG_UNSUPPORTED_GROUP: "unsupported",
+}
+
+# Well-known attributes and the tag they must be sent with
+ATTRIBUTE_TAGS = {
+    "attributes-charset": TAG_CHARSET,
+    "attributes-natural-language": TAG_LANGUAGE,
+    "printer-uri": TAG_URI,
+    "job-uri": TAG_URI,
+    "requesting-user-name": TAG_NAME,
+    "job-name": TAG_NAME,
+    "document-format": TAG_MIME_TYPE,
+    "requested-attributes": TAG_KEYWORD,
+    "which-jobs": TAG_KEYWORD,
+    "job-id": TAG_INTEGER,
+    "copies": TAG_INTEGER,
+    "number-up": TAG_INTEGER,
+    "sides": TAG_KEYWORD,
+    "print-color-mode": TAG_KEYWORD,
+    "media": TAG_KEYWORD,
+    "multiple-document-handling": TAG_KEYWORD,
+    "orientation-requested": TAG_ENUM,
+    "page-ranges": TAG_RANGE,
+    # Response attributes (used by the stand-in server)
+    "status-message": TAG_TEXT,
+    "job-state": TAG_ENUM,
+    "job-state-reasons": TAG_KEYWORD,
+    "job-impressions-completed": TAG_INTEGER,
+    "printer-name": TAG_NAME,
+    "printer-state": TAG_ENUM,
+    "printer-state-reasons": TAG_KEYWORD,
+    "printer-is-accepting-jobs": TAG_BOOLEAN,
+    "queued-job-count": TAG_INTEGER,
+    "sides-supported": TAG_KEYWORD,
+    "color-supported": TAG_BOOLEAN,
+}
+
+# Request read size when streaming document bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class IppError(Exception):
+    """Raised when the IPP server rejects a request or is unreachable."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# ==========================================================
+# ENCODING
+# ==========================================================
+
+def _encode_value(tag, value):
+    if tag in INTEGER_TAGS:
+        return struct.pack(">i", int(value))
+    if tag == TAG_BOOLEAN:
+        return b"\x01" if value else b"\x00"
+    if tag == TAG_RANGE:
+        low, high = value
+        return struct.pack(">ii", int(low), int(high))
+    if tag == TAG_RESOLUTION:
+        x, y, units = value
+        return struct.pack(">iib", x, y, units)
+    if tag in (TAG_UNSUPPORTED, TAG_UNKNOWN, TAG_NO_VALUE):
+        return b""
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+def _guess_tag(name, value):
+    if name in ATTRIBUTE_TAGS:
+        return ATTRIBUTE_TAGS[name]
+    if isinstance(value, bool):
+        return TAG_BOOLEAN
+    if isinstance(value, int):
+        return TAG_INTEGER
+    if isinstance(value, tuple) and len(value) == 2:
+        return TAG_RANGE
+    return TAG_KEYWORD
+
+
+def encode_attribute(name, value, tag=None):
+    """Encode one attribute; lists become additional values."""
+    values = value if isinstance(value, list) else [value]
+    tag = tag or _guess_tag(name, values[0] if values else None)
+
+    out = bytearray()
+    for i, item in enumerate(values):
+        key = name.encode("utf-8") if i == 0 else b""
+        data = _encode_value(tag, item)
+        out += struct.pack(">Bh", tag, len(key)) + key
+        out += struct.pack(">h", len(data)) + data
+    return bytes(out)
+
+
+def encode_message(code, request_id, groups, version=IPP_VERSION):
+    """
+    Encode an IPP request/response header.
+
+    Args:
+        code (int): operation-id for requests, status-code for responses
+        groups (list): [(group_tag, {name: value})]; value tags come from
+            ATTRIBUTE_TAGS or are guessed from the Python type
+    """
+    out = bytearray(struct.pack(">BBHi", version[0], version[1], code, request_id))
+    for group_tag, attributes in groups:
+        out.append(group_tag)
+        for name, value in attributes.items():
+            out += encode_attribute(name, value)
+    out.append(TAG_END)
+    return bytes(out)
+
+
+# ==========================================================
+# DECODING
+# ==========================================================
+
+def _decode_value(tag, data):
+    if tag in INTEGER_TAGS:
+        return struct.unpack(">i", data)[0]
+    if tag == TAG_BOOLEAN:
+        return data != b"\x00"
+    if tag == TAG_RANGE:
+        return struct.unpack(">ii", data)
+    if tag == TAG_RESOLUTION:
+        return struct.unpack(">iib", data)
+    if tag in (TAG_UNSUPPORTED, TAG_UNKNOWN, TAG_NO_VALUE):
+        return None
+    if tag == TAG_OCTET_STRING or tag == TAG_DATETIME:
+        return data
+    return data.decode("utf-8", errors="replace")
+
+
+def decode_message(data):
+    """
+    Decode an IPP message header.
+
+    Returns:
+        dict: {"version", "code", "request_id", "groups": [(name, {attr: value})],
+               "data_offset"} where multi-valued attributes are lists and
+               collections are skipped
+
+    Raises:
+        IppError: truncated or malformed message
+    """
+    if len(data) < 9:
+        raise IppError("Truncated IPP message")
+    try:
+        return _decode_message(data)
+    except (struct.error, IndexError, UnicodeDecodeError, TypeError) as e:
+        raise IppError(f"Malformed IPP message: {e}")
+
+
+def _read_field(data, pos):
+    """Length-prefixed field at `pos`; returns (bytes, next position)."""
+    length = struct.unpack(">h", data[pos:pos + 2])[0]
+    pos += 2
+    if length < 0 or pos + length > len(data):
+        raise IndexError(f"field of {length} bytes at offset {pos} overruns the message")
+    return data[pos:pos + length], pos + length
+
+
+def _decode_message(data):
+    major, minor, code, request_id = struct.unpack(">BBHi", data[:8])
+    groups = []
+    current = None
+    last_name = None
+    depth = 0
+    pos = 8
+
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+
+        if tag == TAG_END:
+            break
+        if tag < 0x10:
+            current = {}
+            groups.append((GROUP_NAMES.get(tag, str(tag)), current))
+            continue
+
+        name, pos = _read_field(data, pos)
+        name = name.decode("utf-8")
+        raw, pos = _read_field(data, pos)
+
+        # Collections are not needed by this client; skip their members
+        if tag == TAG_BEG_COLLECTION:
+            depth += 1
+            if depth == 1 and name and current is not None:
+                last_name = name
+                current[name] = {}
+            continue
+        if tag == TAG_END_COLLECTION:
+            depth -= 1
+            continue
+        if depth or current is None:
+            continue
+
+        value = _decode_value(tag, raw)
+        if name:
+            last_name = name
+            current[name] = value
+        elif last_name:
+            existing = current.get(last_name)
+            if not isinstance(existing, list):
+                existing = [existing]
+            existing.append(value)
+            current[last_name] = existing
+    else:
+        raise IndexError("no end-of-attributes tag")
+
+    return {
+        "version": (major, minor),
+        "code": code,
+        "request_id": request_id,
+        "groups": groups,
+        "data_offset": pos,
+    }
+
+
+def group(message, name):
+    """Return the first attribute group with this name (or {})."""
+    for group_name, attributes in message["groups"]:
+        if group_name == name:
+            return attributes
+    return {}
+
+
+def _is_regular_file(document):
+    """True for on-disk files (sendfile-able), False for streams and pipes."""
+    try:
+        return stat.S_ISREG(os.fstat(document.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+# ==========================================================
+# IPP CLIENT
+# ==========================================================
+
+class IppClient:
+    """
+    Minimal IPP/1.1-2.0 client over HTTP (CUPS on localhost:631 by default).
+    Local files go to the socket with sendfile(); other documents are
+    streamed with chunked transfer encoding, so the whole file never has
+    to sit in memory.
+    """
+
+    def __init__(self, base_url="http://localhost:631", user="autoprint", timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 631
+        self.user = user
+        self.timeout = timeout
+        self._request_ids = itertools.count(1)
+
+    # ==========================================================
+    # TRANSPORT
+    # ==========================================================
+
+    def printer_uri(self, printer_name):
+        return f"ipp://{self.host}:{self.port}/printers/{printer_name}"
+
+    def _operation(self, extra=None, printer_name=None, printer_uri=None):
+        attrs = {
+            "attributes-charset": "utf-8",
+            "attributes-natural-language": "en",
+        }
+        if printer_uri or printer_name:
+            attrs["printer-uri"] = printer_uri or self.printer_uri(printer_name)
+        if extra:
+            attrs.update(extra)
+        return attrs
+
+    def _send(self, operation, path, groups, document=None):
+        header = encode_message(operation, next(self._request_ids), groups)
+
+        def body():
+            yield header
+            while True:
+                chunk = document.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            if _is_regular_file(document):
+                # Local file: kernel copies it to the socket with sendfile()
+                size = os.fstat(document.fileno()).st_size - document.tell()
+                conn.putrequest("POST", path)
+                conn.putheader("Content-Type", "application/ipp")
+                conn.putheader("Content-Length", str(len(header) + size))
+                conn.endheaders(header)
+                conn.sock.sendfile(document)
+            elif document is not None:
+                # Network stream or pipe: chunked upload, fixed-size buffers
+                conn.request(
+                    "POST",
+                    path,
+                    body=body(),
+                    headers={"Content-Type": "application/ipp"},
+                    encode_chunked=True,
+                )
+            else:
+                conn.request("POST", path, body=header, headers={"Content-Type": "application/ipp"})
+            res = conn.getresponse()
+            data = res.read()
+        except (OSError, http.client.HTTPException) as e:
+            # BadStatusLine/IncompleteRead are not OSErrors
+            raise IppError(f"IPP server unreachable: {e}")
+        finally:
+            conn.close()
+
+        if res.status != 200:
+            raise IppError(f"HTTP {res.status} from IPP server", status=res.status)
+
+        message = decode_message(data)
+        if message["code"] >= 0x0400:
+            detail = group(message, "operation").get("status-message", "")
+            raise IppError(f"IPP status 0x{message['code']:04x} {detail}".strip(), status=message["code"])
+        return message
+
+    # ==========================================================
+    # OPERATIONS
+    # ==========================================================
+
+    def print_job(self, printer_name, document, job_attributes=None,
+                  document_format="application/pdf", job_name="autoprint"):
+        """
+        Submit a document (path or binary file object) with Print-Job.
+
+        Returns:
+            dict: {"job_id": int, "job_state": int, "job_uri": str}
+
+        Raises:
+            IppError: rejected, unreachable, or no job-id in the response
+        """
+        operation = self._operation({
+            "requesting-user-name": self.user,
+            "job-name": job_name,
+            "document-format": document_format,
+        }, printer_name)
+        groups = [(TAG_OPERATION, operation)]
+        if job_attributes:
+            groups.append((TAG_JOB, job_attributes))
+
+        if isinstance(document, (str, os.PathLike)):
+            with open(document, "rb") as f:
+                message = self._send(OP_PRINT_JOB, f"/printers/{printer_name}", groups, f)
+        else:
+            message = self._send(OP_PRINT_JOB, f"/printers/{printer_name}", groups, document)
+
+        job = group(message, "job")
+        if job.get("job-id") is None:
+            # Nothing to poll or cancel; don't report the document as printing
+            raise IppError("Print-Job response has no job-id", status=message["code"])
+        return {
+            "job_id": job.get("job-id"),
+            "job_state": job.get("job-state"),
+            "job_uri": job.get("job-uri"),
+        }
+
+    def get_job_attributes(self, printer_name, job_id, requested=None):
+        operation = self._operation({
+            "job-id": int(job_id),
+            "requesting-user-name": self.user,
+            "requested-attributes": requested or ["job-state", "job-impressions-completed"],
+        }, printer_name)
+        message = self._send(OP_GET_JOB_ATTRIBUTES, f"/printers/{printer_name}", [(TAG_OPERATION, operation)])
+        return group(message, "job")
+
+    def get_printer_attributes(self, printer_name, requested=None, printer_uri=None):
+        """
+        Get-Printer-Attributes for a CUPS queue, or for a device addressed
+        directly by `printer_uri` (e.g. ipp://10.0.0.20/ipp/print).
+        """
+        operation = self._operation({
+            "requesting-user-name": self.user,
+            "requested-attributes": requested or [
+                "printer-state",
+                "printer-state-reasons",
+                "printer-is-accepting-jobs",
+                "queued-job-count",
+            ],
+        }, printer_name, printer_uri)
+        path = (urlsplit(printer_uri).path or "/") if printer_uri else f"/printers/{printer_name}"
+        message = self._send(OP_GET_PRINTER_ATTRIBUTES, path, [(TAG_OPERATION, operation)])
+        return group(message, "printer")
+
+    def cancel_job(self, printer_name, job_id):
+        operation = self._operation({
+            "job-id": int(job_id),
+            "requesting-user-name": self.user,
+        }, printer_name)
+        self._send(OP_CANCEL_JOB, f"/printers/{printer_name}", [(TAG_OPERATION, operation)])
+        return True
+
+    def get_default_printer(self):
+        """CUPS-Get-Default; returns the default queue name or None."""
+        operation = self._operation({"requested-attributes": ["printer-name"]})
+        try:
+            message = self._send(OP_CUPS_GET_DEFAULT, "/", [(TAG_OPERATION, operation)])
+        except IppError:
+            return None
+        return group(message, "printer").get("printer-name")
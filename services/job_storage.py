@@ -0,0 +1,164 @@
+import os
+import shutil
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PART_SUFFIX = ".part"
+
+
+class JobStorage:
+    """
+    Owns the temp job directories (temp_jobs/<orderId>/file_N.pdf).
+
+    - Job directories are tracked with their last use; directories of
+      finished or failed orders are evicted by age, then least recently
+      used first, whenever the size budget is exceeded.
+    - Orders that are still being processed are never evicted.
+    - A startup sweep removes everything left behind by a crash.
+    - Files are written to <name>.part and renamed into place, so a
+      half-written download is never mistaken for a complete one.
+    - "tmpfs" staging keeps job files in RAM (/dev/shm) to spare the SD card.
+    """
+
+    def __init__(self, base_dir="temp_jobs", max_bytes=500 * 1024 * 1024,
+                 max_age=24 * 3600, min_free_bytes=200 * 1024 * 1024,
+                 staging="disk", tmpfs_dir="/dev/shm/autoprint"):
+        if staging == "tmpfs" and os.path.isdir(os.path.dirname(tmpfs_dir)):
+            base_dir = tmpfs_dir
+        elif staging == "tmpfs":
+            print(f"⚠️ tmpfs not available, staging jobs in {base_dir}")
+
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_free_bytes = min_free_bytes
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    # ==========================================================
+    # STARTUP SWEEP
+    # ==========================================================
+
+    def sweep_orphans(self):
+        """Remove job directories and partial files left by a previous run."""
+        removed = 0
+        with self._lock:
+            for entry in os.scandir(self.base_dir):
+                if entry.name in self._jobs:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+        if removed:
+            print(f"🧹 Removed {removed} orphaned job folder(s)")
+            logger.info(f"Startup sweep removed {removed} orphaned entries from {self.base_dir}")
+        return removed
+
+    # ==========================================================
+    # JOB LIFECYCLE
+    # ==========================================================
+
+    def acquire(self, order_id):
+        """Create/claim the directory for an order and protect it from eviction."""
+        self.evict()
+        path = os.path.join(self.base_dir, order_id)
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._jobs[order_id] = {"path": path, "last_used": time.time(), "active": True}
+        return path
+
+    def finish(self, order_id):
+        """Order is done (printed or failed); its files may now be evicted."""
+        with self._lock:
+            job = self._jobs.get(order_id)
+            if job:
+                job["active"] = False
+                job["last_used"] = time.time()
+
+    def release(self, order_id):
+        """Delete an order's files right away."""
+        with self._lock:
+            job = self._jobs.pop(order_id, None)
+        path = job["path"] if job else os.path.join(self.base_dir, order_id)
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        return False
+
+    # ==========================================================
+    # QUOTA + EVICTION
+    # ==========================================================
+
+    def usage(self):
+        total = 0
+        for root, _, files in os.walk(self.base_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def evict(self, incoming=0):
+        """
+        Drop expired inactive jobs, then the least recently used inactive
+        ones until `incoming` more bytes fit in the budget.
+        """
+        now = time.time()
+        with self._lock:
+            inactive = sorted(
+                (job["last_used"], order_id)
+                for order_id, job in self._jobs.items()
+                if not job["active"]
+            )
+
+        for last_used, order_id in inactive:
+            if now - last_used > self.max_age:
+                self.release(order_id)
+                logger.info(f"Evicted expired job files for {order_id}")
+
+        usage = self.usage()
+        for last_used, order_id in inactive:
+            if usage + incoming <= self.max_bytes:
+                break
+            if order_id in self._jobs:
+                self.release(order_id)
+                logger.info(f"Evicted job files for {order_id} to stay under budget")
+                usage = self.usage()
+
+    def ensure_space(self, nbytes):
+        """Make room for `nbytes`; returns False if the budget/disk cannot fit it."""
+        self.evict(incoming=nbytes)
+        if self.usage() + nbytes > self.max_bytes:
+            return False
+        free = shutil.disk_usage(self.base_dir).free
+        return free - nbytes >= self.min_free_bytes
+
+    # ==========================================================
+    # ATOMIC WRITES
+    # ==========================================================
+
+    @contextmanager
+    def open_atomic(self, path):
+        """Write to <path>.part and rename over `path` only on success."""
+        tmp_path = path + PART_SUFFIX
+        try:
+            with open(tmp_path, "wb") as f:
+                yield f
+                f.flush()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def write_atomic(self, path, data):
+        with self.open_atomic(path) as f:
+            f.write(data)
@@ -0,0 +1,200 @@
+"""
+Photo layout engine: phone photos of notes -> packed, printable pages.
+
+Each image is turned upright from its EXIF orientation, trimmed of flat
+margins (table, paper border), rotated to suit its cell and fitted into a
+grid of `number_up` cells on a page of the order's paper size. The whole
+group becomes one multi-page PDF, written a page at a time (PIL's PDF
+append), so memory holds one batch of photos no matter how many there are.
+The per-photo work (decode, crop, fit) can be spread over a CpuPool.
+
+    images_to_pdf(paths, out_path, number_up=4, media="A4", color="BW")
+
+Grids (portrait page; landscape swaps columns and rows):
+    1 -> 1x1, 2 -> 1x2, 4 -> 2x2, 6 -> 2x3, 9 -> 3x3, 16 -> 4x4
+"""
+import os
+import logging
+from functools import partial
+
+from services.image_convert import prepare_for_print
+from services.job_storage import PART_SUFFIX
+from services.print_settings import MEDIA_INCHES
+
+logger = logging.getLogger(__name__)
+
+# number_up -> (columns, rows) on a portrait page
+GRIDS = {1: (1, 1), 2: (1, 2), 4: (2, 2), 6: (2, 3), 9: (3, 3), 16: (4, 4)}
+
+PAGE_MARGIN_INCHES = 0.25
+GUTTER_INCHES = 0.12
+
+# Max per-channel difference from the border color still counted as margin
+CROP_TOLERANCE = 24
+# Never crop away more than this share of either dimension
+MAX_CROP = 0.4
+
+
+def load_upright(path, max_edge=None):
+    """
+    Open an image and apply its EXIF orientation. With `max_edge`, big
+    JPEGs are decoded at a reduced scale (draft) that still covers it.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(path)
+    if max_edge:
+        image.draft(image.mode, (max_edge, max_edge))
+    upright = ImageOps.exif_transpose(image)
+    if upright is not image:
+        image.close()
+    return upright
+
+
+def autocrop(image, tolerance=CROP_TOLERANCE):
+    """
+    Trim borders that match the corner color (desk, scanner bed, blank
+    paper edge). Leaves the image alone if the trim would be drastic.
+    """
+    from PIL import Image, ImageChops
+
+    rgb = image.convert("RGB")
+    corners = [rgb.getpixel(xy) for xy in ((0, 0), (rgb.width - 1, 0), (0, rgb.height - 1),
+                                           (rgb.width - 1, rgb.height - 1))]
+    background = tuple(sorted(channel)[1] for channel in zip(*corners))
+    diff = ImageChops.difference(rgb, Image.new("RGB", rgb.size, background)).convert("L")
+    box = diff.point(lambda value: 255 if value > tolerance else 0).getbbox()
+    if not box:
+        return image
+
+    width, height = box[2] - box[0], box[3] - box[1]
+    if width < image.width * (1 - MAX_CROP) or height < image.height * (1 - MAX_CROP):
+        return image
+    return image.crop(box)
+
+
+def page_grid(number_up, landscape=False):
+    columns, rows = GRIDS.get(number_up, (1, 1))
+    return (rows, columns) if landscape else (columns, rows)
+
+
+def page_size(media="A4", dpi=150, landscape=False):
+    width, height = MEDIA_INCHES.get(media or "A4", MEDIA_INCHES["A4"])
+    if landscape:
+        width, height = height, width
+    return round(width * dpi), round(height * dpi)
+
+
+def cells(number_up, size, dpi, landscape=False):
+    """Cell boxes (left, top, width, height) in reading order."""
+    columns, rows = page_grid(number_up, landscape)
+    margin, gutter = round(PAGE_MARGIN_INCHES * dpi), round(GUTTER_INCHES * dpi)
+    cell_w = (size[0] - 2 * margin - (columns - 1) * gutter) // columns
+    cell_h = (size[1] - 2 * margin - (rows - 1) * gutter) // rows
+    return [
+        (margin + col * (cell_w + gutter), margin + row * (cell_h + gutter), cell_w, cell_h)
+        for row in range(rows) for col in range(columns)
+    ]
+
+
+def fit_into(image, cell_w, cell_h):
+    """Rotate to the cell's orientation, then scale to fit (keeping aspect)."""
+    from PIL import Image
+
+    if (image.width > image.height) != (cell_w > cell_h) and image.width != image.height:
+        image = image.transpose(Image.Transpose.ROTATE_90)
+    scale = min(cell_w / image.width, cell_h / image.height)
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS if scale < 1 else Image.Resampling.BICUBIC)
+
+
+def prepare_cell(path, cell_w, cell_h, max_edge=None, color="BW", crop=True):
+    """
+    Load, crop and fit one photo for a cell; the slow, per-image part of a
+    layout, so it can run on a CpuPool worker.
+
+    Returns:
+        PIL.Image | None: None if the file can't be read
+    """
+    try:
+        image = load_upright(path, max_edge=max_edge)
+    except OSError as e:
+        # One unreadable upload shouldn't sink the rest
+        logger.warning(f"Skipping unreadable image {path}: {e}")
+        return None
+    try:
+        if crop:
+            image = autocrop(image)
+        # Flattened onto white and matched to the page's mode
+        fitted = prepare_for_print(fit_into(image, cell_w, cell_h), color=color, bw_mode="gray")
+        fitted.load()
+        return fitted
+    finally:
+        image.close()
+
+
+def paste_cells(fitted, number_up, media="A4", dpi=150, color="BW", landscape=False):
+    """Center already-fitted images in the page's cells."""
+    from PIL import Image
+
+    size = page_size(media, dpi, landscape)
+    page = Image.new("L" if color == "BW" else "RGB", size, 255 if color == "BW" else (255, 255, 255))
+    for image, (left, top, cell_w, cell_h) in zip(fitted, cells(number_up, size, dpi, landscape)):
+        page.paste(image, (left + (cell_w - image.width) // 2, top + (cell_h - image.height) // 2))
+    return page
+
+
+def compose_page(images, number_up, media="A4", dpi=150, color="BW", landscape=False, crop=True):
+    """Lay out up to `number_up` images on one page image."""
+    size = page_size(media, dpi, landscape)
+    fitted = []
+    for image, (_, _, cell_w, cell_h) in zip(images, cells(number_up, size, dpi, landscape)):
+        if crop:
+            image = autocrop(image)
+        fitted.append(prepare_for_print(fit_into(image, cell_w, cell_h), color=color, bw_mode="gray"))
+    return paste_cells(fitted, number_up, media, dpi, color, landscape)
+
+
+def images_to_pdf(paths, out_path, number_up=1, media="A4", dpi=150, color="BW",
+                  bw_mode="gray", landscape=False, crop=True, mapper=None, batch=4, cancel=None):
+    """
+    Pack `paths` into one PDF at `out_path`, `number_up` images per page.
+    Written to <out_path>.part and renamed on success.
+
+    Args:
+        mapper: map-like callable (e.g. CpuPool.map) that runs prepare_cell
+            on other cores; None prepares the images here
+        batch: images prepared at once (bounds memory with a mapper)
+        cancel: CancelToken checked between batches (raises Cancelled)
+
+    Returns:
+        int: Pages written
+    """
+    per_page = number_up if number_up in GRIDS else 1
+    max_edge = max(page_size(media, dpi))
+    _, _, cell_w, cell_h = cells(per_page, page_size(media, dpi, landscape), dpi, landscape)[0]
+    prepare = partial(prepare_cell, cell_w=cell_w, cell_h=cell_h, max_edge=max_edge, color=color, crop=crop)
+    # Whole pages per batch, so no page straddles two
+    step = per_page * max(1, -(-batch // per_page)) if mapper else per_page
+    tmp_path = out_path + PART_SUFFIX
+    pages = 0
+    try:
+        for start in range(0, len(paths), step):
+            if cancel:
+                cancel.check()
+            fitted = [image for image in (mapper or map)(prepare, paths[start:start + step]) if image is not None]
+            for first in range(0, len(fitted), per_page):
+                page = paste_cells(fitted[first:first + per_page], per_page, media, dpi, color, landscape)
+                page = prepare_for_print(page, color, bw_mode)
+                page.save(tmp_path, "PDF", resolution=float(dpi), append=pages > 0)
+                pages += 1
+            for image in fitted:
+                image.close()
+        if pages:
+            os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info(f"Laid out {len(paths)} images on {pages} pages ({per_page}-up)")
+    return pages
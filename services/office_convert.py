@@ -0,0 +1,521 @@
+"""
+Conversion stage (runs between download_files and preflight).
+
+download_files saves every non-image download as file_N.pdf without
+looking at it. This stage sniffs what the bytes really are: PDFs pass
+through, images that slipped past the Content-Type check are laid out like
+photos, and Word/PowerPoint/Excel/OpenDocument files are turned into PDF.
+
+Office files go to a pool of LibreOffice instances started ahead of time
+(one `unoserver` per worker, each with its own profile), so a customer
+never pays LibreOffice's multi-second cold start; `unoconvert` hands the
+file to an idle instance. Converted PDFs are cached by content hash, so a
+reprint of the same document is a file copy.
+
+Without unoserver every file falls back to a cold `soffice --convert-to`,
+as does any file arriving while no warm worker is running (a crashed
+worker is restarted with back-off), and without LibreOffice office files are rejected as UNSUPPORTED_FILE.
+Cancelling the order kills the running conversion; its LibreOffice
+instance is restarted, since it may still be busy with the file.
+"""
+import itertools
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+import logging
+
+from services.cancellation import Cancelled, run_process
+from services.preflight import file_hash
+from services.layout import images_to_pdf
+
+logger = logging.getLogger(__name__)
+
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+
+# Top-level part folder of an OOXML package -> type
+OOXML_PARTS = (("word/", "docx"), ("ppt/", "pptx"), ("xl/", "xlsx"))
+
+# OpenDocument "mimetype" entry -> type
+ODF_MIMETYPES = {
+    "application/vnd.oasis.opendocument.text": "odt",
+    "application/vnd.oasis.opendocument.presentation": "odp",
+    "application/vnd.oasis.opendocument.spreadsheet": "ods",
+}
+
+# Legacy binary Office files share one container; the URL tells them apart
+OLE_TYPES = ("doc", "xls", "ppt")
+
+OFFICE_TYPES = {"docx", "pptx", "xlsx", "odt", "odp", "ods", "rtf"} | set(OLE_TYPES)
+IMAGE_TYPES = {"jpeg", "png"}
+
+# Seconds to wait for a freshly started unoserver to accept connections
+STARTUP_TIMEOUT = 60
+
+# Seconds between attempts to bring a failed worker back (last one repeats)
+RESTART_BACKOFF = (5, 15, 60, 300)
+
+# Seconds between cancel checks while waiting for a free worker
+CANCEL_POLL = 0.2
+
+
+# ==========================================================
+# TYPE SNIFFING
+# ==========================================================
+
+def sniff_type(path, url=None):
+    """
+    Identify a download by its content, not its name.
+
+    Returns:
+        str: "pdf", "jpeg", "png", an office type ("docx", "xlsx", "odt",
+             "doc", ...) or None if unrecognised
+    """
+    with open(path, "rb") as f:
+        head = f.read(1024)
+
+    if b"%PDF-" in head:
+        return "pdf"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+
+    if head.startswith(ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+                if "mimetype" in names:
+                    mimetype = archive.read("mimetype").decode("ascii", "replace").strip()
+                    return ODF_MIMETYPES.get(mimetype)
+        except (zipfile.BadZipFile, OSError):
+            return None
+        for prefix, kind in OOXML_PARTS:
+            if any(name.startswith(prefix) for name in names):
+                return kind
+        return None
+
+    if head.startswith(OLE_MAGIC):
+        ext = (url or "").lower().split("?")[0].rsplit(".", 1)[-1]
+        # LibreOffice detects the real filter either way; "doc" is a hint
+        return ext if ext in OLE_TYPES else "doc"
+
+    return None
+
+
+# ==========================================================
+# WARM LIBREOFFICE WORKER
+# ==========================================================
+
+class _Worker:
+    """One unoserver (and the soffice it owns) on its own ports and profile."""
+
+    def __init__(self, index, unoserver, soffice, base_port, profile_dir):
+        self.index = index
+        self.unoserver = unoserver
+        self.soffice = soffice
+        # XML-RPC port for unoconvert; UNO port between unoserver and soffice
+        self.port = base_port + 2 * index
+        self.uno_port = self.port + 1
+        self.profile = os.path.join(profile_dir, f"worker{index}")
+        self.process = None
+
+    def start(self):
+        os.makedirs(self.profile, exist_ok=True)
+        self.process = subprocess.Popen(
+            [
+                self.unoserver,
+                "--interface", "127.0.0.1",
+                "--port", str(self.port),
+                "--uno-port", str(self.uno_port),
+                "--executable", self.soffice,
+                "--user-installation", "file://" + os.path.abspath(self.profile),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # Own process group: stop() takes soffice down with it
+            start_new_session=True
+        )
+
+    def wait_ready(self, timeout=STARTUP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive():
+                return False
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return True
+            except OSError:
+                time.sleep(0.5)
+        return False
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, 15)
+                self.process.wait(10)
+            except (OSError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(self.process.pid, 9)
+                except OSError:
+                    pass
+                self.process.wait()
+        self.process = None
+
+
+# ==========================================================
+# CONVERTER
+# ==========================================================
+
+class OfficeConverter:
+    def __init__(self, workers=1, cache_dir="convert_cache", time_limit=120, base_port=2003,
+                 profile_dir=None, cache_max_bytes=200 * 1024 * 1024):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.time_limit = time_limit
+        self.cache_max_bytes = cache_max_bytes
+        self.profile_dir = profile_dir or os.path.join(tempfile.gettempdir(), "autoprint-office")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.soffice = shutil.which("soffice") or shutil.which("libreoffice")
+        unoserver = shutil.which("unoserver")
+        self.unoconvert = shutil.which("unoconvert")
+        self.warm = bool(self.soffice and unoserver and self.unoconvert)
+
+        self._workers = [
+            _Worker(i, unoserver, self.soffice, base_port, self.profile_dir)
+            for i in range(workers)
+        ] if self.warm else []
+        # Workers ready for a file; convert() takes one, returns it after
+        self._idle = queue.Queue()
+        # Workers in rotation (idle or converting); the rest are restarting
+        self._healthy = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        if not self.soffice:
+            print("⚠️ LibreOffice not found; office documents will be rejected")
+        elif not self.warm:
+            print("⚠️ unoserver not found; office documents use a cold soffice per file")
+
+    @property
+    def available(self):
+        return self.soffice is not None
+
+    # ==========================================================
+    # LIFECYCLE
+    # ==========================================================
+
+    def start(self):
+        """
+        Start every worker and wait until each one is up (run it from the
+        warm-up threads, not per order).
+
+        Returns:
+            bool: True if at least one warm worker is ready
+        """
+        self._stopping.clear()
+        for worker in self._workers:
+            worker.start()
+        ready = 0
+        for worker in self._workers:
+            if self._prime(worker):
+                self._release(worker)
+                ready += 1
+            else:
+                self._restart(worker)
+        if self._workers:
+            logger.info(f"Office converter: {ready}/{len(self._workers)} workers ready")
+        return ready > 0
+
+    def stop(self):
+        self._stopping.set()
+        for worker in self._workers:
+            worker.stop()
+
+    def _release(self, worker):
+        """Put a working worker (back) into rotation."""
+        with self._lock:
+            self._healthy.add(worker)
+        self._idle.put(worker)
+
+    def _prime(self, worker):
+        """
+        Wait for the worker, then convert a tiny document so Writer is loaded.
+
+        Returns:
+            bool: True if the warm-up conversion worked
+        """
+        if not worker.wait_ready():
+            logger.warning(f"Office worker {worker.index} did not start")
+            return False
+        sample_dir = tempfile.mkdtemp(prefix="autoprint-prime-")
+        try:
+            sample = os.path.join(sample_dir, "warmup.rtf")
+            with open(sample, "w") as f:
+                f.write("{\\rtf1 warm-up\\par}")
+            ok = self._unoconvert(worker, sample, os.path.join(sample_dir, "warmup.pdf"))
+        finally:
+            shutil.rmtree(sample_dir, ignore_errors=True)
+        if not ok:
+            logger.warning(f"Office worker {worker.index} failed its warm-up conversion")
+        return ok
+
+    def _restart(self, worker):
+        """
+        Replace a hung or crashed worker in the background, retrying with
+        RESTART_BACKOFF until it converts again (or the converter stops).
+        """
+        with self._lock:
+            self._healthy.discard(worker)
+
+        def run():
+            for attempt in itertools.count():
+                worker.stop()
+                if self._stopping.is_set():
+                    return
+                worker.start()
+                if self._prime(worker):
+                    self._release(worker)
+                    return
+                delay = RESTART_BACKOFF[min(attempt, len(RESTART_BACKOFF) - 1)]
+                logger.warning(f"Office worker {worker.index} restart failed; retrying in {delay}s")
+                if self._stopping.wait(delay):
+                    worker.stop()
+                    return
+
+        threading.Thread(target=run, name=f"office-restart-{worker.index}", daemon=True).start()
+
+    # ==========================================================
+    # CACHE
+    # ==========================================================
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pdf")
+
+    def _prune(self):
+        """Drop the oldest converted PDFs once the cache outgrows its budget."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".part"):
+                # Another order's conversion in progress
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            total += stat.st_size
+        for _, path, size in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # ==========================================================
+    # CONVERT
+    # ==========================================================
+
+    def convert(self, path, out_path, cancel=None):
+        """
+        Convert an office document to PDF at `out_path` (cached by content hash).
+        Raises Cancelled if `cancel` fires during the conversion.
+
+        Returns:
+            dict: {"ok", "error", "cached"}
+        """
+        if not self.available:
+            return {"ok": False, "error": "UNSUPPORTED_FILE", "cached": False}
+
+        digest = file_hash(path)
+        cached = self._cache_path(digest)
+        if os.path.exists(cached):
+            os.utime(cached)
+            shutil.copyfile(cached, out_path)
+            print("   ⚡ Conversion cache hit")
+            return {"ok": True, "error": None, "cached": True}
+
+        start = time.time()
+        # Unique per conversion: two orders with the same document convert side by side
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{digest}.", suffix=".pdf.part", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            if self.warm:
+                ok = self._convert_warm(path, tmp_path, cancel)
+            else:
+                ok = self._convert_cold(path, tmp_path, cancel)
+            if not ok or not os.path.exists(tmp_path) or not os.path.getsize(tmp_path):
+                return {"ok": False, "error": "CONVERSION_ERROR", "cached": False}
+            os.replace(tmp_path, cached)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        logger.info(f"Converted {os.path.basename(path)} in {time.time() - start:.1f}s")
+        shutil.copyfile(cached, out_path)
+        self._prune()
+        return {"ok": True, "error": None, "cached": False}
+
+    def _convert_warm(self, path, out_path, cancel=None):
+        with self._lock:
+            running = bool(self._healthy)
+        if not running:
+            # Every worker is down or restarting: don't queue behind them
+            logger.warning("No office worker running, converting cold")
+            return self._convert_cold(path, out_path, cancel)
+        worker = self._next_idle(cancel)
+        if worker is None:
+            logger.warning("No office worker free, converting cold")
+            return self._convert_cold(path, out_path, cancel)
+
+        if not worker.alive():
+            self._restart(worker)
+            return self._convert_cold(path, out_path, cancel)
+        try:
+            ok = self._unoconvert(worker, path, out_path, cancel)
+        except Cancelled:
+            self._restart(worker)
+            raise
+        if ok:
+            self._release(worker)
+        else:
+            # A failed or timed-out conversion can leave soffice wedged
+            self._restart(worker)
+        return ok
+
+    def _next_idle(self, cancel=None):
+        """
+        Take an idle worker, or None once `time_limit` passes without one.
+        Raises Cancelled if `cancel` fires while every worker is busy.
+        """
+        deadline = time.monotonic() + self.time_limit
+        while True:
+            if cancel:
+                cancel.check()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                return self._idle.get(timeout=min(CANCEL_POLL, remaining))
+            except queue.Empty:
+                continue
+
+    def _unoconvert(self, worker, path, out_path, cancel=None):
+        try:
+            result = run_process(
+                [
+                    self.unoconvert,
+                    "--host", "127.0.0.1",
+                    "--port", str(worker.port),
+                    "--convert-to", "pdf",
+                    path, out_path,
+                ],
+                cancel=cancel,
+                timeout=self.time_limit
+            )
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Office conversion timed out for {path}")
+            return False
+        if result.returncode != 0:
+            logger.warning(f"unoconvert failed: {result.stderr[-200:]}")
+            return False
+        return True
+
+    def _convert_cold(self, path, out_path, cancel=None):
+        """One-off soffice with a throwaway profile (no unoserver installed)."""
+        work_dir = tempfile.mkdtemp(prefix="autoprint-soffice-")
+        try:
+            result = run_process(
+                [
+                    self.soffice, "--headless", "--norestore",
+                    "-env:UserInstallation=file://" + os.path.join(work_dir, "profile"),
+                    "--convert-to", "pdf", "--outdir", work_dir, path,
+                ],
+                cancel=cancel,
+                timeout=self.time_limit
+            )
+            produced = os.path.join(work_dir, os.path.splitext(os.path.basename(path))[0] + ".pdf")
+            if result.returncode != 0 or not os.path.exists(produced):
+                logger.warning(f"soffice failed: {result.stderr[-200:]}")
+                return False
+            shutil.move(produced, out_path)
+            return True
+        except subprocess.TimeoutExpired:
+            logger.warning(f"soffice timed out for {path}")
+            return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ==========================================================
+# WORKFLOW HELPER
+# ==========================================================
+
+def convert_files(converter, files, order_settings=None, progress=None, cancel=None):
+    """
+    Make every downloaded file a PDF in place: sniffs each one, converts
+    office documents and lays out stray images. Streamed items (no local
+    file) are skipped. Raises Cancelled once `cancel` fires.
+
+    Returns:
+        dict: {"success": True} or {"success": False, "error", "index"}
+    """
+    total = len(files)
+    for position, item in enumerate(files):
+        if cancel:
+            cancel.check()
+        path = item.get("path")
+        if not path:
+            continue
+        kind = sniff_type(path, item.get("url"))
+        if kind == "pdf":
+            continue
+        if progress:
+            progress.emit("convert", force=True, file=position + 1, total=total)
+
+        base = os.path.splitext(path)[0]
+        if kind in IMAGE_TYPES:
+            settings = dict(order_settings or {}, **(item.get("settings") or {}))
+            source = f"{base}.{kind}"
+            os.replace(path, source)
+            try:
+                pages = images_to_pdf([source], path, media=settings.get("media"),
+                                      color=settings.get("color", "BW"))
+            except Exception as e:
+                logger.warning(f"Image conversion failed for {source}: {e}")
+                pages = 0
+            finally:
+                os.remove(source)
+            if not pages:
+                return {"success": False, "error": "CONVERSION_ERROR", "index": item.get("index")}
+            print(f"   ✅ Image converted: {os.path.basename(path)}")
+            continue
+
+        if kind not in OFFICE_TYPES or converter is None or not converter.available:
+            print(f"   ❌ Unsupported file type ({kind or 'unknown'}): {os.path.basename(path)}")
+            return {"success": False, "error": "UNSUPPORTED_FILE", "index": item.get("index")}
+
+        # LibreOffice picks its import filter partly from the extension
+        source = f"{base}.{kind}"
+        os.replace(path, source)
+        print(f"   🔄 Converting {kind.upper()} to PDF...")
+        try:
+            result = converter.convert(source, path, cancel=cancel)
+        finally:
+            os.remove(source)
+        if not result["ok"]:
+            print(f"   ❌ Conversion failed: {result['error']}")
+            return {"success": False, "error": result["error"], "index": item.get("index")}
+        print(f"   ✅ Converted: {os.path.basename(path)}")
+    return {"success": True}
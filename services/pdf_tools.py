@@ -0,0 +1,90 @@
+import os
+import shutil
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+_pypdf = None
+
+
+def load_pypdf():
+    """
+    Import pypdf on first use (it is slow to import on a Pi).
+
+    Returns:
+        tuple: (PdfReader, PdfWriter), or (None, None) when pypdf is not
+               installed; qpdf (installed alongside cups-filters) is tried next
+    """
+    global _pypdf
+    if _pypdf is None:
+        try:
+            from pypdf import PdfReader, PdfWriter
+            _pypdf = (PdfReader, PdfWriter)
+        except ImportError:
+            _pypdf = (None, None)
+    return _pypdf
+
+
+# ==========================================================
+# PAGE EXTRACTION
+# ==========================================================
+
+def extract_pages(src, dst, page_ranges):
+    """
+    Write only the selected pages of `src` to `dst`, so unrequested pages
+    are never spooled or rendered.
+
+    Args:
+        page_ranges (list): [(first, last)] 1-based, inclusive
+
+    Returns:
+        bool: True if `dst` was written; False if no extractor is available
+              or the PDF could not be split (caller falls back to CUPS
+              page-ranges)
+    """
+    tmp_path = dst + ".part"
+    PdfReader, PdfWriter = load_pypdf()
+    try:
+        if PdfReader is not None:
+            reader = PdfReader(src)
+            if reader.is_encrypted:
+                return False
+            page_count = len(reader.pages)
+            writer = PdfWriter()
+            for first, last in page_ranges:
+                for index in range(first - 1, min(last, page_count)):
+                    writer.add_page(reader.pages[index])
+            if not writer.pages:
+                return False
+            with open(tmp_path, "wb") as f:
+                writer.write(f)
+
+        elif shutil.which("qpdf"):
+            spec = ",".join(
+                f"{first}-z" if last >= 2 ** 31 - 1 else f"{first}-{last}"
+                for first, last in page_ranges
+            )
+            result = subprocess.run(
+                ["qpdf", src, "--pages", src, spec, "--", tmp_path],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            # Exit code 3 means success with warnings
+            if result.returncode not in (0, 3):
+                logger.warning(f"qpdf page extraction failed: {result.stderr.strip()}")
+                return False
+
+        else:
+            return False
+
+        os.replace(tmp_path, dst)
+        return True
+
+    except Exception as e:
+        logger.warning(f"Page extraction failed for {src}: {e}")
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
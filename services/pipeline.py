@@ -0,0 +1,487 @@
+"""
+Order pipeline engine: verify -> download -> convert -> preflight -> raster -> print -> mark.
+
+Every entry point (main.py, main_v2.py, app.py, keypad_gui.py) drives the
+same PrintPipeline, so retry, timeout and error behaviour (and any latency
+fix) is shared. Each stage:
+
+    - works on one `job` dict (code, order_id, verify_res, files, ...)
+    - raises StageError(code) to stop the order with a known error code
+    - has its own timeout, retry count and concurrency limit
+    - is timed into the pipeline's metrics (and telemetry, when given)
+    - stops early when the order's CancelToken fires (job["cancel"])
+
+Stages only rely on duck-typed services: backend.verify_code /
+download_files / mark_as_printed / finish_job and printer.print_job
+(or a PrintScheduler). Stages with a timeout run under a CancelToken of
+their own (fired by the order's token, or when the stage times out), so
+their services must take `cancel`; the others only get it when the caller
+passed a CancelToken to run().
+"""
+import abc
+import threading
+import time
+import logging
+
+from services.print_settings import (
+    resolve_order_settings,
+    attach_file_settings,
+    PrintSettingsError
+)
+from services.cancellation import CancelToken
+from services.preflight import preflight_files
+from services.office_convert import convert_files
+from services.rasterizer import rasterize_files
+from services.scheduler import order_pages
+
+logger = logging.getLogger(__name__)
+
+# Seconds between cancel checks while an order waits for a stage slot
+CANCEL_POLL = 0.2
+
+# Seconds a timed-out or cancelled stage gets to stop before the order moves on
+STAGE_STOP_GRACE = 10
+
+# Error code -> text for the kiosk screen
+ERROR_MESSAGES = {
+    "INVALID_CODE": "Invalid or Expired Code",
+    "MISSING_ORDER_ID": "Invalid Order ID",
+    "AUTH_ERROR": "Printer Not Authorized",
+    "IP_ERROR": "Backend Offline",
+    "CONNECTION_ERROR": "Backend Offline",
+    "TIMEOUT": "Connection Timeout",
+    "INVALID_SETTINGS": "Invalid Print Settings",
+    "MISSING_FILES": "No Files Found",
+    "NO_FILES": "No Files Found",
+    "CLOUDINARY_ERROR": "Cloudinary Error",
+    "NO_SPACE": "Kiosk Storage Full",
+    "INTEGRITY_ERROR": "File Damaged in Transfer",
+    "CONVERSION_ERROR": "Could Not Convert File",
+    "UNSUPPORTED_FILE": "File Type Not Supported",
+    "ENCRYPTED_PDF": "Encrypted PDF",
+    "PRINT_FAILED": "Printing Failed or Printer Unavailable",
+    "STAGE_TIMEOUT": "Taking Too Long, Please Retry",
+    "CANCELLED": "Order Cancelled",
+    "SYSTEM_ERROR": "System Error",
+}
+
+
+def cancel_option(job):
+    """{"cancel": token} for duck-typed services, {} when the caller gave none."""
+    return {"cancel": job["cancel"]} if job.get("cancel") else {}
+
+
+class StageError(Exception):
+    """Stops the order; `code` is reported to the UI, logs and telemetry."""
+
+    def __init__(self, code, details=None):
+        super().__init__(code)
+        self.code = code
+        self.details = details
+
+
+def _check_cancel(cancel):
+    if cancel.cancelled:
+        raise StageError("CANCELLED", cancel.reason)
+
+
+# ==========================================================
+# STAGE BASE
+# ==========================================================
+
+class Stage(abc.ABC):
+    name = "stage"
+    # Shown on the kiosk when the stage starts (None = leave as is)
+    status = None
+    # UI text for failures not in ERROR_MESSAGES
+    default_error = "System Error"
+    # False once the pages are out: cancelling then would only skip bookkeeping
+    cancellable = True
+    # False for bookkeeping after the pages are out: a failure or timeout is
+    # logged and the order still succeeds (a timed-out run finishes on its own)
+    required = True
+
+    def __init__(self, timeout=None, retries=0, concurrency=None):
+        """
+        Args:
+            timeout: seconds before the order gives up on this stage (None = no limit)
+            retries: extra attempts after a StageError
+            concurrency: orders allowed in this stage at once (None = unlimited)
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+    @abc.abstractmethod
+    def run(self, job):
+        """Do the stage's work on `job`; raise StageError to stop the order."""
+
+    def message_for(self, code):
+        if code in ERROR_MESSAGES:
+            return ERROR_MESSAGES[code]
+        # The backend sends readable 400 messages ("Order not printable")
+        if code and " " in code and len(code) < 30:
+            return code
+        return self.default_error
+
+
+# ==========================================================
+# STAGES
+# ==========================================================
+
+class VerifyStage(Stage):
+    name = "verify"
+    default_error = "Invalid or Expired Code"
+
+    # verify_code's worst case is 3 x 15 s attempts plus back-off; its own
+    # TIMEOUT / CONNECTION_ERROR must come back before STAGE_TIMEOUT does
+    def __init__(self, backend, timeout=60, **kwargs):
+        super().__init__(timeout=timeout, **kwargs)
+        self.backend = backend
+
+    def run(self, job):
+        verify_res = self.backend.verify_code(job["code"])
+        if not verify_res or not verify_res.get("success"):
+            raise StageError(verify_res.get("error", "INVALID_CODE") if verify_res else "CONNECTION_ERROR")
+
+        job["order_id"] = verify_res.get("orderId")
+        if not job["order_id"]:
+            raise StageError("MISSING_ORDER_ID")
+        job["verify_res"] = verify_res
+
+        # Validate print settings once, before anything is downloaded
+        try:
+            job["order_settings"], job["file_settings"] = resolve_order_settings(verify_res)
+        except PrintSettingsError as e:
+            raise StageError("INVALID_SETTINGS", str(e))
+
+
+class DownloadStage(Stage):
+    name = "download"
+    status = "Code Verified! Preparing files..."
+    default_error = "Download Failed"
+
+    def __init__(self, backend, stream_pdfs=False, timeout=300, retries=1, concurrency=2, **kwargs):
+        super().__init__(timeout=timeout, retries=retries, concurrency=concurrency, **kwargs)
+        self.backend = backend
+        self.stream_pdfs = stream_pdfs
+
+    def run(self, job):
+        options = dict(cancel_option(job), progress=job["progress"])
+        if self.stream_pdfs:
+            options["stream_pdfs"] = True
+        download_res = self.backend.download_files(job["verify_res"], **options)
+        if not download_res or not download_res.get("success"):
+            error = download_res.get("error", "DOWNLOAD_ERROR") if download_res else "DOWNLOAD_ERROR"
+            raise StageError(error, download_res.get("details") if download_res else None)
+
+        job["files"] = download_res.get("files", [])
+        if not job["files"]:
+            raise StageError("NO_FILES")
+        attach_file_settings(job["files"], job["file_settings"])
+        logger.info(f"{len(job['files'])} files downloaded for {job['order_id']}")
+
+
+class ConvertStage(Stage):
+    name = "convert"
+    status = "Converting documents..."
+    default_error = "Could Not Convert File"
+
+    def __init__(self, converter, concurrency=1, **kwargs):
+        # The converter enforces its own per-file time limit
+        super().__init__(concurrency=concurrency, **kwargs)
+        self.converter = converter
+
+    def run(self, job):
+        result = convert_files(self.converter, job["files"], job["order_settings"],
+                               progress=job["progress"], cancel=job.get("cancel"))
+        if not result["success"]:
+            raise StageError(result["error"], f"file index {result.get('index')}")
+
+
+class PreflightStage(Stage):
+    name = "preflight"
+    default_error = "File Cannot Be Printed"
+
+    def __init__(self, preflight, concurrency=1, **kwargs):
+        # Preflight enforces its own per-file time limit
+        super().__init__(concurrency=concurrency, **kwargs)
+        self.preflight = preflight
+
+    def run(self, job):
+        result = preflight_files(self.preflight, job["files"], job["order_settings"],
+                                 progress=job["progress"], cancel=job.get("cancel"))
+        if not result["success"]:
+            raise StageError(result["error"], f"file index {result.get('index')}")
+
+
+class RasterStage(Stage):
+    name = "raster"
+    status = "Preparing pages..."
+
+    def __init__(self, rasterizer, concurrency=1, **kwargs):
+        # One order renders at a time; its pages already use every core
+        super().__init__(concurrency=concurrency, **kwargs)
+        self.rasterizer = rasterizer
+
+    def run(self, job):
+        # Never fails the order: files that don't render print through CUPS
+        rasterize_files(self.rasterizer, job["files"], job["order_settings"],
+                        progress=job["progress"], cancel=job.get("cancel"))
+
+
+class PrintStage(Stage):
+    name = "print"
+    status = "Printing in progress..."
+    default_error = "Printing Failed or Printer Unavailable"
+
+    def __init__(self, printer, scheduler=None, **kwargs):
+        # No timeout: a long order is still printing, not stuck
+        super().__init__(**kwargs)
+        self.printer = printer
+        self.scheduler = scheduler
+
+    def run(self, job):
+        job["pages"] = order_pages(job["files"], job["order_settings"], job["verify_res"])
+        if self.scheduler:
+            success = self.scheduler.run(
+                job["order_id"],
+                job["files"],
+                job["order_settings"],
+                pages=job["pages"],
+                order_type=job["verify_res"].get("orderType"),
+                progress=job["progress"],
+                **cancel_option(job)
+            )
+        else:
+            success = self.printer.print_job(job["files"], job["order_settings"], progress=job["progress"],
+                                             **cancel_option(job))
+        if not success:
+            raise StageError("PRINT_FAILED")
+
+
+class MarkStage(Stage):
+    name = "mark"
+    cancellable = False
+    required = False
+
+    def __init__(self, backend, timeout=30, **kwargs):
+        super().__init__(timeout=timeout, **kwargs)
+        self.backend = backend
+
+    def run(self, job):
+        self.backend.mark_as_printed(job["order_id"])
+        logger.info(f"Order {job['order_id']} marked as printed")
+
+
+# ==========================================================
+# ENGINE
+# ==========================================================
+
+class PrintPipeline:
+    def __init__(self, stages, backend=None, telemetry=None, on_status=None):
+        """
+        Args:
+            stages: Stage instances, run in order
+            backend: for finish_job() once an order is over (optional)
+            telemetry: TelemetryAgent for shared counters/latencies (optional)
+            on_status: callback(message) for stage status lines (optional)
+        """
+        self.stages = stages
+        self.backend = backend
+        self.telemetry = telemetry
+        self.on_status = on_status
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            stage.name: {"runs": 0, "failures": 0, "timeouts": 0, "active": 0, "total_time": 0.0, "max_time": 0.0}
+            for stage in stages
+        }
+
+    # ==========================================================
+    # RUN ONE ORDER
+    # ==========================================================
+
+    def run(self, code, progress=None, on_status=None, cancel=None):
+        """
+        Push one pickup code through every stage.
+
+        Args:
+            cancel: CancelToken another thread can fire to stop the order
+                (in-flight downloads, conversions and print jobs included)
+
+        Returns:
+            dict: {"success", "order_id", "stage", "error", "message", "pages"}
+        """
+        on_status = on_status or self.on_status
+        job = {"code": code, "order_id": None, "progress": progress, "cancel": cancel}
+        self._count("orders.started")
+        started = time.monotonic()
+        logger.info(f"Processing code: {code}")
+
+        try:
+            for stage in self.stages:
+                if on_status and stage.status:
+                    on_status(stage.status)
+                try:
+                    self._run_stage(stage, job)
+                except StageError as e:
+                    if not stage.required:
+                        logger.warning(f"Order {job['order_id'] or code}: {stage.name} failed after printing: "
+                                       f"{e.code} {e.details or ''}")
+                        self._count(f"warnings.{e.code}")
+                        continue
+                    logger.error(f"Order {job['order_id'] or code} failed in {stage.name}: {e.code} {e.details or ''}")
+                    self._count(f"failures.{e.code}")
+                    return {
+                        "success": False,
+                        "order_id": job["order_id"],
+                        "stage": stage.name,
+                        "error": e.code,
+                        "message": stage.message_for(e.code),
+                    }
+                except Exception as e:
+                    logger.exception(f"Stage {stage.name} crashed: {e}")
+                    if not stage.required:
+                        self._count("warnings.SYSTEM_ERROR")
+                        continue
+                    self._count("failures.SYSTEM_ERROR")
+                    return {
+                        "success": False,
+                        "order_id": job["order_id"],
+                        "stage": stage.name,
+                        "error": "SYSTEM_ERROR",
+                        "message": ERROR_MESSAGES["SYSTEM_ERROR"],
+                    }
+
+            self._count("orders.printed")
+            self._count("pages.printed", job.get("pages", 0))
+            if self.telemetry:
+                self.telemetry.observe("order.total", time.monotonic() - started)
+            return {
+                "success": True,
+                "order_id": job["order_id"],
+                "stage": None,
+                "error": None,
+                "message": "Printed Successfully!",
+                "pages": job.get("pages", 0),
+            }
+        finally:
+            # Leftover files of failed orders are evicted by the storage manager
+            if job["order_id"] and self.backend:
+                self.backend.finish_job(job["order_id"])
+
+    def _run_stage(self, stage, job):
+        for attempt in range(stage.retries + 1):
+            try:
+                return self._run_once(stage, job)
+            except StageError as e:
+                if attempt == stage.retries or e.code in ("STAGE_TIMEOUT", "CANCELLED"):
+                    raise
+                logger.warning(f"Retrying {stage.name} after {e.code} ({attempt + 1}/{stage.retries})")
+
+    def _run_once(self, stage, job):
+        order_cancel = job.get("cancel")
+        cancel = (order_cancel if stage.cancellable else None) or CancelToken()
+        _check_cancel(cancel)
+        if stage.slots:
+            # A cancelled order leaves the line for a busy stage too
+            while not stage.slots.acquire(timeout=CANCEL_POLL):
+                _check_cancel(cancel)
+        metrics = self._metrics[stage.name]
+        with self._lock:
+            metrics["active"] += 1
+        start = time.monotonic()
+        outcome = {}
+        finished = threading.Event()
+
+        def target():
+            try:
+                outcome["value"] = stage.run(job)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                with self._lock:
+                    metrics["active"] -= 1
+                if stage.slots:
+                    stage.slots.release()
+                finished.set()
+
+        try:
+            if stage.timeout is None:
+                target()
+            else:
+                # The stage's own token: fired by the order's token or on
+                # timeout, so an abandoned stage stops instead of writing
+                # into a job directory finish_job() is about to clean up
+                stage_cancel = CancelToken()
+                if stage.cancellable:
+                    job["cancel"] = stage_cancel
+                worker = threading.Thread(target=target, name=f"stage-{stage.name}", daemon=True)
+                worker.start()
+                with cancel.on_cancel(finished.set), \
+                        cancel.on_cancel(lambda: stage_cancel.cancel(cancel.reason)):
+                    finished.wait(stage.timeout)
+                if "value" not in outcome and "error" not in outcome:
+                    stage_cancel.cancel("stage timeout")
+                    # It keeps its slot until it really finishes; one that
+                    # can't be stopped is left to finish in the background
+                    if stage.cancellable:
+                        worker.join(STAGE_STOP_GRACE)
+                    if stage.cancellable and worker.is_alive():
+                        logger.warning(f"Stage {stage.name} still running {STAGE_STOP_GRACE}s after it was stopped")
+                    _check_cancel(cancel)
+                    with self._lock:
+                        metrics["timeouts"] += 1
+                    raise StageError("STAGE_TIMEOUT", f"{stage.name} exceeded {stage.timeout}s")
+
+            if "error" in outcome:
+                # Whatever a cancelled stage failed with, the cause was the cancel
+                _check_cancel(cancel)
+                with self._lock:
+                    metrics["failures"] += 1
+                raise outcome["error"]
+            return outcome.get("value")
+        finally:
+            job["cancel"] = order_cancel
+            elapsed = time.monotonic() - start
+            with self._lock:
+                metrics["runs"] += 1
+                metrics["total_time"] += elapsed
+                metrics["max_time"] = max(metrics["max_time"], elapsed)
+            if self.telemetry:
+                self.telemetry.observe(f"stage.{stage.name}", elapsed)
+
+    # ==========================================================
+    # METRICS
+    # ==========================================================
+
+    def _count(self, name, value=1):
+        if self.telemetry:
+            self.telemetry.incr(name, value)
+
+    def metrics(self):
+        """Per-stage runs, failures, timeouts, in-flight count and timings."""
+        with self._lock:
+            return {
+                name: dict(m, avg_time=round(m["total_time"] / m["runs"], 3) if m["runs"] else 0.0)
+                for name, m in self._metrics.items()
+            }
+
+
+def build_pipeline(backend, printer, preflight=None, scheduler=None, telemetry=None,
+                   stream_pdfs=False, on_status=None, converter=None, rasterizer=None):
+    """The standard verify -> download -> convert -> preflight -> raster -> print -> mark pipeline."""
+    stages = [
+        VerifyStage(backend),
+        DownloadStage(backend, stream_pdfs=stream_pdfs),
+    ]
+    if converter:
+        stages.append(ConvertStage(converter, concurrency=max(1, converter.workers)))
+    if preflight:
+        stages.append(PreflightStage(preflight))
+    if rasterizer:
+        stages.append(RasterStage(rasterizer))
+    stages.append(PrintStage(printer, scheduler=scheduler))
+    stages.append(MarkStage(backend))
+    return PrintPipeline(stages, backend=backend, telemetry=telemetry, on_status=on_status)
@@ -0,0 +1,387 @@
+"""
+PDF preflight stage (runs between download_files and print_job).
+
+Checks each downloaded PDF for structure, page count and encryption in a
+separate worker process with memory and CPU-time limits, so a hostile or
+broken upload cannot stall the kiosk. Optionally normalizes the file with
+Ghostscript (downsampled images, fitted to the printer's media) so CUPS
+filters don't spend minutes rasterizing it. Results are cached by content
+hash (normalized copies by hash and media), so a reprint of the same file
+skips all of this.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import time
+import logging
+
+try:
+    import resource
+except ImportError:
+    # Windows: no rlimits, the time limit still applies
+    resource = None
+
+from services.pdf_tools import load_pypdf
+from services.cpu_pool import CpuPoolBusy, CpuTaskTimeout, CpuTaskError, memory_limit
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK_SIZE = 1024 * 1024
+SCAN_OVERLAP = 64
+PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![s\w])")
+COUNT_PATTERN = re.compile(rb"/Count\s+(\d+)")
+
+# Bytes per page above which a PDF is treated as an image-heavy scan
+HEAVY_BYTES_PER_PAGE = 1024 * 1024
+
+# Verdicts that depend only on the file's bytes and may be cached by hash;
+# PREFLIGHT_TIMEOUT/MEMORY_LIMIT/CRASHED/ERROR can be load or worker trouble
+CACHEABLE_ERRORS = ("NOT_A_PDF", "TRUNCATED_PDF", "ENCRYPTED_PDF", "CORRUPT_PDF", "NO_PAGES")
+
+# Ghostscript paper size names per print_settings media key
+GS_PAPER_SIZES = {"A4": "a4", "A3": "a3", "A5": "a5", "LETTER": "letter", "LEGAL": "legal"}
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(SCAN_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _apply_limits(memory_mb, cpu_seconds):
+    if resource is None:
+        return
+    # Relative to what the forked worker already maps (the parent's threads)
+    limit = memory_limit(memory_mb)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+
+
+# ==========================================================
+# ANALYSIS (RUNS IN THE WORKER PROCESS)
+# ==========================================================
+
+def analyze_pdf(path):
+    """
+    Inspect a PDF without loading it whole.
+
+    Returns:
+        dict: {"ok", "error", "pages", "encrypted", "size", "heavy"}
+    """
+    size = os.path.getsize(path)
+    result = {"ok": False, "error": None, "pages": 0, "encrypted": False, "size": size, "heavy": False}
+
+    with open(path, "rb") as f:
+        head = f.read(1024)
+        f.seek(max(0, size - 2048))
+        tail = f.read()
+
+    if b"%PDF-" not in head:
+        result["error"] = "NOT_A_PDF"
+        return result
+    if b"%%EOF" not in tail or b"startxref" not in tail:
+        result["error"] = "TRUNCATED_PDF"
+        return result
+
+    # Stream the body once: page objects, page tree /Count, /Encrypt
+    pages = 0
+    max_count = 0
+    revisions = 0
+    encrypted = False
+    with open(path, "rb") as f:
+        carry = b""
+        for chunk in iter(lambda: f.read(SCAN_CHUNK_SIZE), b""):
+            window = carry + chunk
+            pages += len(PAGE_PATTERN.findall(window)) - len(PAGE_PATTERN.findall(carry))
+            revisions += window.count(b"%%EOF") - carry.count(b"%%EOF")
+            for match in COUNT_PATTERN.finditer(window):
+                max_count = max(max_count, int(match.group(1)))
+            encrypted = encrypted or b"/Encrypt" in window
+            carry = window[-SCAN_OVERLAP:]
+
+    if revisions > 1 and max_count:
+        # Incremental updates (e.g. PIL's page-by-page append) rewrite
+        # page objects, so only the newest page tree /Count is reliable
+        pages = max_count
+    else:
+        # Object streams hide /Type /Page; the page tree root's /Count does not
+        pages = max(pages, max_count)
+
+    PdfReader = load_pypdf()[0]
+    if PdfReader is None and encrypted:
+        # Can't tell an empty user password from a real one: don't spool it
+        result["encrypted"] = True
+        result["error"] = "ENCRYPTED_PDF"
+        return result
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+            if reader.is_encrypted and not reader.decrypt(""):
+                result["encrypted"] = True
+                result["error"] = "ENCRYPTED_PDF"
+                return result
+            pages = len(reader.pages)
+        except Exception as e:
+            result["error"] = "CORRUPT_PDF"
+            result["details"] = str(e)
+            return result
+
+    if pages == 0:
+        result["error"] = "NO_PAGES"
+        return result
+
+    result.update({
+        "ok": True,
+        "pages": pages,
+        "encrypted": encrypted,
+        "heavy": size / pages > HEAVY_BYTES_PER_PAGE,
+    })
+    return result
+
+
+def _worker(path, memory_mb, cpu_seconds, conn):
+    try:
+        _apply_limits(memory_mb, cpu_seconds)
+        conn.send(analyze_pdf(path))
+    except MemoryError:
+        conn.send({"ok": False, "error": "PREFLIGHT_MEMORY_LIMIT"})
+    except Exception as e:
+        conn.send({"ok": False, "error": "PREFLIGHT_ERROR", "details": str(e)})
+    finally:
+        conn.close()
+
+
+def _cacheable(result):
+    return result.get("ok") or result.get("error") in CACHEABLE_ERRORS
+
+
+# ==========================================================
+# PREFLIGHT SERVICE
+# ==========================================================
+
+class Preflight:
+    def __init__(self, cache_dir="preflight_cache", time_limit=60, memory_mb=256,
+                 normalize=False, media="A4", image_dpi=150, cache_max_bytes=200 * 1024 * 1024,
+                 cpu_pool=None):
+        self.cache_dir = cache_dir
+        self.time_limit = time_limit
+        self.memory_mb = memory_mb
+        self.normalize = normalize and shutil.which("gs") is not None
+        self.media = media
+        self.image_dpi = image_dpi
+        self.cache_max_bytes = cache_max_bytes
+        # Warm worker processes instead of a fresh one per file
+        self.cpu_pool = cpu_pool
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        if normalize and not self.normalize:
+            print("⚠️ Ghostscript not found; PDF normalization disabled")
+
+    # ==========================================================
+    # CACHE
+    # ==========================================================
+
+    def _cache_path(self, digest, ext):
+        return os.path.join(self.cache_dir, f"{digest}.{ext}")
+
+    def _load_cached(self, digest):
+        try:
+            with open(self._cache_path(digest, "json")) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not _cacheable(result):
+            # Written before transient failures were kept out of the cache
+            return None
+        # Normalized copies are looked up per media, not pinned to the verdict
+        result.pop("normalized_path", None)
+        os.utime(self._cache_path(digest, "json"))
+        return result
+
+    def _store(self, digest, result):
+        tmp_path = self._cache_path(digest, "json.part")
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, self._cache_path(digest, "json"))
+        self._prune()
+
+    def _prune(self):
+        """Drop the oldest cache entries once the cache outgrows its budget."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            total += stat.st_size
+        for _, path, size in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # ==========================================================
+    # RUN
+    # ==========================================================
+
+    def check(self, path, media=None):
+        """
+        Preflight one PDF (cached by content hash).
+
+        Args:
+            media (str): print_settings media key to fit pages to when
+                         normalizing; the constructor's media when None
+
+        Returns:
+            dict: analyze_pdf() result, plus "hash" and, when normalized,
+                  "normalized_path" to print instead of `path`
+        """
+        digest = file_hash(path)
+        result = self._load_cached(digest)
+        if result:
+            print(f"   ⚡ Preflight cache hit ({result.get('pages')} pages)")
+        else:
+            start = time.time()
+            result = self._run_isolated(path)
+            result["hash"] = digest
+            logger.info(f"Preflight {os.path.basename(path)}: {result} in {time.time() - start:.1f}s")
+            # A crash or limit hit may not happen next time; only pin real verdicts
+            if _cacheable(result):
+                self._store(digest, result)
+
+        if result["ok"] and self.normalize:
+            normalized = self._normalized(path, digest, media or self.media)
+            if normalized:
+                result["normalized_path"] = normalized
+        return result
+
+    def _normalized(self, path, digest, media):
+        """Cached normalized copy for `media`, made on first use."""
+        out_path = self._cache_path(digest, f"{media.lower()}.pdf")
+        if os.path.exists(out_path):
+            os.utime(out_path)
+            return out_path
+        return self._normalize(path, out_path, media)
+
+    def _run_isolated(self, path):
+        if self.cpu_pool:
+            try:
+                return self._run_pooled(path)
+            except CpuPoolBusy:
+                # Queue full: check it in a process of its own rather than fail
+                pass
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(
+            target=_worker,
+            args=(path, self.memory_mb, self.time_limit, child_conn),
+            daemon=True
+        )
+        worker.start()
+        child_conn.close()
+
+        if parent_conn.poll(self.time_limit):
+            try:
+                result = parent_conn.recv()
+            except EOFError:
+                result = {"ok": False, "error": "PREFLIGHT_CRASHED"}
+        else:
+            result = {"ok": False, "error": "PREFLIGHT_TIMEOUT"}
+
+        if worker.is_alive():
+            worker.terminate()
+        worker.join(1)
+        parent_conn.close()
+        return result
+
+    def _run_pooled(self, path):
+        try:
+            return self.cpu_pool.run(analyze_pdf, path, time_limit=self.time_limit, memory_mb=self.memory_mb)
+        except CpuTaskTimeout:
+            return {"ok": False, "error": "PREFLIGHT_TIMEOUT"}
+        except MemoryError:
+            return {"ok": False, "error": "PREFLIGHT_MEMORY_LIMIT"}
+        except CpuTaskError:
+            return {"ok": False, "error": "PREFLIGHT_CRASHED"}
+        except CpuPoolBusy:
+            raise
+        except Exception as e:
+            return {"ok": False, "error": "PREFLIGHT_ERROR", "details": str(e)}
+
+    def _normalize(self, path, out_path, media):
+        tmp_path = out_path + ".part"
+        cmd = [
+            "gs", "-q", "-dSAFER", "-dBATCH", "-dNOPAUSE",
+            "-sDEVICE=pdfwrite",
+            "-dCompatibilityLevel=1.4",
+            f"-sPAPERSIZE={GS_PAPER_SIZES.get(media, 'a4')}",
+            "-dFIXEDMEDIA", "-dPDFFitPage",
+            "-dDownsampleColorImages=true", f"-dColorImageResolution={self.image_dpi}",
+            "-dDownsampleGrayImages=true", f"-dGrayImageResolution={self.image_dpi}",
+            f"-sOutputFile={tmp_path}",
+            path,
+        ]
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                timeout=self.time_limit,
+                preexec_fn=(lambda: _apply_limits(self.memory_mb * 2, self.time_limit)) if resource else None
+            )
+            if result.returncode != 0:
+                logger.warning(f"Normalization failed: {result.stderr[:200]}")
+                return None
+            os.replace(tmp_path, out_path)
+            return out_path
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Normalization timed out for {path}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# ==========================================================
+# WORKFLOW HELPER
+# ==========================================================
+
+def preflight_files(preflight, files, order_settings=None, progress=None, cancel=None):
+    """
+    Preflight every downloaded file in place: records "pages" and "hash" and
+    swaps in the path normalized to the file's media (per-file settings over
+    `order_settings`). Streamed items (no local file) are skipped.
+    Raises Cancelled once `cancel` fires (checked between files; each check
+    is already time limited).
+
+    Returns:
+        dict: {"success": True} or {"success": False, "error", "index"}
+    """
+    total = len(files)
+    for position, item in enumerate(files):
+        if cancel:
+            cancel.check()
+        path = item.get("path")
+        if not path:
+            continue
+        if progress:
+            progress.emit("convert", force=True, file=position + 1, total=total)
+
+        settings = dict(order_settings or {}, **(item.get("settings") or {}))
+        result = preflight.check(path, media=settings.get("media"))
+        if not result["ok"]:
+            print(f"   ❌ Preflight rejected {os.path.basename(path)}: {result['error']}")
+            return {"success": False, "error": result["error"], "index": item.get("index")}
+
+        item["pages"] = result["pages"]
+        item["hash"] = result.get("hash")
+        if result.get("normalized_path"):
+            item["path"] = result["normalized_path"]
+    return {"success": True}
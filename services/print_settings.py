@@ -0,0 +1,309 @@
+"""
+Print settings mapping layer.
+
+Turns the backend's `printSettings` (and optional per-file settings) into
+one validated settings dict per file, then into `lp -o` options or IPP job
+attributes. Validation happens once per order, before anything is
+downloaded or spooled.
+
+Normalized settings keys:
+    copies (int), color ("BW" | "COLOR"), duplex (bool),
+    orientation ("PORTRAIT" | "LANDSCAPE"), page_ranges ([(first, last)] | None),
+    number_up (int), media (str | None), collate (bool)
+"""
+import re
+
+MAX_COPIES = 99
+NUMBER_UP_VALUES = (1, 2, 4, 6, 9, 16)
+
+# Paper size -> (lp/PPD media name, IPP media keyword)
+MEDIA_SIZES = {
+    "A4": ("A4", "iso_a4_210x297mm"),
+    "A3": ("A3", "iso_a3_297x420mm"),
+    "A5": ("A5", "iso_a5_148x210mm"),
+    "LETTER": ("Letter", "na_letter_8.5x11in"),
+    "LEGAL": ("Legal", "na_legal_8.5x14in"),
+}
+
+# Paper size -> (width, height) in inches, for laying out images
+MEDIA_INCHES = {
+    "A4": (8.27, 11.69),
+    "A3": (11.69, 16.54),
+    "A5": (5.83, 8.27),
+    "LETTER": (8.5, 11.0),
+    "LEGAL": (8.5, 14.0),
+}
+
+# IPP orientation-requested enum values
+IPP_ORIENTATION = {"PORTRAIT": 3, "LANDSCAPE": 4}
+
+RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d*)\s*)?$")
+
+
+class PrintSettingsError(ValueError):
+    """Raised when an order's print settings cannot be honoured."""
+
+
+# ==========================================================
+# PARSING HELPERS
+# ==========================================================
+
+def _first(raw, *keys, default=None):
+    for key in keys:
+        if key in raw and raw[key] not in (None, ""):
+            return raw[key]
+    return default
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1", "on")
+    return bool(value)
+
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PrintSettingsError(f"{name} must be a number, got {value!r}")
+
+
+def parse_page_ranges(value):
+    """
+    Parse "1-3,5" / ["1-3", 5] / [[1, 3], [5, 5]] into sorted, merged
+    (first, last) tuples. An open range like "4-" runs to the last page.
+    """
+    if value in (None, "", [], "all", "ALL"):
+        return None
+
+    if isinstance(value, str):
+        parts = [p for p in value.split(",") if p.strip()]
+    elif isinstance(value, (list, tuple)):
+        parts = value
+    else:
+        parts = [value]
+
+    ranges = []
+    for part in parts:
+        if isinstance(part, int):
+            first, last = part, part
+        elif isinstance(part, (list, tuple)) and len(part) == 2:
+            first, last = _parse_int(part[0], "page range"), _parse_int(part[1], "page range")
+        else:
+            match = RANGE_PATTERN.match(str(part))
+            if not match:
+                raise PrintSettingsError(f"Invalid page range: {part!r}")
+            first = int(match.group(1))
+            if match.group(2) is None:
+                last = first
+            elif match.group(2) == "":
+                last = 2 ** 31 - 1
+            else:
+                last = int(match.group(2))
+
+        if first < 1 or last < first:
+            raise PrintSettingsError(f"Invalid page range: {part!r}")
+        ranges.append((first, last))
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for first, last in ranges[1:]:
+        if first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def format_page_ranges(ranges):
+    parts = []
+    for first, last in ranges:
+        if first == last:
+            parts.append(str(first))
+        elif last >= 2 ** 31 - 1:
+            parts.append(f"{first}-")
+        else:
+            parts.append(f"{first}-{last}")
+    return ",".join(parts)
+
+
+def count_selected_pages(ranges, page_count):
+    """Number of pages that will print from a document of `page_count` pages."""
+    if not ranges:
+        return page_count
+    return sum(max(0, min(last, page_count) - first + 1) for first, last in ranges)
+
+
+# ==========================================================
+# NORMALIZATION
+# ==========================================================
+
+DEFAULT_SETTINGS = {
+    "copies": 1,
+    "color": "BW",
+    "duplex": False,
+    "orientation": "PORTRAIT",
+    "page_ranges": None,
+    "number_up": 1,
+    "media": None,
+    "collate": True,
+}
+
+
+def build_job_settings(raw, base=None):
+    """
+    Normalize one backend settings dict. Keys missing from `raw` keep their
+    value from `base` (already normalized), or the defaults.
+
+    Raises:
+        PrintSettingsError: if a value is out of range or unrecognised
+    """
+    raw = raw or {}
+    settings = dict(base or DEFAULT_SETTINGS)
+
+    copies = _first(raw, "copies", "numberOfCopies", "numCopies")
+    if copies is not None:
+        copies = _parse_int(copies, "copies")
+        if not 1 <= copies <= MAX_COPIES:
+            raise PrintSettingsError(f"copies must be between 1 and {MAX_COPIES}")
+        settings["copies"] = copies
+
+    color = _first(raw, "color", "colorMode", "isColor")
+    if color is not None:
+        if isinstance(color, bool):
+            color = "COLOR" if color else "BW"
+        color = str(color).upper()
+        if color in ("BW", "B&W", "BLACK_WHITE", "GRAY", "GREY", "MONOCHROME"):
+            settings["color"] = "BW"
+        elif color in ("COLOR", "COLOUR", "RGB"):
+            settings["color"] = "COLOR"
+        else:
+            raise PrintSettingsError(f"Unknown color mode: {color!r}")
+
+    duplex = _first(raw, "doubleSide", "duplex")
+    if duplex is not None:
+        settings["duplex"] = _parse_bool(duplex)
+
+    orientation = _first(raw, "orientation")
+    if orientation is not None:
+        orientation = str(orientation).upper()
+        if orientation not in IPP_ORIENTATION:
+            raise PrintSettingsError(f"Unknown orientation: {orientation!r}")
+        settings["orientation"] = orientation
+
+    for key in ("pageRanges", "pageRange", "pages"):
+        if key in raw:
+            settings["page_ranges"] = parse_page_ranges(raw[key])
+            break
+
+    number_up = _first(raw, "pagesPerSheet", "numberUp", "nUp")
+    if number_up is not None:
+        number_up = _parse_int(number_up, "pages per sheet")
+        if number_up not in NUMBER_UP_VALUES:
+            raise PrintSettingsError(f"pages per sheet must be one of {NUMBER_UP_VALUES}")
+        settings["number_up"] = number_up
+
+    media = _first(raw, "paperSize", "pageSize", "media")
+    if media is not None:
+        media = str(media).upper()
+        if media not in MEDIA_SIZES:
+            raise PrintSettingsError(f"Unsupported paper size: {media!r}")
+        settings["media"] = media
+
+    collate = _first(raw, "collate")
+    if collate is not None:
+        settings["collate"] = _parse_bool(collate)
+
+    return settings
+
+
+def resolve_order_settings(verified_data):
+    """
+    Validate an order's settings once, up front.
+
+    Per-file overrides are read from `fileSettings`, a list aligned with
+    `fileUrls`; each entry overrides the order's `printSettings`.
+
+    Returns:
+        tuple: (order_settings, [file_settings or None per fileUrls entry])
+    """
+    order = build_job_settings(verified_data.get("printSettings") or {})
+
+    per_file = []
+    for file_raw in verified_data.get("fileSettings") or []:
+        per_file.append(build_job_settings(file_raw, base=order) if file_raw else None)
+    return order, per_file
+
+
+def attach_file_settings(files, per_file):
+    """Attach per-file settings to download_files() results by URL index."""
+    for item in files:
+        idx = item.get("index")
+        if idx is not None and idx < len(per_file) and per_file[idx]:
+            # Settings the download step fixed (e.g. laid-out images) win
+            item["settings"] = dict(per_file[idx], **item.get("settings", {}))
+    return files
+
+
+# ==========================================================
+# OUTPUT MAPPINGS
+# ==========================================================
+
+def to_lp_options(settings):
+    """Map normalized settings onto `lp` arguments (without -d/file)."""
+    args = ["-n", str(settings.get("copies", 1))]
+
+    if settings.get("color", "BW") == "BW":
+        args.extend(["-o", "ColorModel=Gray"])
+    else:
+        args.extend(["-o", "ColorModel=RGB"])
+
+    if settings.get("duplex", False):
+        args.extend(["-o", "sides=two-sided-long-edge"])
+
+    if settings.get("orientation") == "LANDSCAPE":
+        args.extend(["-o", "landscape"])
+
+    if settings.get("page_ranges"):
+        args.extend(["-o", f"page-ranges={format_page_ranges(settings['page_ranges'])}"])
+
+    if settings.get("number_up", 1) > 1:
+        args.extend(["-o", f"number-up={settings['number_up']}"])
+
+    if settings.get("media"):
+        args.extend(["-o", f"media={MEDIA_SIZES[settings['media']][0]}"])
+
+    if settings.get("copies", 1) > 1:
+        args.extend(["-o", f"collate={'true' if settings.get('collate', True) else 'false'}"])
+
+    return args
+
+
+def to_ipp_attributes(settings):
+    """Map normalized settings onto IPP Job Template attributes."""
+    attrs = {
+        "copies": int(settings.get("copies", 1)),
+        "print-color-mode": "monochrome" if settings.get("color", "BW") == "BW" else "color",
+        "sides": "two-sided-long-edge" if settings.get("duplex", False) else "one-sided",
+    }
+
+    if settings.get("orientation") == "LANDSCAPE":
+        attrs["orientation-requested"] = IPP_ORIENTATION["LANDSCAPE"]
+
+    if settings.get("page_ranges"):
+        attrs["page-ranges"] = list(settings["page_ranges"])
+
+    if settings.get("number_up", 1) > 1:
+        attrs["number-up"] = settings["number_up"]
+
+    if settings.get("media"):
+        attrs["media"] = MEDIA_SIZES[settings["media"]][1]
+
+    if settings.get("copies", 1) > 1:
+        attrs["multiple-document-handling"] = (
+            "separate-documents-collated-copies"
+            if settings.get("collate", True)
+            else "separate-documents-uncollated-copies"
+        )
+
+    return attrs
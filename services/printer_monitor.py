@@ -0,0 +1,276 @@
+import platform
+import subprocess
+import threading
+import time
+import logging
+
+try:
+    import cups
+except ImportError:
+    # pycups is optional; the monitor falls back to lpstat/lpoptions
+    cups = None
+
+logger = logging.getLogger(__name__)
+
+# printer-state values (RFC 8011, section 5.4.11)
+IPP_PRINTER_STATES = {3: "idle", 4: "processing", 5: "stopped"}
+
+# printer-state-reasons that stop a job from printing
+BLOCKING_REASONS = {
+    "media-empty": "Paper out",
+    "media-needed": "Paper out",
+    "media-jam": "Paper jam",
+    "toner-empty": "Toner empty",
+    "marker-supply-empty": "Toner empty",
+    "door-open": "Cover open",
+    "cover-open": "Cover open",
+    "offline-report": "Printer offline",
+    "shutdown": "Printer offline",
+    "paused": "Printer paused",
+}
+
+# printer-state-reasons worth showing but not blocking
+WARNING_REASONS = {
+    "toner-low": "Toner low",
+    "marker-supply-low": "Toner low",
+    "media-low": "Paper low",
+}
+
+
+def _normalize_reasons(raw_reasons):
+    """Strip the -error/-warning/-report severity suffixes CUPS appends."""
+    reasons = []
+    for reason in raw_reasons:
+        if reason == "none":
+            continue
+        if reason not in BLOCKING_REASONS and reason.endswith(("-error", "-warning", "-report")):
+            reason = reason.rsplit("-", 1)[0]
+        reasons.append(reason)
+    return reasons
+
+
+class PrinterMonitor:
+    """
+    Keeps an in-memory snapshot of CUPS printer state, refreshed by a
+    background thread, so readiness checks on the print path are a dict
+    lookup instead of an lpstat subprocess.
+
+    Snapshot entry per printer:
+        {"name", "state", "accepting", "reasons", "duplex", "color",
+         "queue_length", "updated"}
+    """
+
+    def __init__(self, interval=10, capability_interval=300):
+        self.interval = interval
+        self.capability_interval = capability_interval
+        self.default_printer = None
+
+        self._printers = {}
+        self._capabilities = {}
+        self._capabilities_checked = 0.0
+        self._updated = 0.0
+        self._listeners = []
+        self._running = False
+        self._thread = None
+        self._wake = threading.Event()
+
+    # ==========================================================
+    # LIFECYCLE
+    # ==========================================================
+
+    def start(self):
+        """Start the background refresher thread. Returns False when CUPS is unavailable."""
+        if self._running:
+            return True
+        if platform.system() != "Linux":
+            print("ℹ️ Printer monitor needs CUPS; using live checks instead")
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"📊 Printer monitor started (every {self.interval}s)")
+        return True
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def refresh_now(self):
+        """Ask the background thread for an immediate refresh."""
+        self._wake.set()
+
+    def add_listener(self, callback):
+        """callback(ready, message) runs after every refresh that changes readiness."""
+        self._listeners.append(callback)
+
+    def _loop(self):
+        last_status = None
+        while self._running:
+            try:
+                self.refresh()
+                status = self.is_ready()
+                if status != last_status:
+                    last_status = status
+                    for callback in self._listeners:
+                        callback(*status)
+            except Exception as e:
+                logger.error(f"Printer monitor refresh failed: {e}")
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    # ==========================================================
+    # SNAPSHOT ACCESS (O(1), NO SUBPROCESSES)
+    # ==========================================================
+
+    def is_fresh(self):
+        return self._updated and time.time() - self._updated < self.interval * 3
+
+    def get_state(self, name=None):
+        name = name or self.default_printer
+        return self._printers.get(name) if name else None
+
+    def get_all(self):
+        return dict(self._printers)
+
+    def is_ready(self, name=None):
+        """
+        Returns:
+            tuple: (ready, message) from the last snapshot
+        """
+        state = self.get_state(name)
+        if state is None:
+            if name:
+                return False, f"Printer '{name}' not in CUPS"
+            return False, "No CUPS printer found"
+
+        if not state["accepting"] or state["state"] == "stopped":
+            return False, self.describe_reasons(state) or "Printer offline"
+
+        blocking = [BLOCKING_REASONS[r] for r in state["reasons"] if r in BLOCKING_REASONS]
+        if blocking:
+            return False, blocking[0]
+
+        return True, self.describe_reasons(state) or f"CUPS printer: {state['name']}"
+
+    @staticmethod
+    def describe_reasons(state):
+        labels = []
+        for reason in state["reasons"]:
+            label = BLOCKING_REASONS.get(reason) or WARNING_REASONS.get(reason)
+            if label and label not in labels:
+                labels.append(label)
+        return ", ".join(labels)
+
+    # ==========================================================
+    # REFRESH
+    # ==========================================================
+
+    def refresh(self):
+        """Run one synchronous refresh of every printer."""
+        if cups is not None:
+            printers, default = self._read_pycups()
+        else:
+            printers, default = self._read_lpstat()
+
+        now = time.time()
+        stale = now - self._capabilities_checked > self.capability_interval
+        if stale or any(name not in self._capabilities for name in printers):
+            self._capabilities = {name: self._read_capabilities(name) for name in printers}
+            self._capabilities_checked = now
+
+        for name, state in printers.items():
+            caps = self._capabilities.get(name) or {"duplex": False, "color": False}
+            state.update(caps)
+            state["updated"] = now
+
+        # Swap in whole dicts so readers never see a half-built snapshot
+        self._printers = printers
+        self.default_printer = default or next(iter(printers), None)
+        self._updated = now
+
+    def _read_pycups(self):
+        conn = cups.Connection()
+        queue = {}
+        for job in conn.getJobs(which_jobs="not-completed", requested_attributes=["job-printer-uri"]).values():
+            name = job.get("job-printer-uri", "").rsplit("/", 1)[-1]
+            queue[name] = queue.get(name, 0) + 1
+
+        printers = {}
+        for name, attrs in conn.getPrinters().items():
+            reasons = _normalize_reasons(attrs.get("printer-state-reasons", []))
+            printers[name] = {
+                "name": name,
+                "state": IPP_PRINTER_STATES.get(attrs.get("printer-state"), "idle"),
+                "accepting": bool(attrs.get("printer-is-accepting-jobs", True)),
+                "reasons": reasons,
+                "queue_length": queue.get(name, 0),
+            }
+        return printers, conn.getDefault()
+
+    def _read_lpstat(self):
+        result = subprocess.run(
+            ["lpstat", "-l", "-p"],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+
+        printers = {}
+        current = None
+        for line in result.stdout.splitlines():
+            if line.startswith("printer "):
+                parts = line.split()
+                name = parts[1]
+                if "disabled" in line:
+                    state = "stopped"
+                elif "now printing" in line:
+                    state = "processing"
+                else:
+                    state = "idle"
+                current = {
+                    "name": name,
+                    "state": state,
+                    "accepting": state != "stopped",
+                    "reasons": [],
+                    "queue_length": 0,
+                }
+                printers[name] = current
+            elif current and line.strip().startswith("Alerts:"):
+                current["reasons"] = _normalize_reasons(line.split(":", 1)[1].split())
+
+        queue = subprocess.run(["lpstat", "-o"], capture_output=True, text=True, timeout=5)
+        for line in queue.stdout.splitlines():
+            job_id = line.split(" ", 1)[0]
+            name = job_id.rsplit("-", 1)[0]
+            if name in printers:
+                printers[name]["queue_length"] += 1
+
+        default = None
+        def_result = subprocess.run(["lpstat", "-d"], capture_output=True, text=True, timeout=5)
+        if "system default destination: " in def_result.stdout:
+            default = def_result.stdout.split("system default destination: ")[1].strip()
+
+        return printers, default
+
+    def _read_capabilities(self, name):
+        """Read duplex/color support from the printer's PPD options."""
+        caps = {"duplex": False, "color": False}
+        try:
+            result = subprocess.run(
+                ["lpoptions", "-p", name, "-l"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            for line in result.stdout.splitlines():
+                key, _, values = line.partition(":")
+                option = key.split("/", 1)[0]
+                values = values.replace("*", "").split()
+                if option == "Duplex":
+                    caps["duplex"] = any(v != "None" for v in values)
+                elif option in ("ColorModel", "ColorMode", "print-color-mode"):
+                    caps["color"] = any(v.lower() in ("rgb", "cmyk", "color") for v in values)
+        except Exception as e:
+            logger.warning(f"Could not read capabilities for {name}: {e}")
+        return caps
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import logging
+
+from services.progress import ProgressReporter
+from services.smart_printer import SmartPrinter
+
+logger = logging.getLogger(__name__)
+
+
+class PrinterPool:
+    """
+    Routes orders across several CUPS printers attached to one Pi.
+
+    Each order is sent to the healthiest capable printer with the shortest
+    queue (CUPS queue length from the monitor plus orders this process has
+    in flight), so concurrent orders spread across devices. If a printer
+    or its queue fails mid-order, the remaining files fail over to another
+    printer. A file the printer may have started on is not resent (that
+    would duplicate pages), and a bad file fails once without failover.
+
+    Exposes the same print_job()/check_printer_available() interface as
+    SmartPrinter so workflows can use either.
+    """
+
+    def __init__(self, printer_names, monitor=None, failure_cooldown=120,
+                 transport="lp", ipp_url="http://localhost:631"):
+        self.monitor = monitor
+        self.failure_cooldown = failure_cooldown
+        self.printers = {
+            name: SmartPrinter(printer_name=name, monitor=monitor, transport=transport, ipp_url=ipp_url)
+            for name in printer_names
+        }
+
+        self._lock = threading.Lock()
+        self._in_flight = {name: 0 for name in self.printers}
+        self._failed_until = {}
+
+    # ==========================================================
+    # HEALTH + ROUTING
+    # ==========================================================
+
+    def check_printer_available(self):
+        healthy = [name for name in self.printers if self._is_healthy(name)]
+        if not healthy:
+            return False, "No healthy printer in pool"
+        return True, f"{len(healthy)}/{len(self.printers)} printers ready"
+
+    def _is_healthy(self, name):
+        if self._failed_until.get(name, 0) > time.time():
+            return False
+        if self.monitor and self.monitor.is_fresh():
+            ready, _ = self.monitor.is_ready(name)
+            return ready
+        return True
+
+    def _supports(self, name, settings):
+        if not (self.monitor and self.monitor.is_fresh()):
+            return True
+        state = self.monitor.get_state(name) or {}
+        if settings.get("color", "BW") != "BW" and not state.get("color"):
+            return False
+        if settings.get("duplex") and not state.get("duplex"):
+            return False
+        return True
+
+    def _queue_depth(self, name):
+        depth = self._in_flight[name]
+        if self.monitor and self.monitor.is_fresh():
+            depth += (self.monitor.get_state(name) or {}).get("queue_length", 0)
+        return depth
+
+    def select_printer(self, settings, exclude=()):
+        """
+        Pick the least-loaded healthy printer that supports the settings.
+        Falls back to any healthy printer (BW/simplex output) when no
+        capable one is available rather than failing the order.
+        """
+        settings = settings or {}
+        healthy = [n for n in self.printers if n not in exclude and self._is_healthy(n)]
+        if not healthy:
+            return None
+
+        capable = [n for n in healthy if self._supports(n, settings)]
+        if not capable:
+            logger.warning(f"No printer supports {settings}; using best available")
+            capable = healthy
+
+        return min(capable, key=self._queue_depth)
+
+    def _mark_failed(self, name):
+        self._failed_until[name] = time.time() + self.failure_cooldown
+        logger.error(f"Printer {name} failed; out of rotation for {self.failure_cooldown}s")
+        if self.monitor:
+            self.monitor.refresh_now()
+
+    # ==========================================================
+    # MAIN PRINT (WITH FAILOVER)
+    # ==========================================================
+
+    def print_job(self, file_paths, settings, progress=None, cancel=None):
+        progress = progress or ProgressReporter()
+        settings = settings or {}
+        total = len(file_paths)
+        tried = set()
+        failed = 0
+
+        with self._lock:
+            name = self.select_printer(settings)
+            if name:
+                self._in_flight[name] += 1
+
+        if not name:
+            print("❌ No printer available in pool")
+            return False
+
+        print(f"🖨️  Routing order to {name}")
+        idx = 0
+        try:
+            while idx < total:
+                if cancel and cancel.cancelled:
+                    print(f"🛑 Order cancelled, {total - idx} file(s) not sent")
+                    return False
+                item = file_paths[idx]
+                file_path = item if isinstance(item, str) else item.get("path")
+                is_stream = not isinstance(item, str) and item.get("open")
+                if not is_stream and (not file_path or not os.path.exists(file_path)):
+                    # Not the printer's fault; don't fail over for it
+                    print(f"❌ File not found: {file_path}")
+                    failed += 1
+                    idx += 1
+                    continue
+
+                result = self.printers[name].print_file(item, settings, progress=progress,
+                                                        position=(idx + 1, total), cancel=cancel)
+                if result:
+                    idx += 1
+                    continue
+                if cancel and cancel.cancelled:
+                    # Cancelled, not broken: no failover, no penalty
+                    return False
+                if not result.printer_fault or result.started:
+                    # A bad file would fail on every printer; a started one
+                    # may be partly on paper already. Report it, don't resend
+                    failed += 1
+                    idx += 1
+                if not result.printer_fault:
+                    continue
+
+                # Failover: move the rest of the order to another printer
+                tried.add(name)
+                self._mark_failed(name)
+                with self._lock:
+                    self._in_flight[name] -= 1
+                    name = self.select_printer(settings, exclude=tried) if idx < total else None
+                    if name:
+                        self._in_flight[name] += 1
+
+                if idx == total:
+                    break
+                if not name:
+                    print(f"❌ No printer left for remaining {total - idx} file(s)")
+                    return False
+                print(f"🔁 Failing over to {name} from file {idx + 1}")
+        finally:
+            if name:
+                with self._lock:
+                    self._in_flight[name] -= 1
+
+        if failed:
+            print(f"\n⚠️ {total - failed}/{total} jobs printed. Some files failed.")
+            return False
+
+        print(f"\n✅ ALL {total} JOBS PRINTED SUCCESSFULLY")
+        return True
@@ -0,0 +1,202 @@
+"""
+Printer wake-up on the first keypress.
+
+Kiosk lasers drop into deep sleep, and the first page of an order then
+waits 10-20 s for the fuser after `lp`. The kiosk knows an order is coming
+as soon as the customer types the first digit, so that keypress sends the
+printer a cheap status request and opens the backend connection; both
+warm up while the customer is still typing.
+
+A status query to CUPS is answered by CUPS itself, so the request goes to
+the queue's device:
+
+    ipp:// http://   Get-Printer-Attributes sent to the printer (631 / 80)
+    socket://        PJL INFO STATUS on the JetDirect port
+    ipps:// https:// a TCP connect to the printer
+    WAKE_COMMAND     any command instead (e.g. an SNMP get), "{printer}"
+                     is replaced by the queue name
+
+Pokes are rate limited: a printer woken a minute ago is still warm, and a
+customer mashing keys shouldn't send a request per key.
+"""
+import shlex
+import socket
+import subprocess
+import threading
+import time
+import logging
+from urllib.parse import urlsplit
+
+from services.ipp_client import IppClient, IppError
+
+try:
+    import cups
+except ImportError:
+    # pycups is optional; device URIs come from lpstat -v
+    cups = None
+
+logger = logging.getLogger(__name__)
+
+PJL_STATUS = b"\x1b%-12345X@PJL INFO STATUS\r\n\x1b%-12345X"
+JETDIRECT_PORT = 9100
+
+# Device URIs change rarely; re-read them after this many seconds
+DEVICE_URI_TTL = 3600
+
+
+class PrinterWaker:
+    def __init__(self, printer_names=None, backend=None, monitor=None, command=None,
+                 min_interval=120, timeout=5):
+        """
+        Args:
+            printer_names: CUPS queues to wake (None = the monitor's default)
+            backend: BackendService whose warm_up() runs alongside
+            command: shell-style command used instead of the built-in wake
+            min_interval: seconds between wakes
+        """
+        # Unnamed entries (PRINTER_NAME = None) mean the default queue too
+        self.printer_names = [name for name in printer_names or [] if name]
+        self.backend = backend
+        self.monitor = monitor
+        self.command = command
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.wakes = 0
+        self.last_results = {}
+        self._device_uris = {}
+        self._uris_read = 0
+        self._last = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    # ==========================================================
+    # TRIGGER
+    # ==========================================================
+
+    def poke(self):
+        """
+        Start a wake in the background unless one ran within
+        `min_interval`. Safe to call on every keypress.
+
+        Returns:
+            bool: True if a wake was started
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._running or (self._last is not None and now - self._last < self.min_interval):
+                return False
+            self._last = now
+            self._running = True
+        threading.Thread(target=self._wake_all, name="printer-wake", daemon=True).start()
+        return True
+
+    def _wake_all(self):
+        start = time.monotonic()
+        try:
+            threads = []
+            if self.backend:
+                threads.append(threading.Thread(target=self.backend.warm_up, name="wake-backend", daemon=True))
+            for name in self._targets():
+                threads.append(threading.Thread(target=self._wake_one, args=(name,),
+                                                name=f"wake-{name}", daemon=True))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(self.timeout * 3)
+            self.wakes += 1
+            logger.info(f"Wake-up sent in {time.monotonic() - start:.2f}s: {self.last_results}")
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _targets(self):
+        names = self.printer_names or ([self.monitor.default_printer] if self.monitor else [])
+        targets = []
+        for name in names:
+            if not name:
+                continue
+            state = self.monitor.get_state(name) if self.monitor else None
+            # A printer that's already printing is awake
+            if state and state.get("state") == "processing":
+                continue
+            targets.append(name)
+        return targets
+
+    # ==========================================================
+    # WAKE ONE PRINTER
+    # ==========================================================
+
+    def _wake_one(self, name):
+        try:
+            self.last_results[name] = self.wake(name)
+        except Exception as e:
+            logger.warning(f"Wake-up of {name} failed: {e}")
+            self.last_results[name] = f"error: {e}"
+
+    def wake(self, name):
+        """Send the wake request for one queue now (no rate limit)."""
+        if self.command:
+            cmd = [part.replace("{printer}", name) for part in shlex.split(self.command)]
+            result = subprocess.run(cmd, capture_output=True, timeout=self.timeout * 3)
+            return f"command exit {result.returncode}"
+
+        uri = self.device_uri(name)
+        if not uri:
+            return "no device uri"
+        parts = urlsplit(uri)
+        scheme = parts.scheme.lower()
+
+        if scheme in ("ipp", "http"):
+            port = parts.port or (631 if scheme == "ipp" else 80)
+            client = IppClient(f"http://{parts.hostname}:{port}", timeout=self.timeout)
+            try:
+                attrs = client.get_printer_attributes(name, requested=["printer-state"], printer_uri=uri)
+            except IppError as e:
+                return f"ipp: {e}"
+            return f"ipp state {attrs.get('printer-state')}"
+
+        if scheme == "socket":
+            with socket.create_connection((parts.hostname, parts.port or JETDIRECT_PORT), self.timeout) as conn:
+                conn.sendall(PJL_STATUS)
+                conn.settimeout(self.timeout)
+                try:
+                    conn.recv(256)
+                except socket.timeout:
+                    pass
+            return "pjl status"
+
+        if scheme in ("ipps", "https") and parts.hostname:
+            port = parts.port or (631 if scheme == "ipps" else 443)
+            socket.create_connection((parts.hostname, port), self.timeout).close()
+            return "tcp connect"
+
+        # usb://, dnssd:// etc.: nothing cheap to send
+        return f"unsupported {scheme}"
+
+    # ==========================================================
+    # DEVICE URIS
+    # ==========================================================
+
+    def device_uri(self, name):
+        if time.monotonic() - self._uris_read > DEVICE_URI_TTL:
+            self._device_uris = {}
+            self._uris_read = time.monotonic()
+        if name not in self._device_uris:
+            self._device_uris[name] = self._read_device_uri(name)
+        return self._device_uris[name]
+
+    def _read_device_uri(self, name):
+        if cups is not None:
+            try:
+                return cups.Connection().getPrinters().get(name, {}).get("device-uri")
+            except Exception as e:
+                logger.warning(f"pycups device lookup failed: {e}")
+        try:
+            result = subprocess.run(["lpstat", "-v", name], capture_output=True, text=True, timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        # "device for Office_Laser: ipp://10.0.0.20/ipp/print"
+        for line in result.stdout.splitlines():
+            if line.startswith(f"device for {name}:"):
+                return line.split(":", 1)[1].strip()
+        return None
@@ -0,0 +1,89 @@
+import threading
+import time
+
+
+# ==========================================================
+# PROGRESS REPORTER
+# ==========================================================
+
+class ProgressReporter:
+    """
+    Rate-limited progress channel from the downloader and printer to the UI.
+
+    Producers call emit() from the workflow thread; events are pushed to
+    the sink directly, so no extra polling thread is needed. Events of the
+    same kind are throttled to one per `min_interval` seconds, while stage
+    changes and forced events (file finished, job completed) always go out.
+
+    Each event is a dict with at least a "stage" key:
+        download: file, total, bytes, size
+        convert:  file, total
+        queue:    position
+        print:    file, total, job_id, state, pages
+    """
+
+    def __init__(self, sink=None, min_interval=0.25):
+        self.sink = sink
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_key = None
+        self._last_time = 0.0
+
+    def emit(self, stage, force=False, **data):
+        if not self.sink:
+            return
+
+        key = (stage, data.get("file"), data.get("state"))
+        now = time.monotonic()
+
+        with self._lock:
+            if (
+                not force
+                and key == self._last_key
+                and now - self._last_time < self.min_interval
+            ):
+                return
+            self._last_key = key
+            self._last_time = now
+
+        event = {"stage": stage}
+        event.update(data)
+
+        try:
+            self.sink(event)
+        except Exception as e:
+            print(f"⚠️ Progress sink error: {e}")
+
+
+# ==========================================================
+# EVENT FORMATTING
+# ==========================================================
+
+def describe(event):
+    """Turn a progress event into a short line of text for the kiosk screen."""
+    stage = event.get("stage")
+    file_no = event.get("file", 0)
+    total = event.get("total", 0)
+
+    if stage == "download":
+        done = event.get("bytes", 0)
+        size = event.get("size")
+        if size:
+            return f"⬇️ Downloading file {file_no} of {total}... {done * 100 // size}%"
+        return f"⬇️ Downloading file {file_no} of {total}... {done // 1024} KB"
+
+    if stage == "convert":
+        return f"🔄 Preparing file {file_no} of {total}..."
+
+    if stage == "queue":
+        return f"⏳ Waiting for printer... #{event.get('position')} in line"
+
+    if stage == "print":
+        pages = event.get("pages")
+        if pages:
+            return f"🖨️ Printing file {file_no} of {total}... page {pages}"
+        if event.get("state") == "completed":
+            return f"✅ File {file_no} of {total} printed"
+        return f"🖨️ Printing file {file_no} of {total}..."
+
+    return ""
@@ -0,0 +1,322 @@
+"""
+Pre-rasterization to the printer's native format (optional print path).
+
+After `lp` returns, CUPS runs pdftopdf -> gstoraster -> driver for the job,
+one page after another on one core; that is where most of
+wait_for_job_completion's time goes. With RASTER_FORMAT set, the pipeline
+renders each PDF to the printer's own raster ahead of time instead: the
+selected pages are split into runs, each run is rendered by its own
+Ghostscript process on the CpuPool (or a thread pool), the runs are joined
+into one file, and the printer gets it as a raw job that CUPS passes
+straight to the backend.
+
+    pwg   PWG raster (IPP Everywhere printers)     image/pwg-raster
+    urf   Apple raster (AirPrint printers)         image/urf
+    pcl   PCL 5 (mono: ljet4, color: cljet5)        application/vnd.hp-pcl
+
+Rendered files are cached by (content hash, format, resolution, settings),
+so a reprint goes to the printer without rendering anything. Settings a raw
+job can't carry (n-up, landscape rotation) keep the normal CUPS path, as
+does any file that fails to render. Cancelling the order kills its
+Ghostscript runs.
+
+Compare against the CUPS path with:
+
+    python -m benchmarks.raster --pages 20 --workers 4
+"""
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from services.cancellation import Cancelled, run_process
+from services.preflight import file_hash, GS_PAPER_SIZES
+from services.print_settings import format_page_ranges
+
+logger = logging.getLogger(__name__)
+
+# format -> (MIME type, file extension, gs device for BW, gs device for color)
+FORMATS = {
+    "pwg": ("image/pwg-raster", "pwg", "pwgraster", "pwgraster"),
+    "urf": ("image/urf", "urf", "urfgray", "urfrgb"),
+    "pcl": ("application/vnd.hp-pcl", "pcl", "ljet4", "cljet5"),
+}
+
+# MIME type CUPS treats as "already in the printer's language"
+CUPS_RAW_MIME = "application/vnd.cups-raw"
+
+# CUPS color spaces for the pwgraster device
+PWG_SGRAY = 18
+PWG_SRGB = 19
+
+# Fewest pages worth a Ghostscript start of their own
+MIN_RUN_PAGES = 2
+
+PWG_SYNC = b"RaS2"
+URF_HEADER = struct.Struct(">8sI")
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+
+def selected_pages(ranges, page_count):
+    """Page numbers that will print, in order."""
+    if not ranges:
+        return list(range(1, page_count + 1))
+    return [page for first, last in ranges for page in range(first, min(last, page_count) + 1)]
+
+
+def split_runs(pages, workers):
+    """Split a page list into up to `workers` contiguous runs."""
+    runs = max(1, min(workers, len(pages) // MIN_RUN_PAGES))
+    size = -(-len(pages) // runs)
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def _page_list(pages):
+    """[1, 2, 3, 5] -> "1-3,5" for -sPageList."""
+    ranges = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return format_page_ranges(ranges)
+
+
+def gs_device_args(fmt, color="BW", dpi=300, media=None, duplex=False):
+    """Ghostscript arguments for one output format and job settings."""
+    _, _, bw_device, color_device = FORMATS[fmt]
+    args = [
+        "gs", "-q", "-dSAFER", "-dBATCH", "-dNOPAUSE",
+        f"-sDEVICE={bw_device if color == 'BW' else color_device}",
+        f"-r{dpi}",
+        f"-sPAPERSIZE={GS_PAPER_SIZES.get(media or 'A4', 'a4')}",
+        "-dFIXEDMEDIA", "-dPDFFitPage",
+    ]
+    if fmt == "pwg":
+        args.extend([f"-dcupsColorSpace={PWG_SGRAY if color == 'BW' else PWG_SRGB}", "-dcupsBitsPerColor=8"])
+    if duplex:
+        args.append("-dDuplex")
+    return args
+
+
+def render_run(pdf_path, out_path, device_args, pages, time_limit=300, cancel=None):
+    """
+    Render `pages` of `pdf_path` to `out_path` with one Ghostscript process.
+    Module level so it can run on a CpuPool worker (the pool kills the
+    worker on cancel, so `cancel` is only passed on the thread pool).
+
+    Returns:
+        bool: True if gs succeeded
+    """
+    cmd = list(device_args)
+    if pages:
+        cmd.append(f"-sPageList={_page_list(pages)}")
+    cmd.extend([f"-sOutputFile={out_path}", pdf_path])
+    try:
+        result = run_process(cmd, cancel=cancel, timeout=time_limit)
+    except subprocess.TimeoutExpired:
+        return False
+    if result.returncode != 0:
+        logger.warning(f"gs failed on pages {pages[:1]}..: {result.stderr[-200:]}")
+        return False
+    return os.path.exists(out_path)
+
+
+def join_runs(fmt, parts, out_path):
+    """Concatenate per-run outputs into one job file of `fmt`."""
+    with open(out_path, "wb") as out:
+        if fmt == "urf":
+            # One file header carrying the total page count
+            total = 0
+            for part in parts:
+                with open(part, "rb") as f:
+                    total += URF_HEADER.unpack(f.read(URF_HEADER.size))[1]
+            out.write(URF_HEADER.pack(b"UNIRAST\0", total))
+        for index, part in enumerate(parts):
+            with open(part, "rb") as f:
+                if fmt == "urf":
+                    f.seek(URF_HEADER.size)
+                elif fmt == "pwg" and index > 0:
+                    # Only the first run keeps the stream's sync word
+                    if f.read(len(PWG_SYNC)) != PWG_SYNC:
+                        f.seek(0)
+                shutil.copyfileobj(f, out, 1024 * 1024)
+
+
+# ==========================================================
+# RASTERIZER
+# ==========================================================
+
+class Rasterizer:
+    def __init__(self, fmt="pwg", dpi=300, cache_dir="raster_cache", workers=None, cpu_pool=None,
+                 time_limit=300, submit_raw=True, cache_max_bytes=1024 * 1024 * 1024):
+        """
+        Args:
+            fmt: "pwg", "urf" or "pcl" (whatever the printer takes natively)
+            dpi: render resolution; must be one the printer supports
+            workers: Ghostscript processes per file (None = cpu_pool size or cores)
+            cpu_pool: CpuPool to run the renders on (thermal governor applies)
+            submit_raw: send as application/vnd.cups-raw (a CUPS queue);
+                False sends the format's own MIME type (an IPP printer)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown raster format: {fmt!r}")
+        self.fmt = fmt
+        self.dpi = dpi
+        self.cache_dir = cache_dir
+        self.cpu_pool = cpu_pool
+        self.workers = workers or (cpu_pool.workers if cpu_pool else os.cpu_count() or 1)
+        self.time_limit = time_limit
+        self.mime = FORMATS[fmt][0]
+        self.submit_format = CUPS_RAW_MIME if submit_raw else self.mime
+        self.cache_max_bytes = cache_max_bytes
+        self.available = shutil.which("gs") is not None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        if not self.available:
+            print("⚠️ Ghostscript not found; pre-rasterization disabled")
+
+    def supports(self, settings):
+        """Raw jobs skip CUPS' n-up and rotation, so those orders don't qualify."""
+        return (
+            self.available
+            and settings.get("number_up", 1) == 1
+            and settings.get("orientation", "PORTRAIT") != "LANDSCAPE"
+        )
+
+    # ==========================================================
+    # CACHE
+    # ==========================================================
+
+    def _cache_key(self, digest, settings, pages):
+        key = "|".join(str(part) for part in (
+            digest, self.fmt, self.dpi, settings.get("color", "BW"), settings.get("media"),
+            bool(settings.get("duplex")), _page_list(pages) if pages else "all",
+        ))
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _prune(self):
+        """Drop the oldest rendered files once the cache outgrows its budget."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            total += stat.st_size
+        for _, path, size in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # ==========================================================
+    # RENDER
+    # ==========================================================
+
+    def _map(self, func, items, cancel=None):
+        if self.cpu_pool:
+            return self.cpu_pool.map(func, items, time_limit=self.time_limit + 10, cancel=cancel)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="raster") as executor:
+            return list(executor.map(partial(func, cancel=cancel), items))
+
+    def render(self, path, settings, page_count=None, digest=None, cancel=None):
+        """
+        Render the pages of `path` that `settings` selects.
+        Raises Cancelled if `cancel` fires while rendering.
+
+        Returns:
+            dict: {"ok", "path", "format", "mime", "pages", "cached"};
+                  "ok" is False when rendering failed (print the PDF instead)
+        """
+        ranges = settings.get("page_ranges")
+        pages = selected_pages(ranges, page_count) if page_count else None
+        if ranges and not page_count:
+            # Can't split or select without knowing the page count
+            return {"ok": False, "path": None, "format": self.fmt, "mime": self.submit_format,
+                    "pages": None, "cached": False}
+
+        digest = digest or file_hash(path)
+        out_path = os.path.join(self.cache_dir, f"{self._cache_key(digest, settings, pages)}.{FORMATS[self.fmt][1]}")
+        result = {"ok": True, "path": out_path, "format": self.fmt, "mime": self.submit_format,
+                  "pages": len(pages) if pages else None, "cached": True}
+        if os.path.exists(out_path):
+            os.utime(out_path)
+            return result
+
+        start = time.time()
+        runs = split_runs(pages, self.workers) if pages else [None]
+        parts = [f"{out_path}.{index}.part" for index in range(len(runs))]
+        device_args = gs_device_args(self.fmt, settings.get("color", "BW"), self.dpi,
+                                     settings.get("media"), bool(settings.get("duplex")))
+        try:
+            render = partial(_render_item, path, device_args, self.time_limit)
+            ok = all(self._map(render, list(zip(parts, runs)), cancel))
+            if ok:
+                join_runs(self.fmt, parts, out_path + ".part")
+                os.replace(out_path + ".part", out_path)
+        except Cancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Rasterizing {path} failed: {e}")
+            ok = False
+        finally:
+            for part in parts + [out_path + ".part"]:
+                if os.path.exists(part):
+                    os.remove(part)
+
+        if not ok:
+            return dict(result, ok=False, path=None, cached=False)
+        logger.info(f"Rasterized {os.path.basename(path)} to {self.fmt} in {len(runs)} runs "
+                    f"in {time.time() - start:.1f}s")
+        self._prune()
+        return dict(result, cached=False)
+
+
+def _render_item(pdf_path, device_args, time_limit, item, cancel=None):
+    out_path, pages = item
+    return render_run(pdf_path, out_path, device_args, pages, time_limit, cancel)
+
+
+# ==========================================================
+# WORKFLOW HELPER
+# ==========================================================
+
+def rasterize_files(rasterizer, files, order_settings=None, progress=None, cancel=None):
+    """
+    Render every eligible file ahead of printing; sets item["raster"]
+    ({"path", "mime", "format"}) for the printer to send as a raw job.
+    Ineligible or failed files keep printing through CUPS. Raises
+    Cancelled once `cancel` fires.
+
+    Returns:
+        int: Files rasterized
+    """
+    done = 0
+    total = len(files)
+    for position, item in enumerate(files):
+        if cancel:
+            cancel.check()
+        path = item.get("path")
+        settings = dict(order_settings or {}, **(item.get("settings") or {}))
+        if not path or not rasterizer.supports(settings):
+            continue
+        if progress:
+            progress.emit("convert", force=True, file=position + 1, total=total)
+
+        result = rasterizer.render(path, settings, page_count=item.get("pages"), digest=item.get("hash"),
+                                   cancel=cancel)
+        if not result["ok"]:
+            print(f"   ⚠️  Rasterizing failed, printing {os.path.basename(path)} through CUPS")
+            continue
+        print(f"   {'⚡' if result['cached'] else '🖼️ '} {rasterizer.fmt.upper()} raster ready: {os.path.basename(path)}")
+        item["raster"] = {"path": result["path"], "mime": result["mime"], "format": result["format"]}
+        done += 1
+    return done
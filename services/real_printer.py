@@ -2,6 +2,8 @@ import subprocess
 import os
 import time
 
+from services.print_settings import to_lp_options
+
 
 class RealPrinter:
     def __init__(self, printer_name=None, max_retries=1):
@@ -71,24 +73,8 @@ class RealPrinter:
                     if self.printer_name:
                         cmd.extend(["-d", self.printer_name])
 
-                    # Copies (from merged settings)
-                    copies = job_settings.get("copies", 1)
-                    cmd.extend(["-n", str(copies)])
-
-                    # Color mode
-                    color_mode = job_settings.get("color", "BW")
-                    if color_mode == "BW":
-                        cmd.extend(["-o", "ColorModel=Gray"])
-                    else:
-                        cmd.extend(["-o", "ColorModel=RGB"])
-
-                    # Duplex
-                    if job_settings.get("duplex", False):
-                        cmd.extend(["-o", "sides=two-sided-long-edge"])
-
-                    # Orientation
-                    if job_settings.get("orientation") == "LANDSCAPE":
-                        cmd.extend(["-o", "landscape"])
+                    # Copies, color, duplex, orientation, pages, n-up, media
+                    cmd.extend(to_lp_options(job_settings))
 
                     cmd.append(file_path)
 
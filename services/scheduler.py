@@ -0,0 +1,324 @@
+"""
+Page-count aware print scheduler.
+
+Sits in front of the printer service: workflow threads submit orders and
+block until theirs has printed, while a worker thread picks the next order
+by policy instead of whichever thread wins the race.
+
+Policies:
+    fifo      arrival order
+    sjf       fewest pages first, with aging: every minute waited counts as
+              `aging` pages off the order's size, so a thesis cannot starve
+    priority  by order type (`priorities` maps type -> rank, higher first),
+              FIFO within a rank
+
+A cancelled order leaves the queue at once if it hasn't started; if it's
+printing, its CancelToken goes to the printer, which cancels the CUPS job.
+
+The same policy functions drive `simulate()`, so recorded traces can be
+replayed to compare policies:
+
+    python -m services.scheduler trace.jsonl --ppm 20
+"""
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+import logging
+
+from services.print_settings import count_selected_pages
+
+logger = logging.getLogger(__name__)
+
+# Used when neither preflight nor the backend knows a file's page count
+DEFAULT_FILE_PAGES = 5
+
+
+# ==========================================================
+# POLICIES
+# ==========================================================
+
+def fifo_key(job, now, aging=0, priorities=None):
+    return (job["submitted"],)
+
+
+def sjf_key(job, now, aging=20, priorities=None):
+    waited_minutes = (now - job["submitted"]) / 60
+    return (job["pages"] - aging * waited_minutes, job["submitted"])
+
+
+def priority_key(job, now, aging=0, priorities=None):
+    rank = (priorities or {}).get(job.get("type"), 0)
+    return (-rank, job["submitted"])
+
+
+POLICIES = {
+    "fifo": fifo_key,
+    "sjf": sjf_key,
+    "priority": priority_key,
+}
+
+
+def order_pages(files, settings, verified_data=None):
+    """
+    Sheets-of-work estimate for an order: selected pages x copies per file.
+    Uses preflight counts ("pages" on each item), then the backend's
+    `pageCount`, then DEFAULT_FILE_PAGES.
+    """
+    backend_pages = (verified_data or {}).get("pageCount")
+    total = 0
+    for item in files:
+        item_settings = item.get("settings") or settings
+        pages = item.get("pages")
+        if pages is None:
+            if backend_pages:
+                pages = backend_pages / max(1, len(files))
+            else:
+                pages = DEFAULT_FILE_PAGES
+        selected = count_selected_pages(item_settings.get("page_ranges"), pages)
+        total += selected * item_settings.get("copies", 1)
+    return max(1, round(total))
+
+
+# ==========================================================
+# LIVE SCHEDULER
+# ==========================================================
+
+class PrintScheduler:
+    def __init__(self, printer, policy="fifo", aging=20, priorities=None, workers=1):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy!r}")
+        self.printer = printer
+        self.policy = policy
+        self.aging = aging
+        self.priorities = priorities or {}
+        self.workers = workers
+
+        self._pending = []
+        self._running = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"📋 Print scheduler started ({self.policy}, {self.workers} worker(s))")
+
+    # ==========================================================
+    # SUBMISSION
+    # ==========================================================
+
+    def submit(self, order_id, files, settings, pages=None, order_type=None, progress=None, cancel=None):
+        """Queue an order; returns a job dict to pass to wait()."""
+        job = {
+            "order_id": order_id,
+            "files": files,
+            "settings": settings,
+            "pages": pages or order_pages(files, settings),
+            "type": order_type,
+            "progress": progress,
+            "cancel": cancel,
+            "submitted": time.time(),
+            "seq": next(self._seq),
+            "done": threading.Event(),
+            "result": False,
+        }
+        with self._cond:
+            self._pending.append(job)
+            self._cond.notify()
+        logger.info(f"Queued {order_id} ({job['pages']} pages, {len(self._pending)} waiting)")
+        return job
+
+    def wait(self, job, timeout=None):
+        """Block until the order has printed; returns print_job()'s result."""
+        if not job["done"].wait(timeout):
+            return False
+        return job["result"]
+
+    def run(self, order_id, files, settings, pages=None, order_type=None, progress=None, cancel=None):
+        """submit() + wait(), for workflow threads."""
+        job = self.submit(order_id, files, settings, pages, order_type, progress, cancel)
+        position = self.position(order_id)
+        if progress and position:
+            progress.emit("queue", force=True, position=position)
+        if cancel is None:
+            return self.wait(job)
+        with cancel.on_cancel(lambda: self.withdraw(job)):
+            return self.wait(job)
+
+    def withdraw(self, job):
+        """
+        Drop a job that hasn't started printing.
+
+        Returns:
+            bool: False if it's already printing (or done)
+        """
+        with self._cond:
+            if job not in self._pending:
+                return False
+            self._pending.remove(job)
+        logger.info(f"Withdrew {job['order_id']} from the queue")
+        job["result"] = False
+        job["done"].set()
+        return True
+
+    # ==========================================================
+    # QUEUE INSPECTION
+    # ==========================================================
+
+    def _ordered(self, now):
+        key = POLICIES[self.policy]
+        return sorted(
+            self._pending,
+            key=lambda job: key(job, now, self.aging, self.priorities) + (job["seq"],)
+        )
+
+    def queue(self):
+        """Snapshot of running and waiting orders, in the order they'll run."""
+        now = time.time()
+        with self._cond:
+            running = list(self._running.values())
+            pending = self._ordered(now)
+        return [
+            {
+                "order_id": job["order_id"],
+                "pages": job["pages"],
+                "type": job["type"],
+                "waited": round(now - job["submitted"], 1),
+                "state": state,
+            }
+            for state, jobs in (("printing", running), ("waiting", pending))
+            for job in jobs
+        ]
+
+    def position(self, order_id):
+        """1-based place in the waiting queue, 0 if printing or unknown."""
+        with self._cond:
+            for index, job in enumerate(self._ordered(time.time())):
+                if job["order_id"] == order_id:
+                    return index + 1
+        return 0
+
+    # ==========================================================
+    # WORKER
+    # ==========================================================
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._ordered(time.time())[0]
+                self._pending.remove(job)
+                self._running[job["seq"]] = job
+
+            waited = time.time() - job["submitted"]
+            logger.info(f"Printing {job['order_id']} ({job['pages']} pages) after {waited:.0f}s in queue")
+            try:
+                options = {"cancel": job["cancel"]} if job["cancel"] else {}
+                job["result"] = self.printer.print_job(
+                    job["files"],
+                    job["settings"],
+                    progress=job["progress"],
+                    **options
+                )
+            except Exception as e:
+                logger.exception(f"Print job for {job['order_id']} crashed: {e}")
+                job["result"] = False
+            finally:
+                with self._cond:
+                    self._running.pop(job["seq"], None)
+                job["done"].set()
+
+
+# ==========================================================
+# SIMULATOR
+# ==========================================================
+
+def simulate(trace, policy="fifo", pages_per_minute=20, aging=20, priorities=None, setup_seconds=10):
+    """
+    Replay a trace through one printer under `policy`.
+
+    Args:
+        trace (list): [{"arrival": seconds, "pages": int, "type": str?}]
+        setup_seconds: fixed per-order overhead (spooling, warm-up)
+
+    Returns:
+        dict: wait statistics in seconds (wait = arrival until printing starts)
+    """
+    key = POLICIES[policy]
+    arrivals = sorted(trace, key=lambda job: job["arrival"])
+    pending = []
+    waits = []
+    clock = 0.0
+    i = 0
+    seq = itertools.count()
+
+    while i < len(arrivals) or pending:
+        if not pending and arrivals[i]["arrival"] > clock:
+            clock = arrivals[i]["arrival"]
+        while i < len(arrivals) and arrivals[i]["arrival"] <= clock:
+            pending.append(dict(arrivals[i], submitted=arrivals[i]["arrival"], seq=next(seq)))
+            i += 1
+
+        job = min(pending, key=lambda job: key(job, clock, aging, priorities) + (job["seq"],))
+        pending.remove(job)
+
+        waits.append(clock - job["arrival"])
+        clock += setup_seconds + job["pages"] * 60 / pages_per_minute
+
+    waits.sort()
+    return {
+        "policy": policy,
+        "orders": len(waits),
+        "mean_wait": round(statistics.mean(waits), 1) if waits else 0,
+        "median_wait": round(statistics.median(waits), 1) if waits else 0,
+        "p95_wait": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0,
+        "max_wait": round(waits[-1], 1) if waits else 0,
+        "makespan": round(clock, 1),
+    }
+
+
+def load_trace(path):
+    """Read a trace: JSON list or JSON lines of {"arrival", "pages", "type"}."""
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_trace(orders=60, minutes=60, seed=1):
+    """Peak-hour style trace: mostly short orders, a few long theses."""
+    rng = random.Random(seed)
+    trace = []
+    for _ in range(orders):
+        pages = rng.choice([1, 1, 2, 2, 3, 5, 8, 12]) if rng.random() > 0.08 else rng.randint(80, 300)
+        trace.append({"arrival": rng.uniform(0, minutes * 60), "pages": pages})
+    return trace
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare scheduling policies on a print trace")
+    parser.add_argument("trace", nargs="?", help="trace file (omit for a synthetic peak hour)")
+    parser.add_argument("--ppm", type=float, default=20, help="printer pages per minute")
+    parser.add_argument("--aging", type=float, default=20, help="SJF aging, pages per minute waited")
+    parser.add_argument("--setup", type=float, default=10, help="per-order overhead in seconds")
+    parser.add_argument("--priorities", default="{}", help='JSON map of order type -> rank')
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace()
+    priorities = json.loads(args.priorities)
+
+    print(f"{'policy':<10}{'orders':>8}{'mean':>10}{'median':>10}{'p95':>10}{'max':>10}")
+    for name in POLICIES:
+        stats = simulate(trace, name, args.ppm, args.aging, priorities, args.setup)
+        print(f"{name:<10}{stats['orders']:>8}{stats['mean_wait']:>10}"
+              f"{stats['median_wait']:>10}{stats['p95_wait']:>10}{stats['max_wait']:>10}")
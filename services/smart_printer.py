@@ -1,16 +1,99 @@
 import platform
 import subprocess
 import os
+import tempfile
 import time
 import logging
 
+from services.progress import ProgressReporter
+from services.cancellation import CancelToken, abort_response
+from services.ipp_client import IppClient, IppError
+from services.print_settings import to_lp_options, to_ipp_attributes
+from services.pdf_tools import extract_pages
+from services.streaming import ChunkReader, pipe_chunks, STREAM_BUFFER_SIZE
+
+try:
+    import cups
+except ImportError:
+    # pycups is optional; job progress falls back to lpstat
+    cups = None
+
 logger = logging.getLogger(__name__)
 
+# IPP job-state values (RFC 8011, section 5.3.7)
+IPP_JOB_STATES = {
+    3: "pending",
+    4: "held",
+    5: "processing",
+    6: "stopped",
+    7: "canceled",
+    8: "aborted",
+    9: "completed",
+}
+
+# Final job states that mean the printer did not produce the output
+JOB_FAILED_STATES = ("canceled", "aborted", "stopped")
+
+# IPP client-error-not-found: the queue itself is gone, not the document's fault
+IPP_NOT_FOUND = 0x0406
+
+
+class PrintResult:
+    """
+    Outcome of print_file(); truthy when the file printed.
+
+    A failure carries `printer_fault` (the printer or its queue failed:
+    stopped, unreachable, not accepting jobs) and `started` (the job got as
+    far as the printer, so pages may already be on paper). A PrinterPool
+    only fails over on printer faults, and never resends a started file.
+    """
+
+    def __init__(self, ok, printer_fault=False, started=False):
+        self.ok = ok
+        self.printer_fault = printer_fault
+        self.started = started
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"PrintResult(ok={self.ok}, printer_fault={self.printer_fault}, started={self.started})"
+
+
+PRINTED = PrintResult(True)
+FILE_FAILED = PrintResult(False)
+PRINTER_FAILED = PrintResult(False, printer_fault=True)
+
+
+def _queue_error(error):
+    """True when an IppError blames the printer or queue, not the document."""
+    status = error.status
+    # None: unreachable; below 0x0400: an HTTP status; 0x05xx: server-error-*
+    return status is None or status < 0x0400 or status >= 0x0500 or status == IPP_NOT_FOUND
+
 
 class SmartPrinter:
-    def __init__(self, printer_name=None):
+    def __init__(self, printer_name=None, monitor=None, transport="lp", ipp_url="http://localhost:631"):
         self.printer_name = printer_name
         self.os_type = platform.system()
+        # Optional PrinterMonitor; when its snapshot is fresh, readiness
+        # checks skip the lpstat subprocesses entirely
+        self.monitor = monitor
+        # "lp" forks lp/lpstat; "ipp" talks IPP to CUPS (or any IPP printer) directly
+        self.transport = transport
+        self.ipp = IppClient(ipp_url) if transport == "ipp" else None
+        self.poll_interval = 2
+
+    # ==========================================================
+    # READINESS (CACHED SNAPSHOT, FALLS BACK TO LIVE CHECK)
+    # ==========================================================
+
+    def is_ready(self):
+        if self.monitor and self.monitor.is_fresh():
+            if not self.printer_name:
+                self.printer_name = self.monitor.default_printer
+            return self.monitor.is_ready(self.printer_name)
+        return self.check_printer_available()
 
     # ==========================================================
     # CHECK PRINTER
@@ -19,6 +102,9 @@ class SmartPrinter:
     def check_printer_available(self):
         print("🔍 Checking printer status...")
 
+        if self.transport == "ipp":
+            return self._check_ipp_printer()
+
         if self.os_type == "Windows":
             try:
                 # Optimized PowerShell command to get printer status
@@ -93,47 +179,48 @@ class SmartPrinter:
 
         return False, "Unsupported OS"
 
+    def _check_ipp_printer(self):
+        try:
+            if not self.printer_name:
+                self.printer_name = self.ipp.get_default_printer()
+            if not self.printer_name:
+                print("❌ PRINTER NOT CONNECTED: No IPP default printer")
+                return False, "No IPP default printer"
+
+            attrs = self.ipp.get_printer_attributes(self.printer_name)
+            if not attrs.get("printer-is-accepting-jobs", True) or attrs.get("printer-state") == 5:
+                print(f"❌ PRINTER NOT READY: {attrs.get('printer-state-reasons')}")
+                return False, f"Printer '{self.printer_name}' stopped"
+
+            print(f"✅ PRINTER CONNECTED: IPP printer detected ({self.printer_name})")
+            return True, f"IPP printer: {self.printer_name}"
+        except IppError as e:
+            print(f"❌ PRINTER NOT CONNECTED: {e}")
+            return False, str(e)
+
     # ==========================================================
     # MAIN PRINT
     # ==========================================================
 
-    def print_job(self, file_paths, settings):
+    def print_job(self, file_paths, settings, progress=None, cancel=None):
         print("\n" + "=" * 50)
         print(f"🖨️  PRINTING ON {self.os_type.upper()}")
         print("=" * 50)
 
-        available, message = self.check_printer_available()
+        available, message = self.is_ready()
         if not available:
             print(f"❌ Printer unavailable: {message}")
             return False
 
+        progress = progress or ProgressReporter()
         success_count = 0
         total_to_print = len(file_paths)
 
         for idx, item in enumerate(file_paths):
-            file_path = item if isinstance(item, str) else item.get("path")
-            file_settings = {} if isinstance(item, str) else item.get("settings", {})
-            
-            # Merge settings
-            job_settings = settings.copy() if settings else {}
-            if file_settings:
-                job_settings.update(file_settings)
-
-            if not file_path or not os.path.exists(file_path):
-                print(f"❌ File not found: {file_path}")
-                continue
-
-            print(f"📄 Processing [{idx+1}/{total_to_print}]: {os.path.basename(file_path)}")
-
-            if self.os_type == "Windows":
-                result = self._print_windows(file_path, job_settings)
-            elif self.os_type == "Linux":
-                result = self._print_linux(file_path, job_settings)
-            else:
-                print("⚠️ Unsupported OS")
-                result = False
-
-            if result:
+            if cancel and cancel.cancelled:
+                print(f"🛑 Order cancelled, {total_to_print - idx} file(s) not sent")
+                return False
+            if self.print_file(item, settings, progress=progress, position=(idx + 1, total_to_print), cancel=cancel):
                 success_count += 1
 
         if success_count == total_to_print:
@@ -143,6 +230,84 @@ class SmartPrinter:
             
         return success_count == total_to_print
 
+    # ==========================================================
+    # SINGLE FILE PRINT
+    # ==========================================================
+
+    def print_file(self, item, settings, progress=None, position=(1, 1), cancel=None):
+        """
+        Print one downloaded file (path string or {"path", "settings"} dict).
+
+        Returns:
+            PrintResult: falsy if the file is missing, the job failed on the
+                         printer or `cancel` fired (the CUPS job is cancelled then)
+        """
+        progress = progress or ProgressReporter()
+        file_no, total = position
+
+        file_path = item if isinstance(item, str) else item.get("path")
+        file_settings = {} if isinstance(item, str) else item.get("settings", {})
+        
+        # Merge settings
+        job_settings = settings.copy() if settings else {}
+        if file_settings:
+            job_settings.update(file_settings)
+
+        if not isinstance(item, str) and item.get("open"):
+            return self._print_stream(item, job_settings, progress=progress, position=position, cancel=cancel)
+
+        raster = None if isinstance(item, str) else item.get("raster")
+        if raster and not (os.path.exists(raster["path"]) and (self.transport == "ipp" or self.os_type == "Linux")):
+            raster = None
+
+        if not raster and (not file_path or not os.path.exists(file_path)):
+            print(f"❌ File not found: {file_path}")
+            return FILE_FAILED
+
+        print(f"📄 Processing [{file_no}/{total}]: {os.path.basename(file_path or raster['path'])}")
+        progress.emit("print", force=True, file=file_no, total=total, state="submitting")
+
+        if raster:
+            return self._print_raw(raster, job_settings, progress=progress, position=position, cancel=cancel)
+
+        selected_path = None
+        if job_settings.get("page_ranges"):
+            selected_path, job_settings = self._select_pages(file_path, job_settings)
+
+        try:
+            print_path = selected_path or file_path
+            if self.transport == "ipp":
+                return self._print_ipp(print_path, job_settings, progress=progress, position=position, cancel=cancel)
+            if self.os_type == "Windows":
+                return self._print_windows(print_path, job_settings)
+            elif self.os_type == "Linux":
+                return self._print_linux(print_path, job_settings, progress=progress, position=position, cancel=cancel)
+
+            print("⚠️ Unsupported OS")
+            return PRINTER_FAILED
+        finally:
+            # The spooler has its own copy once the job is submitted
+            if selected_path and os.path.exists(selected_path):
+                os.remove(selected_path)
+
+    def _select_pages(self, file_path, settings):
+        """
+        Spool only the requested pages, from a temp file the caller removes
+        after spooling (`file_path` may be a shared preflight cache entry).
+        Falls back to the CUPS page-ranges option when the PDF cannot be
+        split locally.
+
+        Returns:
+            tuple: (temp path or None, settings to print with)
+        """
+        fd, selected_path = tempfile.mkstemp(prefix="pages-", suffix=".pdf")
+        os.close(fd)
+        if extract_pages(file_path, selected_path, settings["page_ranges"]):
+            settings = dict(settings, page_ranges=None)
+            return selected_path, settings
+        os.remove(selected_path)
+        return None, settings
+
     # ==========================================================
     # WINDOWS PRINT
     # ==========================================================
@@ -168,37 +333,24 @@ class SmartPrinter:
                         subprocess.run(["powershell", "-Command", ps_cmd], 
                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
 
-            return True
+            return PRINTED
 
         except Exception as e:
             print(f"❌ Windows print error: {e}")
-            return False
+            return PRINTER_FAILED
 
     # ==========================================================
     # LINUX PRINT (RASPBERRY PI)
     # ==========================================================
 
-    def _print_linux(self, file_path, settings):
+    def _print_linux(self, file_path, settings, progress=None, position=(1, 1), lp_options=None, cancel=None):
         try:
             cmd = ["lp"]
 
             if self.printer_name:
                 cmd.extend(["-d", self.printer_name])
 
-            copies = settings.get("copies", 1)
-            cmd.extend(["-n", str(copies)])
-
-            color_mode = settings.get("color", "BW")
-            if color_mode == "BW":
-                cmd.extend(["-o", "ColorModel=Gray"])
-            else:
-                cmd.extend(["-o", "ColorModel=RGB"])
-
-            if settings.get("duplex", False):
-                cmd.extend(["-o", "sides=two-sided-long-edge"])
-
-            if settings.get("orientation") == "LANDSCAPE":
-                cmd.extend(["-o", "landscape"])
+            cmd.extend(to_lp_options(settings) if lp_options is None else lp_options)
 
             cmd.append(file_path)
 
@@ -210,25 +362,168 @@ class SmartPrinter:
             )
 
             if result.returncode != 0:
+                # lp refuses for the destination (unknown, not accepting jobs),
+                # not the document; filters fail later, as an aborted job
                 logger.error(f"CUPS error: {result.stderr}")
                 print(f"❌ CUPS error: {result.stderr}")
-                return False
+                return PRINTER_FAILED
 
             logger.info(f"Print job submitted: {result.stdout.strip()}")
             print(f"✅ CUPS Job: {result.stdout.strip()}")
 
             job_id = self._extract_job_id(result.stdout)
             if job_id:
-                self.wait_for_job_completion(job_id, timeout=180)
-
-            return True
+                return self._job_result(job_id, progress=progress, position=position, cancel=cancel)
+            return PRINTED
 
         except subprocess.TimeoutExpired:
             print("❌ Print command timeout")
-            return False
+            return PRINTER_FAILED
         except Exception as e:
             print(f"❌ Linux print error: {e}")
-            return False
+            return PRINTER_FAILED
+
+    # ==========================================================
+    # IPP PRINT (NO SUBPROCESSES)
+    # ==========================================================
+
+    def _print_ipp(self, file_path, settings, progress=None, position=(1, 1),
+                   document_format="application/pdf", job_attributes=None, cancel=None):
+        try:
+            job = self.ipp.print_job(
+                self.printer_name,
+                file_path,
+                job_attributes=to_ipp_attributes(settings) if job_attributes is None else job_attributes,
+                document_format=document_format,
+                job_name=os.path.basename(file_path)
+            )
+        except IppError as e:
+            logger.error(f"IPP error: {e}")
+            print(f"❌ IPP error: {e}")
+            return PRINTER_FAILED if _queue_error(e) else FILE_FAILED
+        except OSError as e:
+            # The document could not be read
+            logger.error(f"IPP error: {e}")
+            print(f"❌ IPP error: {e}")
+            return FILE_FAILED
+
+        job_id = job["job_id"]
+        logger.info(f"Print job submitted over IPP: {self.printer_name}-{job_id}")
+        print(f"✅ IPP Job: {self.printer_name}-{job_id}")
+
+        return self._job_result(job_id, progress=progress, position=position, cancel=cancel)
+
+    # ==========================================================
+    # RAW PRINT (PRE-RENDERED RASTER, NO CUPS FILTERS)
+    # ==========================================================
+
+    def _print_raw(self, raster, settings, progress=None, position=(1, 1), cancel=None):
+        """
+        Send a file rendered by the Rasterizer. Pages, color, paper and
+        duplex are already in the raster; only the copy count travels.
+        """
+        copies = int(settings.get("copies", 1))
+        print(f"   ⚡ Sending pre-rendered {raster['format'].upper()} raster")
+        if self.transport == "ipp":
+            return self._print_ipp(raster["path"], settings, progress=progress, position=position,
+                                   document_format=raster["mime"], job_attributes={"copies": copies},
+                                   cancel=cancel)
+        return self._print_linux(raster["path"], settings, progress=progress, position=position,
+                                 lp_options=["-n", str(copies), "-o", "raw"], cancel=cancel)
+
+    # ==========================================================
+    # STREAMED PRINT (NETWORK -> SPOOLER, NO TEMP FILE)
+    # ==========================================================
+
+    def _print_stream(self, item, settings, progress=None, position=(1, 1), cancel=None):
+        """
+        Pipe a download straight into the spooler with fixed-size buffers:
+        IPP chunked upload, or `lp` reading stdin. Peak memory stays at one
+        buffer regardless of document size. Cancelling closes the download,
+        which aborts the upload before the spooler has a whole document.
+        """
+        progress = progress or ProgressReporter()
+        cancel = cancel or CancelToken()
+        file_no, total = position
+        name = os.path.basename(item["url"].split("?")[0]) or f"file_{file_no}.pdf"
+
+        print(f"📄 Streaming [{file_no}/{total}]: {name}")
+        progress.emit("print", force=True, file=file_no, total=total, state="submitting")
+
+        if self.os_type == "Windows" and self.transport != "ipp":
+            print("⚠️ Streaming needs CUPS or IPP")
+            return PRINTER_FAILED
+
+        def on_bytes(count):
+            progress.emit("download", file=file_no, total=total, bytes=count, size=size)
+
+        response = None
+        reader = None
+        try:
+            response = item["open"]()
+            size = int(response.headers.get("Content-Length") or 0) or None
+            reader = ChunkReader(response.iter_content(chunk_size=STREAM_BUFFER_SIZE), on_bytes=on_bytes)
+
+            with cancel.on_cancel(lambda: abort_response(response)):
+                if self.transport == "ipp":
+                    job = self.ipp.print_job(
+                        self.printer_name,
+                        reader,
+                        job_attributes=to_ipp_attributes(settings),
+                        job_name=name
+                    )
+                    job_id = job["job_id"]
+                else:
+                    cmd = ["lp"]
+                    if self.printer_name:
+                        cmd.extend(["-d", self.printer_name])
+                    cmd.extend(to_lp_options(settings))
+                    cmd.extend(["-t", name])
+
+                    # No file argument: lp spools from stdin
+                    proc = subprocess.Popen(
+                        cmd,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE
+                    )
+                    try:
+                        pipe_chunks(reader, proc.stdin)
+                        cancel.check()
+                        proc.stdin.close()
+                    except Exception:
+                        # Kill lp before it sees EOF so a truncated document is never spooled
+                        proc.kill()
+                        proc.wait()
+                        raise
+                    stdout, stderr = proc.communicate(timeout=30)
+                    if proc.returncode != 0:
+                        logger.error(f"CUPS error: {stderr.decode(errors='replace')}")
+                        print(f"❌ CUPS error: {stderr.decode(errors='replace')}")
+                        return PRINTER_FAILED
+                    job_id = self._extract_job_id(stdout.decode(errors="replace"))
+        except (IppError, OSError, subprocess.TimeoutExpired) as e:
+            if (reader is None or reader.error is not None) or cancel.cancelled:
+                # The download broke (and the upload with it), not the printer
+                print(f"❌ Download stream error: {e}")
+                return FILE_FAILED
+            print(f"❌ Streaming print error: {e}")
+            if isinstance(e, IppError) and not _queue_error(e):
+                return FILE_FAILED
+            return PRINTER_FAILED
+        except Exception as e:
+            # requests errors (HTTP status, connection drops), Cancelled
+            print(f"❌ Download stream error: {e}")
+            return FILE_FAILED
+        finally:
+            # Every exit (CUPS error, IPP rejection, timeout) releases the download
+            if response is not None:
+                response.close()
+
+        print(f"✅ Streamed Job: {job_id}")
+        if job_id:
+            return self._job_result(job_id, progress=progress, position=position, cancel=cancel)
+        return PRINTED
 
     # ==========================================================
     # EXTRACT JOB ID
@@ -243,23 +538,126 @@ class SmartPrinter:
     # WAIT FOR COMPLETION (SAFE)
     # ==========================================================
 
-    def wait_for_job_completion(self, job_id, timeout=180):
+    def wait_for_job_completion(self, job_id, timeout=180, progress=None, position=(1, 1)):
+        return self._wait_for_job(job_id, timeout, progress, position) == "completed"
+
+    def _job_result(self, job_id, progress=None, position=(1, 1), cancel=None):
+        """Wait for a submitted job and turn its final state into a PrintResult."""
+        state, started = self._poll_job(job_id, timeout=180, progress=progress, position=position, cancel=cancel)
+        if state not in JOB_FAILED_STATES:
+            return PRINTED
+        # A job stuck on a jammed/empty printer would print later
+        # as a duplicate, so pull it before reporting failure
+        if state == "stopped":
+            self.cancel_job(job_id)
+        if cancel and cancel.cancelled:
+            return FILE_FAILED
+        return PrintResult(False, printer_fault=True, started=started)
+
+    def _wait_for_job(self, job_id, timeout=180, progress=None, position=(1, 1), cancel=None):
+        """
+        Poll the job until it finishes; returns its last known state.
+        If `cancel` fires the job is cancelled right away, so the printer
+        stops after the sheet it's on.
+        """
+        return self._poll_job(job_id, timeout, progress, position, cancel)[0]
+
+    def _poll_job(self, job_id, timeout=180, progress=None, position=(1, 1), cancel=None):
+        """
+        Returns:
+            tuple: (last known state, started) where started means the job
+                   may have put pages on paper: pages reported, or
+                   processing when the spooler doesn't count them
+        """
         print(f"⏳ Waiting for job {job_id}...")
 
+        progress = progress or ProgressReporter()
+        file_no, total = position
         start_time = time.time()
+        state = "pending"
+        started = False
 
         while time.time() - start_time < timeout:
-            res = subprocess.run(
-                ["lpstat", "-W", "not-completed"],
-                capture_output=True,
-                text=True
-            )
+            state, pages = self._query_job_status(job_id)
+            progress.emit("print", file=file_no, total=total,
+                          job_id=job_id, state=state, pages=pages)
+            started = started or bool(pages) or (pages is None and state == "processing")
+
+            # "stopped" ends the wait too: a jammed or paused queue won't
+            # finish within the timeout, and the pool should fail over now
+            if state == "completed" or state in JOB_FAILED_STATES:
+                progress.emit("print", force=True, file=file_no, total=total,
+                              job_id=job_id, state=state, pages=pages)
+                if state == "completed":
+                    print("✨ Job completed!")
+                else:
+                    print(f"❌ Job {job_id} {state}")
+                return state, started
+
+            if cancel is None:
+                time.sleep(self.poll_interval)
+            elif cancel.wait(self.poll_interval):
+                self.cancel_job(job_id)
+                progress.emit("print", force=True, file=file_no, total=total,
+                              job_id=job_id, state="canceled", pages=pages)
+                return "canceled", started
+
+        print("⚠️ Job timeout reached.")
+        return state, started
+
+    # ==========================================================
+    # CANCEL JOB
+    # ==========================================================
 
-            if job_id not in res.stdout:
-                print("✨ Job completed!")
+    def cancel_job(self, job_id):
+        try:
+            if self.transport == "ipp":
+                self.ipp.cancel_job(self.printer_name, job_id)
+                print(f"🛑 Cancelled job {job_id}")
                 return True
+            subprocess.run(["cancel", job_id], capture_output=True, text=True, timeout=10)
+            print(f"🛑 Cancelled job {job_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Could not cancel job {job_id}: {e}")
+            return False
 
-            time.sleep(2)
+    # ==========================================================
+    # JOB STATUS (STATE + PAGES PRINTED)
+    # ==========================================================
 
-        print("⚠️ Job timeout reached.")
-        return False
+    def _query_job_status(self, job_id):
+        """
+        Return (state, pages_printed) for a CUPS job.
+        Uses IPP job-impressions-completed through pycups when installed,
+        otherwise only knows whether the job is still in the queue.
+        """
+        if self.transport == "ipp":
+            try:
+                attrs = self.ipp.get_job_attributes(self.printer_name, job_id)
+                state = IPP_JOB_STATES.get(attrs.get("job-state"), "processing")
+                return state, attrs.get("job-impressions-completed")
+            except IppError as e:
+                logger.debug(f"IPP job query failed for {job_id}: {e}")
+                return "processing", None
+
+        if cups is not None:
+            try:
+                job_number = int(str(job_id).rsplit("-", 1)[-1])
+                attrs = cups.Connection().getJobAttributes(
+                    job_number,
+                    requested_attributes=["job-state", "job-impressions-completed"]
+                )
+                state = IPP_JOB_STATES.get(attrs.get("job-state"), "processing")
+                return state, attrs.get("job-impressions-completed")
+            except Exception as e:
+                logger.debug(f"IPP job query failed for {job_id}: {e}")
+
+        res = subprocess.run(
+            ["lpstat", "-W", "not-completed"],
+            capture_output=True,
+            text=True
+        )
+        if job_id not in res.stdout:
+            return "completed", None
+        return "processing", None
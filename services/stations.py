@@ -0,0 +1,136 @@
+"""
+Code-entry stations: several keypads and screens served by one Pi.
+
+A Station is one place a customer types a code: an input device (Arduino
+keypad on its own serial port), a display (a kiosk window, possibly on
+another X screen) and the state between them, i.e. the code being typed and the
+order it started. Stations share everything else (backend, converter,
+CPU pool, scheduler and printers), so a second or third station costs one
+keypad and one screen, not another Pi.
+
+    STATIONS = [
+        {"name": "left", "serial_port": "/dev/serial/by-id/usb-Arduino_..._1-if00"},
+        {"name": "right", "serial_port": "/dev/serial/by-id/usb-Arduino_..._2-if00", "screen": ":0.1"},
+    ]
+
+With STATIONS unset there is one station on ARDUINO_PORT, which is the
+old single-keypad kiosk.
+"""
+import threading
+
+from services.cancellation import CancelToken
+
+# Digits in a pickup code
+CODE_LENGTH = 6
+
+
+class Station:
+    def __init__(self, name, serial_port=None, screen=None, code_length=CODE_LENGTH):
+        """
+        Args:
+            name: shown on the station's screen and used by the control API
+            serial_port: keypad port (None = auto-detect; single station only)
+            screen: X display for the station's window, e.g. ":0.1" (None = default)
+        """
+        self.name = name
+        self.serial_port = serial_port
+        self.screen = screen
+        self.code_length = code_length
+        self.code = ""
+        # Latest order started here, and its CancelToken while it runs
+        self.order_id = None
+        self.cancel = None
+        # Filled in by the entry point: keypad reader, window, progress channel
+        self.reader = None
+        self.display = None
+        self.progress = None
+        self._lock = threading.Lock()
+
+    # ==========================================================
+    # KEYPAD BUFFER
+    # ==========================================================
+
+    def press(self, key):
+        """
+        Apply one keypad key (digit, CLEAR or BACKSPACE) to the code buffer.
+
+        Returns:
+            tuple: (code, first_digit); code is the finished code to submit,
+                   first_digit is True for the first digit of a new code
+        """
+        with self._lock:
+            first_digit = key.isdigit() and not self.code
+            if key == "CLEAR":
+                self.code = ""
+            elif key == "BACKSPACE":
+                self.code = self.code[:-1]
+            elif key.isdigit() and len(self.code) < self.code_length:
+                self.code += key
+            if len(self.code) == self.code_length:
+                code, self.code = self.code, ""
+                return code, first_digit
+        return None, first_digit
+
+    # ==========================================================
+    # ORDER SESSION
+    # ==========================================================
+
+    def begin(self, order_id=None):
+        """Start an order from this station; returns its CancelToken."""
+        cancel = CancelToken()
+        with self._lock:
+            self.order_id = order_id
+            self.cancel = cancel
+        return cancel
+
+    def end(self, cancel):
+        """The order holding `cancel` is over."""
+        with self._lock:
+            if self.cancel is cancel:
+                self.cancel = None
+
+    def cancel_order(self, reason="keypad"):
+        """
+        Cancel this station's running order (other stations' orders are untouched).
+
+        Returns:
+            bool: True if an order was cancelled
+        """
+        with self._lock:
+            self.code = ""
+            cancel = self.cancel
+        return bool(cancel and cancel.cancel(reason))
+
+    @property
+    def busy(self):
+        return self.cancel is not None
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            # A kiosk window keeps its own buffer (main.py); headless ones use press()
+            "code": getattr(self.display, "code", self.code),
+            "busy": self.busy,
+            "order_id": self.order_id,
+            "connected": bool(self.reader and self.reader.running),
+        }
+
+
+def build_stations(configs=None, serial_port=None):
+    """
+    Stations from config.STATIONS; None or [] = one station on `serial_port`.
+
+    Raises:
+        ValueError: duplicate names, or several stations without explicit
+            ports (auto-detect would hand every one the same keypad)
+    """
+    if not configs:
+        return [Station("main", serial_port=serial_port)]
+
+    stations = [Station(**config) for config in configs]
+    names = [station.name for station in stations]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate station names: {names}")
+    if len(stations) > 1 and any(not station.serial_port for station in stations):
+        raise ValueError("Every station needs its own serial_port when there are several")
+    return stations
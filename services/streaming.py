@@ -0,0 +1,55 @@
+"""
+Fixed-buffer streaming helpers for moving document bytes from the network
+to the spooler without holding whole files in memory.
+"""
+
+# One buffer size for every hop (network read, pipe write, IPP upload)
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class ChunkReader:
+    """
+    File-like read() over an iterator of byte chunks (e.g. a requests
+    response's iter_content), so it can be handed to IppClient.print_job
+    as the document. Counts bytes as they pass through, and keeps the
+    error that broke the source in `error`, so a caller can tell a failed
+    download from a failed upload.
+    """
+
+    def __init__(self, chunks, on_bytes=None):
+        self._chunks = iter(chunks)
+        self._on_bytes = on_bytes
+        self.bytes_read = 0
+        self.error = None
+
+    def read(self, size=-1):
+        # Hand chunks through as-is; callers loop until b""
+        try:
+            for chunk in self._chunks:
+                if not chunk:
+                    continue
+                self.bytes_read += len(chunk)
+                if self._on_bytes:
+                    self._on_bytes(self.bytes_read)
+                return chunk
+        except Exception as e:
+            self.error = e
+            raise
+        return b""
+
+    def __iter__(self):
+        while True:
+            chunk = self.read()
+            if not chunk:
+                return
+            yield chunk
+
+
+def pipe_chunks(chunks, dst):
+    """Write every chunk to `dst` (a pipe or file); returns the byte count."""
+    total = 0
+    for chunk in chunks:
+        if chunk:
+            dst.write(chunk)
+            total += len(chunk)
+    return total
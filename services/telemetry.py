@@ -0,0 +1,209 @@
+"""
+Kiosk telemetry agent.
+
+Workflow code records counters and latencies in memory (a dict update
+under a lock, no I/O). A background thread rolls them into one batch per
+interval, adds printer state and disk usage, and ships gzip-compressed
+JSON to the backend or appends it to a local file. Batches that cannot be
+sent wait in a bounded queue; the oldest are dropped when it is full.
+"""
+import gzip
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Rotate the file sink once it grows past this
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+
+class TelemetryAgent:
+    def __init__(self, endpoint=None, file_path=None, interval=60, max_batches=240,
+                 kiosk_id=None, printer_key="LOCAL_PRINTER", monitor=None, storage=None, cpu_pool=None):
+        """
+        Args:
+            endpoint: URL batches are POSTed to (None = no upload)
+            file_path: gzip JSON-lines file sink (None = no file)
+            max_batches: unsent batches kept while offline
+        """
+        self.endpoint = endpoint
+        self.file_path = file_path
+        self.interval = interval
+        self.kiosk_id = kiosk_id or socket.gethostname()
+        self.printer_key = printer_key
+        self.monitor = monitor
+        self.storage = storage
+        self.cpu_pool = cpu_pool
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latencies = {}
+        self._gauges = {}
+        self._window_start = time.time()
+        self._outbox = deque(maxlen=max_batches)
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+    # ==========================================================
+    # RECORDING (called from workflow threads)
+    # ==========================================================
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def failure(self, error_code):
+        self.incr(f"failures.{error_code or 'UNKNOWN'}")
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self._latencies.get(name)
+            if stats is None:
+                stats = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+                self._latencies[name] = stats
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+                    break
+            else:
+                stats["buckets"][-1] += 1
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block into the `name` latency histogram."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start)
+
+    # ==========================================================
+    # BACKGROUND FLUSH
+    # ==========================================================
+
+    def start(self):
+        if not self.endpoint and not self.file_path:
+            return False
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Flush what's left (best effort) and stop the thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def _system_gauges(self):
+        gauges = {}
+        if self.monitor:
+            for name, state in self.monitor.get_all().items():
+                gauges[f"printer.{name}.state"] = state.get("state")
+                gauges[f"printer.{name}.queue"] = state.get("queue_length", 0)
+                if state.get("reasons"):
+                    gauges[f"printer.{name}.reasons"] = state["reasons"]
+        if self.storage:
+            gauges["disk.jobs_bytes"] = self.storage.usage()
+            gauges["disk.free_bytes"] = shutil.disk_usage(self.storage.base_dir).free
+        if self.cpu_pool:
+            for name, value in self.cpu_pool.stats().items():
+                gauges[f"cpu.{name}"] = value
+        return gauges
+
+    def snapshot(self):
+        """Take (and reset) the current window as one batch."""
+        now = time.time()
+        with self._lock:
+            batch = {
+                "kiosk": self.kiosk_id,
+                "start": round(self._window_start, 3),
+                "end": round(now, 3),
+                "counters": self._counters,
+                "latencies": self._latencies,
+                "gauges": dict(self._gauges),
+            }
+            self._counters = {}
+            self._latencies = {}
+            self._window_start = now
+        batch["latency_buckets"] = LATENCY_BUCKETS
+        try:
+            batch["gauges"].update(self._system_gauges())
+        except Exception as e:
+            logger.warning(f"Telemetry gauges failed: {e}")
+        return batch
+
+    def flush(self):
+        batch = self.snapshot()
+        if len(self._outbox) == self._outbox.maxlen:
+            self.dropped += 1
+        self._outbox.append(batch)
+
+        if self.file_path:
+            self._write_file(batch)
+        if self.endpoint:
+            self._upload()
+        else:
+            self._outbox.clear()
+
+    # ==========================================================
+    # SINKS
+    # ==========================================================
+
+    def _upload(self):
+        batches = list(self._outbox)
+        body = gzip.compress(json.dumps({"batches": batches, "dropped": self.dropped}).encode())
+        try:
+            res = requests.post(
+                self.endpoint,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip",
+                    "x-printer-key": self.printer_key,
+                },
+                timeout=10
+            )
+            res.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.info(f"Telemetry upload deferred ({len(batches)} batches queued): {e}")
+            return False
+
+        for _ in batches:
+            self._outbox.popleft()
+        self.dropped = 0
+        return True
+
+    def _write_file(self, batch):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > MAX_FILE_BYTES:
+                os.replace(self.file_path, self.file_path + ".1")
+            # Each append is its own gzip member; `zcat` reads them as one stream
+            with gzip.open(self.file_path, "at") as f:
+                f.write(json.dumps(batch) + "\n")
+        except OSError as e:
+            logger.warning(f"Telemetry file sink failed: {e}")
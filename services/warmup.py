@@ -0,0 +1,55 @@
+"""
+Background startup.
+
+The kiosk window is painted first; anything slow (heavy imports, opening
+the serial port, the first CUPS query, the first backend round trip) runs
+here afterwards, each task in its own thread so they overlap.
+"""
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    def __init__(self):
+        self.tasks = []
+        self.results = {}
+        self.timings = {}
+        self.ready = threading.Event()
+
+    def add(self, name, func):
+        self.tasks.append((name, func))
+        return self
+
+    def _run_task(self, name, func):
+        start = time.monotonic()
+        try:
+            self.results[name] = func()
+        except Exception as e:
+            logger.exception(f"Warm-up task {name} failed: {e}")
+            self.results[name] = e
+        self.timings[name] = round(time.monotonic() - start, 3)
+
+    def start(self, on_done=None):
+        """Run all tasks in parallel; on_done(results) fires once all finish."""
+        threads = [
+            threading.Thread(target=self._run_task, args=task, name=f"warmup-{task[0]}", daemon=True)
+            for task in self.tasks
+        ]
+        for thread in threads:
+            thread.start()
+
+        def wait_all():
+            for thread in threads:
+                thread.join()
+            logger.info(f"Warm-up finished: {self.timings}")
+            self.ready.set()
+            if on_done:
+                on_done(self.results)
+
+        threading.Thread(target=wait_all, name="warmup", daemon=True).start()
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
@@ -52,6 +52,9 @@ print_success "System updated"
 # Step 2: Install system dependencies
 print_info "Step 2/7: Installing system dependencies..."
 sudo apt install -y python3-pip python3-venv git cups cups-client
+# Office documents: LibreOffice kept warm by unoserver (runs on the system Python for uno)
+sudo apt install -y libreoffice-nogui python3-uno
+sudo pip3 install --break-system-packages unoserver
 print_success "System dependencies installed"
 
 # Step 3: Enable and start CUPS
@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.backend_service import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_HEADERS,
+    BackendService,
+    IntegrityError,
+    _range_start,
+    parse_file_hash,
+)
+from services.job_storage import JobStorage
+from services.print_settings import attach_file_settings
+
+BODY = bytes(range(256)) * 400
+
+
+class FileServer:
+    """Serves BODY with Range support; can gzip it or drop the first transfer."""
+
+    def __init__(self, gzip_always=False, drop_after=None):
+        self.gzip_always = gzip_always
+        self.drop_after = drop_after
+        self.requests = []
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                state.requests.append(dict(self.headers))
+                wants_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+                if state.gzip_always or wants_gzip:
+                    data = gzip.compress(BODY)
+                    self.send_response(200)
+                    self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                start = 0
+                byte_range = self.headers.get("Range")
+                if byte_range:
+                    start = int(byte_range.split("=")[1].split("-")[0])
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(BODY) - start))
+                self.end_headers()
+                if state.drop_after and len(state.requests) == 1:
+                    # Promise the whole file, send part of it, hang up
+                    self.wfile.write(BODY[start:state.drop_after])
+                    self.close_connection = True
+                    return
+                self.wfile.write(BODY[start:])
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/doc.pdf"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return BackendService(storage=JobStorage(base_dir=str(tmp_path / "jobs")))
+
+
+def _fetch(backend, server, tmp_path, expected_hash=None):
+    response = requests.get(server.url, headers=DOWNLOAD_HEADERS, timeout=5, stream=True)
+    target = str(tmp_path / "out.pdf")
+    received = backend._fetch(response, server.url, target, expected_hash)
+    with open(target, "rb") as f:
+        return received, f.read()
+
+
+# ==========================================================
+# _fetch
+# ==========================================================
+
+def test_fetch_asks_for_identity_encoding(backend, tmp_path):
+    server = FileServer()
+    try:
+        received, data = _fetch(backend, server, tmp_path)
+    finally:
+        server.stop()
+    assert data == BODY and received == len(BODY)
+    assert server.requests[0]["Accept-Encoding"] == "identity"
+
+
+def test_fetch_accepts_a_server_that_compresses_anyway(backend, tmp_path):
+    server = FileServer(gzip_always=True)
+    try:
+        received, data = _fetch(backend, server, tmp_path, ("sha256", hashlib.sha256(BODY).hexdigest()))
+    finally:
+        server.stop()
+    assert data == BODY and received == len(BODY)
+
+
+def test_fetch_resumes_a_dropped_transfer_with_range(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr("services.backend_service.CancelToken.wait", lambda self, timeout=None: False)
+    # Dropped in the second 64 KiB read: the first chunk is already on disk
+    server = FileServer(drop_after=70000)
+    try:
+        received, data = _fetch(backend, server, tmp_path)
+    finally:
+        server.stop()
+    assert data == BODY and received == len(BODY)
+    assert server.requests[1]["Range"] == f"bytes={DOWNLOAD_CHUNK_SIZE}-"
+    assert server.requests[1]["If-Range"] == '"v1"'
+
+
+def test_fetch_hash_mismatch_leaves_no_file(backend, tmp_path):
+    server = FileServer()
+    try:
+        with pytest.raises(IntegrityError):
+            _fetch(backend, server, tmp_path, ("sha256", "0" * 64))
+    finally:
+        server.stop()
+    assert not (tmp_path / "out.pdf").exists()
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+
+@pytest.mark.parametrize("value, expected", [
+    ("sha256:" + "AB" * 32, ("sha256", "ab" * 32)),
+    ("ab" * 32, ("sha256", "ab" * 32)),
+    ("cd" * 20, ("sha1", "cd" * 20)),
+    ("MD5:" + "ef" * 16, ("md5", "ef" * 16)),
+    ("sha-256:" + "01" * 32, ("sha256", "01" * 32)),
+    ("", None),
+    (None, None),
+    (1234, None),
+    ("abc", None),
+    ("nosuchalgo:abcd", None),
+])
+def test_parse_file_hash(value, expected):
+    assert parse_file_hash(value) == expected
+
+
+class _Headers:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes 1000-1999/5000", 1000),
+    ("bytes 0-0/1", 0),
+    ("bytes */5000", None),
+    ("", None),
+    (None, None),
+])
+def test_range_start(header, expected):
+    headers = {"Content-Range": header} if header is not None else {}
+    assert _range_start(_Headers(headers)) == expected
+
+
+# ==========================================================
+# IMAGE LAYOUT
+# ==========================================================
+
+def _image(tmp_path, index, color="BW", **settings):
+    from PIL import Image
+
+    path = tmp_path / f"file_{index}.img"
+    Image.new("RGB", (60, 80), "white").save(path, "JPEG")
+    return {"path": str(path), "index": index, "settings": dict(settings, color=color)}
+
+
+def test_layout_keeps_upload_order_around_documents(backend, tmp_path):
+    # [a.jpg, b.pdf, c.jpg, d.jpg]: b must print between a and c
+    images = [_image(tmp_path, 0), _image(tmp_path, 2), _image(tmp_path, 3)]
+    packed, errors = backend._layout_images(images, str(tmp_path))
+
+    assert errors == []
+    assert [item["indexes"] for item in packed] == [[0], [2, 3]]
+    assert [item["index"] for item in packed] == [0, 2]
+
+
+def test_layout_splits_adjacent_images_with_different_settings(backend, tmp_path):
+    images = [_image(tmp_path, 0), _image(tmp_path, 1, color="COLOR"), _image(tmp_path, 2)]
+    packed, _ = backend._layout_images(images, str(tmp_path))
+    assert [item["indexes"] for item in packed] == [[0], [1], [2]]
+
+
+def test_layout_splits_adjacent_images_with_different_copies(backend, tmp_path):
+    images = [_image(tmp_path, 0, copies=1), _image(tmp_path, 1, copies=3)]
+    packed, _ = backend._layout_images(images, str(tmp_path))
+    assert [item["indexes"] for item in packed] == [[0], [1]]
+
+    per_file = [image["settings"] for image in images]
+    attach_file_settings(packed, per_file)
+    assert [item["settings"]["copies"] for item in packed] == [1, 3]
@@ -0,0 +1,55 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from services.cancellation import CancelToken, Cancelled, run_process
+from services.office_convert import OfficeConverter
+
+
+def test_on_cancel_runs_at_once_when_already_cancelled():
+    cancel = CancelToken()
+    cancel.cancel("keypad")
+    calls = []
+    with cancel.on_cancel(lambda: calls.append("closed")):
+        assert calls == ["closed"]
+    with pytest.raises(Cancelled, match="keypad"):
+        cancel.check()
+
+
+def test_callback_is_dropped_after_the_block():
+    cancel = CancelToken()
+    calls = []
+    with cancel.on_cancel(lambda: calls.append("closed")):
+        pass
+    assert cancel.cancel() is True
+    assert cancel.cancel() is False
+    assert calls == []
+
+
+def test_run_process_kills_the_child_on_cancel():
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        run_process([sys.executable, "-c", "import time; time.sleep(30)"], cancel=cancel, timeout=30)
+    assert time.monotonic() - start < 5
+
+
+def test_cancel_while_every_warm_worker_is_busy(tmp_path):
+    converter = OfficeConverter(cache_dir=str(tmp_path / "cache"), time_limit=120)
+    converter.soffice = converter.unoconvert = "/usr/bin/true"
+    converter.warm = True
+    # One running worker, checked out by another order
+    converter._healthy.add(object())
+    converter._convert_cold = lambda *args: pytest.fail("converted after cancel")
+    document = tmp_path / "a.docx"
+    document.write_bytes(b"hello")
+
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel, args=("keypad",)).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        converter.convert(str(document), str(tmp_path / "out.pdf"), cancel=cancel)
+    assert time.monotonic() - start < 5
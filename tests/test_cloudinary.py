@@ -0,0 +1,38 @@
+import pytest
+
+from services.cloudinary import page_pixels, rendition_transformation, rendition_url, split_delivery_url
+
+BASE = "https://res.cloudinary.com/demo/image/upload"
+BW = "c_limit,w_1754,h_1754,b_white,e_grayscale,q_auto:good,f_jpg"
+
+
+@pytest.mark.parametrize("url, expected", [
+    (f"{BASE}/v1712/abc.jpg", f"{BASE}/{BW}/v1712/abc.jpg"),
+    (f"{BASE}/v1712/folder/abc.jpg?x=1", f"{BASE}/{BW}/v1712/folder/abc.jpg?x=1"),
+    # Existing transformations stay in front of ours
+    (f"{BASE}/a_90/v1712/abc.jpg", f"{BASE}/a_90/{BW}/v1712/abc.jpg"),
+    (f"{BASE}/a_90,e_sharpen/abc.jpg", f"{BASE}/a_90,e_sharpen/{BW}/abc.jpg"),
+    (f"{BASE}/abc.jpg", f"{BASE}/{BW}/abc.jpg"),
+])
+def test_rendition_url_inserts_the_transformation(url, expected):
+    assert rendition_url(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    f"{BASE}/s--AbCd1234--/v1712/abc.jpg",
+    "https://res.cloudinary.com/demo/raw/upload/v1712/abc.pdf",
+    "https://res.cloudinary.com/demo/video/upload/v1712/abc.mp4",
+    "https://cdn.example.com/image/upload/v1712/abc.jpg",
+])
+def test_rendition_url_leaves_unrewritable_urls_alone(url):
+    assert split_delivery_url(url) is None
+    assert rendition_url(url) == url
+
+
+def test_rendition_transformation_for_color_and_paper():
+    assert rendition_transformation("COLOR", "A3", dpi=100) == "c_limit,w_1654,h_1654,b_white,q_auto:good,f_jpg"
+
+
+@pytest.mark.parametrize("media, dpi, expected", [("A4", 150, 1754), ("LETTER", 300, 3300), (None, 150, 1754)])
+def test_page_pixels_uses_the_long_edge(media, dpi, expected):
+    assert page_pixels(media, dpi) == expected
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from services.cancellation import Cancelled, CancelToken
+from services.cpu_pool import CpuPool, address_space
+
+MB = 1024 * 1024
+
+
+def allocate(mb):
+    return len(bytearray(mb * MB))
+
+
+def wait_forever(_):
+    threading.Event().wait()
+
+
+@pytest.mark.skipif(not address_space(), reason="needs /proc/self/statm")
+def test_respawned_worker_under_thread_load_keeps_its_memory_budget():
+    pool = CpuPool(workers=1, memory_mb=256, time_limit=30)
+    pool.start()
+    release = threading.Event()
+    held = []
+
+    def busy():
+        held.append(bytearray(50 * MB))
+        release.wait()
+
+    threads = [threading.Thread(target=busy, daemon=True) for _ in range(12)]
+    try:
+        for thread in threads:
+            thread.start()
+        while len(held) < len(threads):
+            threading.Event().wait(0.01)
+        assert address_space() > 600 * MB
+
+        # Cancel a running task: its worker is killed and forked again from this busy process
+        cancel = CancelToken()
+        future = pool.submit(wait_forever, "x", cancel=cancel)
+        threading.Timer(0.5, cancel.cancel).start()
+        with pytest.raises(Cancelled):
+            future.result(timeout=10)
+
+        # Bigger than a malloc arena, so it needs new address space
+        assert pool.run(allocate, 128) == 128 * MB
+        with pytest.raises(MemoryError):
+            pool.run(allocate, 512)
+    finally:
+        release.set()
+        pool.stop()
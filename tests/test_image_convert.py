@@ -0,0 +1,65 @@
+import io
+
+import pytest
+from PIL import Image
+
+from services import image_convert
+from services.image_convert import image_to_pdf, otsu_level, prepare_for_print, threshold
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BACKENDS = [pytest.param(True, id="numpy", marks=pytest.mark.skipif(numpy is None, reason="numpy not installed")),
+            pytest.param(False, id="pil")]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(image_convert, "np", None)
+
+
+def _two_tone(dark=40, light=200):
+    """Left half ink, right half paper."""
+    image = Image.new("L", (40, 10), light)
+    image.paste(dark, (0, 0, 20, 10))
+    return image
+
+
+def test_otsu_level_separates_ink_from_paper(backend):
+    assert 40 <= otsu_level(_two_tone()) < 200
+
+
+def test_threshold_gives_one_bit_ink_and_paper(backend):
+    result = threshold(_two_tone(), 120)
+    assert result.mode == "1"
+    assert result.getpixel((5, 5)) == 0 and result.getpixel((35, 5)) == 255
+
+
+@pytest.mark.parametrize("bw_mode, mode", [("gray", "L"), ("dither", "1"), ("threshold", "1"), ("sepia", "L")])
+def test_bw_orders_drop_the_color_channels(backend, bw_mode, mode):
+    image = Image.new("RGB", (20, 20), (200, 30, 30))
+    assert prepare_for_print(image, "BW", bw_mode).mode == mode
+
+
+def test_transparent_areas_print_white():
+    image = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
+    assert prepare_for_print(image, "COLOR").getpixel((0, 0)) == (255, 255, 255)
+    assert prepare_for_print(image, "BW").getpixel((0, 0)) == 255
+
+
+def test_color_orders_stay_rgb():
+    assert prepare_for_print(Image.new("L", (10, 10)), "COLOR").mode == "RGB"
+
+
+def test_bw_pdf_is_smaller_than_color():
+    image = Image.effect_noise((200, 200), 64).convert("RGB")
+    sizes = {}
+    for color in ("BW", "COLOR"):
+        out = io.BytesIO()
+        image_to_pdf(image, out, color=color)
+        sizes[color] = len(out.getvalue())
+        assert out.getvalue().startswith(b"%PDF")
+    assert sizes["BW"] < sizes["COLOR"]
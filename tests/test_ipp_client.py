@@ -0,0 +1,150 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from services import ipp_client as ipp
+from services.smart_printer import SmartPrinter
+
+
+def _job_response(job):
+    return ipp.encode_message(0x0000, 7, [
+        (ipp.TAG_OPERATION, {"attributes-charset": "utf-8", "attributes-natural-language": "en"}),
+        (ipp.TAG_JOB, job),
+    ])
+
+
+# ==========================================================
+# ENCODE / DECODE ROUND TRIP
+# ==========================================================
+
+def test_round_trip_keeps_header_and_typed_values():
+    data = ipp.encode_message(ipp.OP_PRINT_JOB, 42, [
+        (ipp.TAG_OPERATION, {
+            "attributes-charset": "utf-8",
+            "printer-uri": "ipp://localhost:631/printers/Office",
+            "job-name": "thesis.pdf",
+        }),
+        (ipp.TAG_JOB, {
+            "copies": 3,
+            "sides": "two-sided-long-edge",
+            "orientation-requested": 4,
+            "page-ranges": [(1, 3), (7, 7)],
+            "color-supported": False,
+        }),
+    ])
+    message = ipp.decode_message(data)
+
+    assert message["version"] == ipp.IPP_VERSION
+    assert message["code"] == ipp.OP_PRINT_JOB
+    assert message["request_id"] == 42
+    assert message["data_offset"] == len(data)
+    assert ipp.group(message, "operation")["job-name"] == "thesis.pdf"
+    job = ipp.group(message, "job")
+    assert job["copies"] == 3
+    assert job["sides"] == "two-sided-long-edge"
+    assert job["orientation-requested"] == 4
+    assert job["page-ranges"] == [(1, 3), (7, 7)]
+    assert job["color-supported"] is False
+
+
+def test_round_trip_multi_valued_keywords_and_utf8():
+    data = ipp.encode_message(0x0000, 1, [
+        (ipp.TAG_PRINTER, {
+            "printer-name": "Bürodrucker",
+            "printer-state-reasons": ["media-empty", "toner-low"],
+        }),
+    ])
+    printer = ipp.group(ipp.decode_message(data), "printer")
+    assert printer["printer-name"] == "Bürodrucker"
+    assert printer["printer-state-reasons"] == ["media-empty", "toner-low"]
+
+
+def test_document_bytes_follow_the_header():
+    header = ipp.encode_message(ipp.OP_PRINT_JOB, 1, [(ipp.TAG_OPERATION, {"job-name": "a"})])
+    message = ipp.decode_message(header + b"%PDF-1.7")
+    assert (header + b"%PDF-1.7")[message["data_offset"]:] == b"%PDF-1.7"
+
+
+def test_collections_are_skipped():
+    data = bytearray(struct.pack(">BBHi", 2, 0, 0, 1))
+    data.append(ipp.TAG_PRINTER)
+    data += ipp.encode_attribute("media-col-default", "", tag=ipp.TAG_BEG_COLLECTION)
+    data += ipp.encode_attribute("", "media-size", tag=ipp.TAG_MEMBER_NAME)
+    data += ipp.encode_attribute("", "", tag=ipp.TAG_END_COLLECTION)
+    data += ipp.encode_attribute("queued-job-count", 2)
+    data.append(ipp.TAG_END)
+    printer = ipp.group(ipp.decode_message(bytes(data)), "printer")
+    assert printer["media-col-default"] == {}
+    assert printer["queued-job-count"] == 2
+
+
+# ==========================================================
+# MALFORMED MESSAGES
+# ==========================================================
+
+@pytest.mark.parametrize("cut", [9, 12, 20, -3])
+def test_truncated_message_raises_ipp_error(cut):
+    data = _job_response({"job-id": 5, "job-state": 3})
+    with pytest.raises(ipp.IppError):
+        ipp.decode_message(data[:cut])
+
+
+def test_bad_integer_length_raises_ipp_error():
+    data = bytearray(struct.pack(">BBHi", 2, 0, 0, 1))
+    data.append(ipp.TAG_JOB)
+    data += struct.pack(">Bh", ipp.TAG_INTEGER, 6) + b"job-id" + struct.pack(">h", 2) + b"\x00\x05"
+    data.append(ipp.TAG_END)
+    with pytest.raises(ipp.IppError):
+        ipp.decode_message(bytes(data))
+
+
+def test_attribute_before_any_group_is_ignored():
+    data = bytearray(struct.pack(">BBHi", 2, 0, 0, 1))
+    data += ipp.encode_attribute("job-id", 5)
+    data.append(ipp.TAG_END)
+    assert ipp.decode_message(bytes(data))["groups"] == []
+
+
+# ==========================================================
+# PRINT-JOB WITHOUT A JOB-ID
+# ==========================================================
+
+def test_print_job_without_job_id_is_a_failed_submission(monkeypatch, tmp_path):
+    document = tmp_path / "a.pdf"
+    document.write_bytes(b"%PDF-1.4\n")
+    client = ipp.IppClient()
+    monkeypatch.setattr(client, "_send", lambda *args: ipp.decode_message(_job_response({"job-state": 3})))
+
+    with pytest.raises(ipp.IppError):
+        client.print_job("Office", str(document))
+
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+    printer.ipp = client
+    monkeypatch.setattr(printer, "_poll_job", lambda *args, **kwargs: pytest.fail("polled a job without an id"))
+    assert printer._print_ipp(str(document), {}).ok is False
+
+
+# ==========================================================
+# BROKEN HTTP RESPONSES
+# ==========================================================
+
+@pytest.mark.parametrize("reply", [
+    b"garbage\r\n\r\n",
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/ipp\r\nContent-Length: 100\r\n\r\n\x02\x00",
+])
+def test_broken_http_response_raises_ipp_error(reply):
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(65536)
+            conn.sendall(reply)
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = ipp.IppClient(f"http://127.0.0.1:{server.getsockname()[1]}", timeout=5)
+    with pytest.raises(ipp.IppError):
+        client.get_job_attributes("Office", 1)
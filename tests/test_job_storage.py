@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from services.job_storage import JobStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return JobStorage(base_dir=str(tmp_path / "jobs"), max_bytes=3000, min_free_bytes=0)
+
+
+def _job(storage, order_id, size, last_used):
+    path = storage.acquire(order_id)
+    with open(os.path.join(path, "file_0.pdf"), "wb") as f:
+        f.write(b"x" * size)
+    storage.finish(order_id)
+    storage._jobs[order_id]["last_used"] = last_used
+    return path
+
+
+def test_evicts_least_recently_used_finished_jobs_to_fit(storage):
+    now = time.time()
+    oldest = _job(storage, "oldest", 1000, now - 30)
+    older = _job(storage, "older", 1000, now - 20)
+    newest = _job(storage, "newest", 1000, now - 10)
+
+    assert storage.ensure_space(1500)
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(newest)
+
+
+def test_active_jobs_are_never_evicted(storage):
+    active = storage.acquire("active")
+    with open(os.path.join(active, "file_0.pdf"), "wb") as f:
+        f.write(b"x" * 2500)
+
+    assert not storage.ensure_space(1000)
+    assert os.path.exists(active)
+
+
+def test_expired_jobs_are_dropped_regardless_of_budget(storage):
+    expired = _job(storage, "expired", 10, 0)
+    fresh = _job(storage, "fresh", 10, time.time())
+
+    storage.evict()
+    assert not os.path.exists(expired)
+    assert os.path.exists(fresh)
+
+
+def test_sweep_removes_only_untracked_entries(storage):
+    kept = storage.acquire("current")
+    os.makedirs(os.path.join(storage.base_dir, "crashed"))
+    open(os.path.join(storage.base_dir, "file_0.pdf.part"), "wb").close()
+
+    assert storage.sweep_orphans() == 2
+    assert os.listdir(storage.base_dir) == ["current"]
+    assert os.path.exists(kept)
+
+
+def test_open_atomic_leaves_nothing_on_failure(storage, tmp_path):
+    target = str(tmp_path / "out.pdf")
+    with pytest.raises(RuntimeError):
+        with storage.open_atomic(target) as f:
+            f.write(b"half")
+            raise RuntimeError("dropped")
+    assert os.listdir(tmp_path) == ["jobs"]
+
+    storage.write_atomic(target, b"whole")
+    assert open(target, "rb").read() == b"whole"
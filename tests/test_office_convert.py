@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from services import office_convert
+from services.office_convert import OfficeConverter
+
+FAKE_SOFFICE = f"""#!{sys.executable}
+import os, sys, time
+args = sys.argv[1:]
+out_dir = args[args.index("--outdir") + 1]
+source = args[-1]
+time.sleep(0.2)
+name = os.path.splitext(os.path.basename(source))[0] + ".pdf"
+with open(os.path.join(out_dir, name), "wb") as f:
+    f.write(b"%PDF-1.4 converted " + open(source, "rb").read())
+"""
+
+
+class FakeWorker:
+    index = 0
+
+    def __init__(self):
+        self.starts = 0
+
+    def start(self):
+        self.starts += 1
+
+    def stop(self):
+        pass
+
+    def alive(self):
+        return True
+
+
+@pytest.fixture
+def converter(tmp_path):
+    soffice = tmp_path / "soffice"
+    soffice.write_text(FAKE_SOFFICE)
+    soffice.chmod(0o755)
+    converter = OfficeConverter(cache_dir=str(tmp_path / "cache"), time_limit=120)
+    converter.soffice = str(soffice)
+    return converter
+
+
+def _document(tmp_path, name="a.docx", body=b"hello"):
+    path = tmp_path / name
+    path.write_bytes(body)
+    return str(path)
+
+
+def test_no_running_worker_converts_cold_without_waiting(converter, tmp_path):
+    converter.warm = True
+    converter._workers = [FakeWorker()]
+    start = time.monotonic()
+    result = converter.convert(_document(tmp_path), str(tmp_path / "out.pdf"))
+    assert result["ok"]
+    assert time.monotonic() - start < 10
+
+
+def test_failed_restart_is_retried(converter, monkeypatch):
+    monkeypatch.setattr(office_convert, "RESTART_BACKOFF", (0,))
+    outcomes = iter([False, False, True])
+    monkeypatch.setattr(converter, "_prime", lambda worker: next(outcomes))
+    worker = FakeWorker()
+
+    converter._restart(worker)
+    assert converter._idle.get(timeout=5) is worker
+    assert worker.starts == 3
+    assert worker in converter._healthy
+
+
+def test_same_document_converts_concurrently(converter, tmp_path):
+    sources = [_document(tmp_path, f"copy{i}.docx", b"same bytes") for i in range(2)]
+    results = [None, None]
+
+    def run(i):
+        results[i] = converter.convert(sources[i], str(tmp_path / f"out{i}.pdf"))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result["ok"] for result in results)
+    for i in range(2):
+        with open(tmp_path / f"out{i}.pdf", "rb") as f:
+            assert f.read().startswith(b"%PDF-1.4 converted same bytes")
+    assert not [name for name in os.listdir(converter.cache_dir) if name.endswith(".part")]
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from services.cancellation import CancelToken
+from services.pipeline import DownloadStage, MarkStage, PrintPipeline, Stage, VerifyStage
+
+
+class SlowBackend:
+    """Download that writes until cancelled; records what happened when."""
+
+    def __init__(self):
+        self.events = []
+        self.stopped = threading.Event()
+
+    def verify_code(self, code):
+        return {"success": True, "orderId": "order-1", "fileUrls": ["u"]}
+
+    def download_files(self, verified_data, progress=None, cancel=None):
+        while not cancel.wait(0.01):
+            self.events.append("write")
+        self.events.append("stopped")
+        self.stopped.set()
+        return {"success": False, "error": "CANCELLED"}
+
+    def finish_job(self, order_id):
+        self.events.append("finish_job")
+
+
+def _pipeline(backend, download_timeout=0.2):
+    return PrintPipeline([VerifyStage(backend), DownloadStage(backend, timeout=download_timeout, retries=0)],
+                         backend=backend)
+
+
+def test_timed_out_stage_is_stopped_before_finish_job():
+    backend = SlowBackend()
+    result = _pipeline(backend).run("123456")
+
+    assert result["error"] == "STAGE_TIMEOUT"
+    assert backend.stopped.is_set()
+    assert backend.events[-2:] == ["stopped", "finish_job"]
+
+
+def test_order_cancel_reaches_the_stage_token():
+    backend = SlowBackend()
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel, args=("keypad",)).start()
+    result = PrintPipeline([VerifyStage(backend), DownloadStage(backend, timeout=30)], backend=backend).run(
+        "123456", cancel=cancel)
+
+    assert result["error"] == "CANCELLED"
+    assert backend.events[-2:] == ["stopped", "finish_job"]
+
+
+def test_verify_timeout_outlasts_verify_code_retries():
+    # 3 attempts x 15 s request timeout + 1 s + 1 s back-off
+    assert VerifyStage(None).timeout > 3 * 15 + 2
+
+
+def test_stage_without_run_cannot_be_built():
+    class Incomplete(Stage):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class SlowMarkBackend(SlowBackend):
+    def __init__(self):
+        super().__init__()
+        self.marked = threading.Event()
+
+    def mark_as_printed(self, order_id):
+        self.marked.wait(5)
+
+
+def test_slow_mark_does_not_fail_a_printed_order():
+    backend = SlowMarkBackend()
+    pipeline = PrintPipeline([VerifyStage(backend), MarkStage(backend, timeout=0.1)], backend=backend)
+    result = pipeline.run("123456")
+    backend.marked.set()
+
+    assert result["success"]
+    assert pipeline.metrics()["mark"]["timeouts"] == 1
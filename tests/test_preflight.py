@@ -0,0 +1,70 @@
+import pytest
+
+from services.cpu_pool import CpuTaskError
+from services.preflight import Preflight, analyze_pdf
+
+PDF = b"%PDF-1.4\n1 0 obj << /Type /Page >> endobj\nstartxref\n0\n%%EOF\n"
+
+
+class CrashingPool:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def run(self, *args, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.mark.parametrize("error", [MemoryError(), CpuTaskError("worker died"), RuntimeError("boom")])
+def test_transient_failures_are_not_cached(tmp_path, error):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(PDF)
+    pool = CrashingPool(error)
+    preflight = Preflight(cache_dir=str(tmp_path / "cache"), cpu_pool=pool)
+
+    assert not preflight.check(str(path))["ok"]
+    assert not preflight.check(str(path))["ok"]
+    assert pool.calls == 2
+
+
+def test_definitive_verdicts_are_cached(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"not a pdf at all")
+    preflight = Preflight(cache_dir=str(tmp_path / "cache"))
+
+    assert preflight.check(str(path))["error"] == "NOT_A_PDF"
+    preflight._run_isolated = lambda path: pytest.fail("cached verdict re-checked")
+    assert preflight.check(str(path))["error"] == "NOT_A_PDF"
+
+
+def test_encrypt_marker_is_rejected_without_pypdf(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.preflight.load_pypdf", lambda: (None, None))
+    path = tmp_path / "locked.pdf"
+    path.write_bytes(PDF.replace(b"startxref", b"trailer << /Encrypt 2 0 R >>\nstartxref"))
+
+    result = analyze_pdf(str(path))
+    assert result["error"] == "ENCRYPTED_PDF"
+    assert not result["ok"]
+
+
+def test_normalized_copies_are_cached_per_media(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(PDF)
+    preflight = Preflight(cache_dir=str(tmp_path / "cache"))
+    preflight.normalize = True
+    made = []
+
+    def fake_normalize(path, out_path, media):
+        made.append(media)
+        with open(out_path, "wb") as f:
+            f.write(PDF)
+        return out_path
+
+    preflight._normalize = fake_normalize
+    letter = preflight.check(str(path), media="LETTER")["normalized_path"]
+    a4 = preflight.check(str(path))["normalized_path"]
+    assert preflight.check(str(path), media="LETTER")["normalized_path"] == letter
+
+    assert letter != a4
+    assert made == ["LETTER", "A4"]
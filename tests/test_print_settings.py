@@ -0,0 +1,154 @@
+import pytest
+
+from services.print_settings import (
+    DEFAULT_SETTINGS,
+    PrintSettingsError,
+    attach_file_settings,
+    build_job_settings,
+    count_selected_pages,
+    format_page_ranges,
+    parse_page_ranges,
+    resolve_order_settings,
+    to_ipp_attributes,
+    to_lp_options,
+)
+
+OPEN = 2 ** 31 - 1
+
+
+# ==========================================================
+# PAGE RANGES
+# ==========================================================
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("all", None),
+    ("5", [(5, 5)]),
+    ("1-3,5", [(1, 3), (5, 5)]),
+    (" 4 - ", [(4, OPEN)]),
+    (["1-3", 5], [(1, 3), (5, 5)]),
+    ([[1, 3], [5, 5]], [(1, 3), (5, 5)]),
+    ("5,1-2,3", [(1, 3), (5, 5)]),
+    ("1-4,2-6", [(1, 6)]),
+])
+def test_parse_page_ranges(value, expected):
+    assert parse_page_ranges(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "3-1", "a-b", "1-2-3", [[1]]])
+def test_parse_page_ranges_rejects(value):
+    with pytest.raises(PrintSettingsError):
+        parse_page_ranges(value)
+
+
+def test_format_page_ranges_round_trips():
+    ranges = [(1, 3), (5, 5), (8, OPEN)]
+    assert format_page_ranges(ranges) == "1-3,5,8-"
+    assert parse_page_ranges(format_page_ranges(ranges)) == ranges
+
+
+def test_count_selected_pages():
+    assert count_selected_pages(None, 10) == 10
+    assert count_selected_pages([(1, 3), (9, OPEN)], 10) == 5
+    assert count_selected_pages([(12, 14)], 10) == 0
+
+
+# ==========================================================
+# NORMALIZATION
+# ==========================================================
+
+def test_build_job_settings_reads_backend_aliases():
+    settings = build_job_settings({
+        "numberOfCopies": "3",
+        "colorMode": "colour",
+        "doubleSide": "yes",
+        "orientation": "landscape",
+        "pageRange": "2-3",
+        "pagesPerSheet": 4,
+        "paperSize": "letter",
+        "collate": "false",
+    })
+    assert settings == {
+        "copies": 3,
+        "color": "COLOR",
+        "duplex": True,
+        "orientation": "LANDSCAPE",
+        "page_ranges": [(2, 3)],
+        "number_up": 4,
+        "media": "LETTER",
+        "collate": False,
+    }
+
+
+def test_build_job_settings_defaults_and_bool_color():
+    assert build_job_settings(None) == DEFAULT_SETTINGS
+    assert build_job_settings({"isColor": True})["color"] == "COLOR"
+    assert build_job_settings({"copies": ""})["copies"] == 1
+
+
+@pytest.mark.parametrize("raw", [
+    {"copies": 0},
+    {"copies": 100},
+    {"copies": "two"},
+    {"color": "sepia"},
+    {"orientation": "diagonal"},
+    {"pagesPerSheet": 3},
+    {"paperSize": "B5"},
+])
+def test_build_job_settings_rejects(raw):
+    with pytest.raises(PrintSettingsError):
+        build_job_settings(raw)
+
+
+def test_file_settings_override_the_order():
+    order, per_file = resolve_order_settings({
+        "printSettings": {"copies": 2, "color": "COLOR"},
+        "fileSettings": [None, {"color": "BW"}],
+    })
+    assert order["copies"] == 2 and order["color"] == "COLOR"
+    assert per_file[0] is None
+    assert per_file[1]["copies"] == 2 and per_file[1]["color"] == "BW"
+
+
+def test_attach_file_settings_keeps_settings_fixed_by_download():
+    files = [{"path": "a", "index": 0}, {"path": "b", "index": 1, "settings": {"number_up": 1}}]
+    per_file = [None, build_job_settings({"pagesPerSheet": 4, "copies": 2})]
+    attach_file_settings(files, per_file)
+    assert "settings" not in files[0]
+    assert files[1]["settings"]["number_up"] == 1
+    assert files[1]["settings"]["copies"] == 2
+
+
+# ==========================================================
+# OUTPUT MAPPINGS
+# ==========================================================
+
+def test_to_lp_options():
+    settings = build_job_settings({"copies": 2, "duplex": True, "pages": "1-2,5",
+                                   "pagesPerSheet": 2, "paperSize": "A3", "collate": False})
+    assert to_lp_options(settings) == [
+        "-n", "2",
+        "-o", "ColorModel=Gray",
+        "-o", "sides=two-sided-long-edge",
+        "-o", "page-ranges=1-2,5",
+        "-o", "number-up=2",
+        "-o", "media=A3",
+        "-o", "collate=false",
+    ]
+
+
+def test_to_ipp_attributes():
+    settings = build_job_settings({"copies": 2, "color": "COLOR", "orientation": "LANDSCAPE",
+                                   "pages": "3", "paperSize": "A4"})
+    assert to_ipp_attributes(settings) == {
+        "copies": 2,
+        "print-color-mode": "color",
+        "sides": "one-sided",
+        "orientation-requested": 4,
+        "page-ranges": [(3, 3)],
+        "media": "iso_a4_210x297mm",
+        "multiple-document-handling": "separate-documents-collated-copies",
+    }
+    assert to_ipp_attributes(DEFAULT_SETTINGS) == {
+        "copies": 1, "print-color-mode": "monochrome", "sides": "one-sided",
+    }
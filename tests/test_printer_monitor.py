@@ -0,0 +1,59 @@
+import subprocess
+
+import pytest
+
+from services import printer_monitor
+from services.printer_monitor import PrinterMonitor, _normalize_reasons
+
+LPSTAT = {
+    ("lpstat", "-l", "-p"): (
+        "printer Office is idle.  enabled since Mon 01 Jan\n"
+        "\tAlerts: toner-low-warning\n"
+        "printer Lab disabled since Mon 01 Jan -\n"
+        "\tAlerts: media-jam-error\n"
+    ),
+    ("lpstat", "-o"): "Office-12 kiosk 1024 Mon 01 Jan\nOffice-13 kiosk 2048 Mon 01 Jan\n",
+    ("lpstat", "-d"): "system default destination: Office\n",
+    ("lpoptions", "-p", "Office", "-l"): "ColorModel/Color Mode: Gray *RGB\nDuplex/2-Sided: *None DuplexNoTumble\n",
+    ("lpoptions", "-p", "Lab", "-l"): "ColorModel/Color Mode: *Gray\n",
+}
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(printer_monitor, "cups", None)
+    monkeypatch.setattr(printer_monitor.subprocess, "run",
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, LPSTAT[tuple(cmd)], ""))
+    monitor = PrinterMonitor()
+    monitor.refresh()
+    return monitor
+
+
+def test_normalize_reasons_strips_severity_suffixes():
+    assert _normalize_reasons(["none"]) == []
+    assert _normalize_reasons(["toner-low-warning", "media-empty-error", "offline-report"]) == [
+        "toner-low", "media-empty", "offline-report",
+    ]
+
+
+def test_refresh_parses_lpstat_queues_and_capabilities(monitor):
+    office = monitor.get_state()
+    assert monitor.default_printer == "Office"
+    assert office["queue_length"] == 2
+    assert office["color"] and office["duplex"]
+    assert monitor.get_state("Lab")["state"] == "stopped"
+    assert monitor.is_fresh()
+
+
+def test_readiness_comes_from_the_snapshot(monitor):
+    assert monitor.is_ready() == (True, "Toner low")
+    assert monitor.is_ready("Lab") == (False, "Paper jam")
+    assert monitor.is_ready("Missing") == (False, "Printer 'Missing' not in CUPS")
+
+
+def test_blocking_reason_on_an_accepting_printer():
+    monitor = PrinterMonitor()
+    monitor._printers = {"Office": {"name": "Office", "state": "idle", "accepting": True,
+                                    "reasons": ["media-empty", "toner-low"]}}
+    assert monitor.is_ready("Office") == (False, "Paper out")
+    assert PrinterMonitor.describe_reasons(monitor.get_state("Office")) == "Paper out, Toner low"
@@ -0,0 +1,55 @@
+from services.printer_pool import PrinterPool
+from services.smart_printer import FILE_FAILED, PRINTED, PRINTER_FAILED, PrintResult
+
+
+class FakePrinter:
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.printed = []
+
+    def print_file(self, item, settings, progress=None, position=(1, 1), cancel=None):
+        self.printed.append(item)
+        return self.results.pop(0) if self.results else PRINTED
+
+
+def _pool(tmp_path, **printers):
+    pool = PrinterPool(list(printers))
+    pool.printers = printers
+    files = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(b"%PDF-1.4\n")
+        files.append(str(path))
+    return pool, files
+
+
+def test_bad_file_fails_once_without_failover(tmp_path):
+    first, second = FakePrinter([FILE_FAILED]), FakePrinter()
+    pool, files = _pool(tmp_path, first=first, second=second)
+    pool._queue_depth = lambda name: 0 if name == "first" else 1
+
+    assert pool.print_job(files, {}) is False
+    assert first.printed == files
+    assert second.printed == []
+    assert pool.check_printer_available()[0] and pool._failed_until == {}
+
+
+def test_queue_failure_resends_the_file_on_the_next_printer(tmp_path):
+    first, second = FakePrinter([PRINTED, PRINTER_FAILED]), FakePrinter()
+    pool, files = _pool(tmp_path, first=first, second=second)
+    pool._queue_depth = lambda name: 0 if name == "first" else 1
+
+    assert pool.print_job(files, {}) is True
+    assert first.printed == files[:2]
+    assert second.printed == files[1:]
+    assert "first" in pool._failed_until
+
+
+def test_started_file_is_not_printed_twice(tmp_path):
+    first, second = FakePrinter([PrintResult(False, printer_fault=True, started=True)]), FakePrinter()
+    pool, files = _pool(tmp_path, first=first, second=second)
+    pool._queue_depth = lambda name: 0 if name == "first" else 1
+
+    assert pool.print_job(files, {}) is False
+    assert first.printed == files[:1]
+    assert second.printed == files[1:]
@@ -0,0 +1,32 @@
+from services import printer_wake
+from services.printer_wake import PrinterWaker
+
+
+class FakeMonitor:
+    default_printer = "Office_Laser"
+
+    def get_state(self, name):
+        return {"state": "idle"}
+
+
+def test_unnamed_printer_falls_back_to_the_default_queue():
+    waker = PrinterWaker(printer_names=[None], monitor=FakeMonitor())
+    assert waker._targets() == ["Office_Laser"]
+
+
+def test_http_device_uri_defaults_to_port_80(monkeypatch):
+    urls = []
+
+    class FakeIppClient:
+        def __init__(self, base_url, timeout):
+            urls.append(base_url)
+
+        def get_printer_attributes(self, name, requested=None, printer_uri=None):
+            return {"printer-state": 3}
+
+    monkeypatch.setattr(printer_wake, "IppClient", FakeIppClient)
+    waker = PrinterWaker()
+    for uri in ("http://10.0.0.20/ipp/print", "ipp://10.0.0.21/ipp/print"):
+        monkeypatch.setattr(waker, "device_uri", lambda name, uri=uri: uri)
+        waker.wake("Office_Laser")
+    assert urls == ["http://10.0.0.20:80", "http://10.0.0.21:631"]
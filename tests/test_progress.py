@@ -0,0 +1,44 @@
+import pytest
+
+from services.progress import ProgressReporter, describe
+
+
+def test_same_kind_events_are_throttled():
+    events = []
+    progress = ProgressReporter(sink=events.append, min_interval=60)
+    for count in range(5):
+        progress.emit("download", file=1, total=2, bytes=count)
+    assert [event["bytes"] for event in events] == [0]
+
+
+def test_new_file_state_or_forced_events_always_go_out():
+    events = []
+    progress = ProgressReporter(sink=events.append, min_interval=60)
+    progress.emit("download", file=1, total=2, bytes=0)
+    progress.emit("download", file=2, total=2, bytes=0)
+    progress.emit("print", file=2, total=2, state="processing")
+    progress.emit("print", file=2, total=2, state="processing", pages=1)
+    progress.emit("print", force=True, file=2, total=2, state="processing", pages=2)
+    assert [(event["stage"], event["file"], event.get("pages")) for event in events] == [
+        ("download", 1, None), ("download", 2, None), ("print", 2, None), ("print", 2, 2),
+    ]
+
+
+def test_sink_errors_do_not_reach_the_producer():
+    def broken(event):
+        raise RuntimeError("window closed")
+
+    ProgressReporter(sink=broken).emit("queue", position=1)
+
+
+@pytest.mark.parametrize("event, text", [
+    ({"stage": "download", "file": 1, "total": 2, "bytes": 512, "size": 2048}, "⬇️ Downloading file 1 of 2... 25%"),
+    ({"stage": "download", "file": 1, "total": 2, "bytes": 4096}, "⬇️ Downloading file 1 of 2... 4 KB"),
+    ({"stage": "convert", "file": 2, "total": 3}, "🔄 Preparing file 2 of 3..."),
+    ({"stage": "queue", "position": 3}, "⏳ Waiting for printer... #3 in line"),
+    ({"stage": "print", "file": 1, "total": 1, "pages": 4}, "🖨️ Printing file 1 of 1... page 4"),
+    ({"stage": "print", "file": 1, "total": 1, "state": "completed"}, "✅ File 1 of 1 printed"),
+    ({"stage": "unknown"}, ""),
+])
+def test_describe(event, text):
+    assert describe(event) == text
@@ -0,0 +1,88 @@
+import pytest
+
+from services.rasterizer import (
+    PWG_SYNC,
+    URF_HEADER,
+    _page_list,
+    gs_device_args,
+    join_runs,
+    selected_pages,
+    split_runs,
+)
+
+
+# ==========================================================
+# PAGE RUNS
+# ==========================================================
+
+def test_selected_pages_clips_ranges_to_the_document():
+    assert selected_pages(None, 3) == [1, 2, 3]
+    assert selected_pages([(2, 3), (5, 2 ** 31 - 1)], 6) == [2, 3, 5, 6]
+
+
+@pytest.mark.parametrize("pages, workers, expected", [
+    ([1, 2, 3, 4, 5, 6, 7, 8], 4, [[1, 2], [3, 4], [5, 6], [7, 8]]),
+    ([1, 2, 3, 4, 5, 6, 7], 2, [[1, 2, 3, 4], [5, 6, 7]]),
+    # Fewer than MIN_RUN_PAGES per worker: fewer, longer runs
+    ([1, 2, 3], 4, [[1, 2, 3]]),
+    ([1, 2, 3, 4, 5], 4, [[1, 2, 3], [4, 5]]),
+    ([7], 4, [[7]]),
+])
+def test_split_runs_keeps_pages_contiguous_and_in_order(pages, workers, expected):
+    runs = split_runs(pages, workers)
+    assert runs == expected
+    assert [page for run in runs for page in run] == pages
+
+
+def test_page_list_collapses_consecutive_pages():
+    assert _page_list([1, 2, 3, 5, 7, 8]) == "1-3,5,7-8"
+
+
+def test_gs_device_args_pick_device_and_color_space():
+    args = gs_device_args("pwg", color="COLOR", dpi=600, media="LETTER", duplex=True)
+    assert "-sDEVICE=pwgraster" in args
+    assert "-r600" in args and "-sPAPERSIZE=letter" in args
+    assert "-dcupsColorSpace=19" in args and "-dDuplex" in args
+    assert "-sDEVICE=urfgray" in gs_device_args("urf")
+
+
+# ==========================================================
+# JOINING
+# ==========================================================
+
+def test_join_urf_writes_one_header_with_the_total_page_count(tmp_path):
+    parts = []
+    for index, (pages, body) in enumerate([(2, b"page1page2"), (1, b"page3")]):
+        part = tmp_path / f"run{index}.urf"
+        part.write_bytes(URF_HEADER.pack(b"UNIRAST\0", pages) + body)
+        parts.append(str(part))
+    out = tmp_path / "job.urf"
+
+    join_runs("urf", parts, str(out))
+    data = out.read_bytes()
+    assert URF_HEADER.unpack(data[:URF_HEADER.size]) == (b"UNIRAST\0", 3)
+    assert data[URF_HEADER.size:] == b"page1page2page3"
+
+
+def test_join_pwg_keeps_only_the_first_sync_word(tmp_path):
+    parts = []
+    for index, body in enumerate([b"page1", b"page2", b"page3"]):
+        part = tmp_path / f"run{index}.pwg"
+        part.write_bytes(PWG_SYNC + body)
+        parts.append(str(part))
+    out = tmp_path / "job.pwg"
+
+    join_runs("pwg", parts, str(out))
+    assert out.read_bytes() == PWG_SYNC + b"page1page2page3"
+
+
+def test_join_pcl_concatenates(tmp_path):
+    parts = []
+    for index, body in enumerate([b"\x1bEone", b"\x1bEtwo"]):
+        part = tmp_path / f"run{index}.pcl"
+        part.write_bytes(body)
+        parts.append(str(part))
+    out = tmp_path / "job.pcl"
+
+    join_runs("pcl", parts, str(out))
+    assert out.read_bytes() == b"\x1bEone\x1bEtwo"
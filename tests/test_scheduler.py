@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from services.cancellation import CancelToken
+from services.scheduler import DEFAULT_FILE_PAGES, PrintScheduler, order_pages, simulate
+
+
+def _queue(scheduler, *orders):
+    """Submit (order_id, pages, type, submitted) without a worker running."""
+    for order_id, pages, order_type, submitted in orders:
+        job = scheduler.submit(order_id, [], {}, pages=pages, order_type=order_type)
+        job["submitted"] = submitted
+    return [job["order_id"] for job in scheduler._ordered(1000)]
+
+
+# ==========================================================
+# POLICIES
+# ==========================================================
+
+def test_fifo_keeps_arrival_order():
+    scheduler = PrintScheduler(printer=None, policy="fifo")
+    assert _queue(scheduler, ("a", 100, None, 10), ("b", 1, None, 20)) == ["a", "b"]
+
+
+def test_sjf_puts_short_orders_first():
+    scheduler = PrintScheduler(printer=None, policy="sjf", aging=0)
+    assert _queue(scheduler, ("thesis", 200, None, 10), ("flyer", 1, None, 20)) == ["flyer", "thesis"]
+
+
+def test_sjf_aging_lets_a_long_wait_win():
+    # 200 pages waited 990 s (16.5 min x 20 = 330 pages off); 5 pages just arrived
+    scheduler = PrintScheduler(printer=None, policy="sjf", aging=20)
+    assert _queue(scheduler, ("thesis", 200, None, 10), ("flyer", 5, None, 990)) == ["thesis", "flyer"]
+
+
+def test_priority_ranks_types_then_arrival():
+    scheduler = PrintScheduler(printer=None, policy="priority", priorities={"express": 1})
+    orders = _queue(scheduler, ("a", 1, None, 10), ("b", 50, "express", 30), ("c", 1, "express", 20))
+    assert orders == ["c", "b", "a"]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        PrintScheduler(printer=None, policy="random")
+
+
+# ==========================================================
+# PAGE ESTIMATES
+# ==========================================================
+
+def test_order_pages_uses_preflight_counts_ranges_and_copies():
+    files = [
+        {"pages": 10, "settings": {"page_ranges": [(1, 3)], "copies": 2}},
+        {"pages": 4},
+    ]
+    assert order_pages(files, {"copies": 1}) == 3 * 2 + 4
+
+
+def test_order_pages_falls_back_to_backend_then_default():
+    assert order_pages([{}, {}], {}, {"pageCount": 8}) == 8
+    assert order_pages([{}], {}) == DEFAULT_FILE_PAGES
+
+
+# ==========================================================
+# LIVE QUEUE
+# ==========================================================
+
+class BlockingPrinter:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.printed = []
+
+    def print_job(self, files, settings, progress=None, cancel=None):
+        self.started.set()
+        self.release.wait(5)
+        self.printed.append(files)
+        return True
+
+
+def test_cancelled_order_leaves_the_queue_before_printing():
+    printer = BlockingPrinter()
+    scheduler = PrintScheduler(printer)
+    scheduler.start()
+    first = scheduler.submit("first", ["a"], {}, pages=1)
+    printer.started.wait(5)
+
+    cancel = CancelToken()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(scheduler.run("second", ["b"], {}, pages=1, cancel=cancel)))
+    waiter.start()
+    for _ in range(500):
+        if scheduler.position("second") == 1:
+            break
+        time.sleep(0.01)
+    cancel.cancel()
+    waiter.join(5)
+    printer.release.set()
+
+    assert scheduler.wait(first, timeout=5) is True
+    assert results == [False]
+    assert printer.printed == [["a"]]
+
+
+# ==========================================================
+# SIMULATOR
+# ==========================================================
+
+def test_simulate_sjf_cuts_the_mean_wait():
+    trace = [{"arrival": 0, "pages": 300}, {"arrival": 1, "pages": 1}, {"arrival": 1, "pages": 1},
+             {"arrival": 0.5, "pages": 200}]
+    fifo = simulate(trace, "fifo", aging=0)
+    sjf = simulate(trace, "sjf", aging=0)
+    assert fifo["orders"] == sjf["orders"] == 4
+    assert sjf["mean_wait"] < fifo["mean_wait"]
+    assert sjf["makespan"] == fifo["makespan"]
@@ -0,0 +1,107 @@
+import os
+
+from services.ipp_client import IppError
+from services.smart_printer import PRINTED, SmartPrinter
+
+
+class FakeResponse:
+    headers = {"Content-Length": "3"}
+
+    def __init__(self):
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter([b"%PD", b"F"])
+
+    def close(self):
+        self.closed = True
+
+
+def test_stopped_job_ends_the_poll():
+    printer = SmartPrinter(printer_name="Office")
+    printer._query_job_status = lambda job_id: ("stopped", None)
+    printer.poll_interval = 60
+    assert printer._wait_for_job("Office-1", timeout=5) == "stopped"
+
+
+def test_stream_closes_the_download_when_ipp_rejects_the_job():
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+    response = FakeResponse()
+
+    def reject(*args, **kwargs):
+        raise IppError("client-error-document-format-not-supported", status=0x040A)
+
+    printer.ipp.print_job = reject
+    result = printer._print_stream({"url": "http://cdn/a.pdf", "open": lambda: response}, {})
+    assert not result and not result.printer_fault
+    assert response.closed
+
+
+def test_stream_download_error_is_not_a_printer_fault():
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+    response = FakeResponse()
+    response.iter_content = lambda chunk_size: _broken_chunks()
+
+    def upload(printer_name, document, **kwargs):
+        try:
+            document.read()
+        except OSError as e:
+            # IppClient._send reports any socket-side OSError as unreachable
+            raise IppError(f"IPP server unreachable: {e}")
+
+    printer.ipp.print_job = upload
+    result = printer._print_stream({"url": "http://cdn/a.pdf", "open": lambda: response}, {})
+    assert not result and not result.printer_fault
+
+
+def _broken_chunks():
+    yield b"%PD"
+    raise ConnectionResetError("CDN dropped the connection")
+
+
+def test_stopped_job_after_pages_is_a_started_printer_fault():
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+    states = iter([("processing", 2), ("stopped", 2)])
+    printer._query_job_status = lambda job_id: next(states)
+    printer.poll_interval = 0
+    printer.cancel_job = lambda job_id: True
+
+    result = printer._job_result("Office-1")
+    assert not result and result.printer_fault and result.started
+
+
+def test_queue_rejection_is_a_printer_fault(tmp_path):
+    document = tmp_path / "a.pdf"
+    document.write_bytes(b"%PDF-1.4\n")
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+
+    def reject(*args, **kwargs):
+        raise IppError("server-error-not-accepting-jobs", status=0x0506)
+
+    printer.ipp.print_job = reject
+    result = printer._print_ipp(str(document), {})
+    assert not result and result.printer_fault and not result.started
+
+
+def test_page_subset_is_spooled_from_a_temp_file_and_removed(tmp_path, monkeypatch):
+    cache = tmp_path / "preflight_cache"
+    cache.mkdir()
+    source = cache / "digest.pdf"
+    source.write_bytes(b"%PDF-1.4\n")
+    monkeypatch.setattr("services.smart_printer.extract_pages",
+                        lambda src, dst, ranges: open(dst, "wb").write(b"%PDF-1.4\n") > 0)
+    printer = SmartPrinter(printer_name="Office", transport="ipp")
+    spooled = []
+
+    def fake_print_ipp(path, settings, **kwargs):
+        spooled.append((path, os.path.exists(path), settings["page_ranges"]))
+        return PRINTED
+
+    printer._print_ipp = fake_print_ipp
+    assert printer.print_file({"path": str(source), "settings": {"page_ranges": [(1, 1)]}}, {})
+
+    path, existed, page_ranges = spooled[0]
+    assert existed and page_ranges is None
+    assert os.path.dirname(path) != str(cache)
+    assert not os.path.exists(path)
+    assert os.listdir(cache) == ["digest.pdf"]
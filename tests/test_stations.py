@@ -0,0 +1,35 @@
+from services.stations import Station, build_stations
+
+
+class FakeDisplay:
+    code = ""
+
+
+def test_snapshot_reports_the_code_typed_on_the_window():
+    station = Station("left")
+    station.display = FakeDisplay()
+    station.display.code = "12"
+    assert station.snapshot()["code"] == "12"
+
+
+def test_snapshot_reports_the_headless_buffer():
+    station = Station("left")
+    for key in "123":
+        station.press(key)
+    assert station.snapshot()["code"] == "123"
+
+
+def test_press_returns_the_finished_code_once():
+    station = Station("left")
+    results = [station.press(key) for key in "1234567"]
+    assert results[0] == (None, True)
+    assert results[5] == ("123456", False)
+    assert station.code == "7"
+
+
+def test_cancel_order_only_touches_its_own_station():
+    left, right = build_stations([{"name": "left", "serial_port": "/dev/ttyACM0"},
+                                  {"name": "right", "serial_port": "/dev/ttyACM1"}])
+    left_cancel, right_cancel = left.begin("a"), right.begin("b")
+    assert left.cancel_order() is True
+    assert left_cancel.cancelled and not right_cancel.cancelled
@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import requests
+
+from services import telemetry
+from services.telemetry import LATENCY_BUCKETS, TelemetryAgent
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+
+def test_snapshot_rolls_up_and_resets_the_window():
+    agent = TelemetryAgent()
+    agent.incr("orders.started")
+    agent.incr("orders.started")
+    agent.failure(None)
+    agent.observe("stage.print", 0.3)
+    agent.observe("stage.print", 1000)
+
+    batch = agent.snapshot()
+    assert batch["counters"] == {"orders.started": 2, "failures.UNKNOWN": 1}
+    stats = batch["latencies"]["stage.print"]
+    assert stats["count"] == 2 and stats["max"] == 1000
+    assert stats["buckets"][LATENCY_BUCKETS.index(0.5)] == 1
+    assert stats["buckets"][-1] == 1
+
+    assert agent.snapshot()["counters"] == {}
+
+
+def test_failed_uploads_queue_up_and_go_out_together(monkeypatch):
+    posts = []
+
+    def post(url, data, headers, timeout):
+        posts.append(json.loads(gzip.decompress(data)))
+        if len(posts) < 3:
+            raise requests.exceptions.ConnectionError("offline")
+        return FakeResponse()
+
+    monkeypatch.setattr(telemetry.requests, "post", post)
+    agent = TelemetryAgent(endpoint="http://backend/telemetry", max_batches=2)
+    for _ in range(3):
+        agent.incr("orders.started")
+        agent.flush()
+
+    # Three windows, two kept while offline: the oldest was dropped
+    assert [len(body["batches"]) for body in posts] == [1, 2, 2]
+    assert posts[-1]["dropped"] == 1
+    assert len(agent._outbox) == 0 and agent.dropped == 0
+
+
+def test_file_sink_appends_gzip_json_lines(tmp_path):
+    path = tmp_path / "telemetry.jsonl.gz"
+    agent = TelemetryAgent(file_path=str(path))
+    agent.incr("orders.printed")
+    agent.flush()
+    agent.flush()
+
+    with gzip.open(path, "rt") as f:
+        batches = [json.loads(line) for line in f]
+    assert [batch["counters"] for batch in batches] == [{"orders.printed": 1}, {}]
+    assert len(agent._outbox) == 0